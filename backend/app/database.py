@@ -1,8 +1,12 @@
 """数据库连接和会话管理"""
 
-from typing import Generator
+import functools
+from typing import Generator, Optional
 
-from sqlalchemy import create_engine
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session, sessionmaker
 
@@ -19,6 +23,16 @@ engine = create_engine(
     echo=settings.DEBUG,
 )
 
+
+@event.listens_for(engine, "connect")
+def _set_connection_flags(dbapi_connection, connection_record) -> None:
+    """应用层维护科目余额时，通知 ddl.sql 中的分录触发器跳过余额更新"""
+    if settings.ACCOUNT_BALANCE_MODE == "app" and engine.dialect.name == "mysql":
+        cursor = dbapi_connection.cursor()
+        cursor.execute("SET @app_maintains_balances = 1")
+        cursor.close()
+
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -32,6 +46,97 @@ def get_db() -> Generator[Session, None, None]:
         db.close()
 
 
+# ==================== 异步数据库模式 ====================
+
+# 同步驱动对应的异步驱动
+_ASYNC_DRIVERS = {"mysql": "mysql+aiomysql", "sqlite": "sqlite+aiosqlite"}
+
+
+def _async_database_url(database_url: str):
+    """把同步连接串换用对应的异步驱动"""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    url = url.set(drivername=_ASYNC_DRIVERS.get(backend, url.drivername))
+    if backend == "mysql":
+        # aiomysql 不支持 collation 参数，排序规则沿用库表定义
+        url = url.difference_update_query(["collation"])
+    return url
+
+
+def _create_async_engine(database_url):
+    url = make_url(database_url)
+    # aiosqlite 使用 NullPool，不接受连接池大小参数
+    pool_options = (
+        {}
+        if url.get_backend_name() == "sqlite"
+        else {"pool_size": 10, "max_overflow": 20, "pool_recycle": 3600}
+    )
+    return create_async_engine(
+        url, pool_pre_ping=True, echo=settings.DEBUG, **pool_options
+    )
+
+
+async_engine = None
+AsyncSessionLocal: Optional[async_sessionmaker] = None
+
+if settings.DATABASE_ASYNC_MODE:
+    # 优先使用 ASYNC_DATABASE_URL，否则由 DATABASE_URL 换用异步驱动
+    async_engine = _create_async_engine(
+        settings.ASYNC_DATABASE_URL or _async_database_url(settings.DATABASE_URL)
+    )
+    event.listen(async_engine.sync_engine, "connect", _set_connection_flags)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autoflush=False, expire_on_commit=False
+    )
+
+
+# ==================== 只读副本 ====================
+
+# 未配置 DATABASE_READ_URL 时均为 None，读请求使用主库（见 app/utils/read_db.py）
+read_engine = None
+ReadSessionLocal: Optional[sessionmaker] = None
+async_read_engine = None
+AsyncReadSessionLocal: Optional[async_sessionmaker] = None
+
+if settings.DATABASE_READ_URL:
+    read_engine = create_engine(
+        settings.DATABASE_READ_URL,
+        pool_size=10,
+        max_overflow=20,
+        pool_pre_ping=True,
+        pool_recycle=3600,
+        echo=settings.DEBUG,
+    )
+    ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+    if settings.DATABASE_ASYNC_MODE:
+        async_read_engine = _create_async_engine(
+            _async_database_url(settings.DATABASE_READ_URL)
+        )
+        AsyncReadSessionLocal = async_sessionmaker(
+            async_read_engine, autoflush=False, expire_on_commit=False
+        )
+
+
+def async_db_route(func):
+    """把使用同步 ORM 代码的只读路由包装为 async def 路由
+
+    路由参数 db 需来自 get_async_read_db。AsyncSession 通过 run_sync 在事件循环中执行原有查询代码
+    （IO 等待期间让出事件循环，不占用线程池）；同步 Session 则整体放到线程池执行。
+    路由返回值必须是已经读取完毕的数据（流式导出不适用）。
+    """
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        db = kwargs["db"]
+        if isinstance(db, AsyncSession):
+            return await db.run_sync(
+                lambda session: func(*args, **{**kwargs, "db": session})
+            )
+        return await run_in_threadpool(func, *args, **kwargs)
+
+    return wrapper
+
+
 def init_db() -> None:
     """初始化数据库"""
     Base.metadata.create_all(bind=engine)
@@ -1,7 +1,7 @@
 """数据库模型"""
 from app.models.company import Company
 from app.models.user import User
-from app.models.account import Account
+from app.models.account import Account, AccountBalanceSnapshot
 from app.models.standard_account import StandardAccount
 from app.models.journal import JournalEntry, LedgerLine
 from app.models.supplier import Supplier
@@ -9,14 +9,24 @@ from app.models.customer import Customer
 from app.models.order import PurchaseOrder, SalesOrder, PurchaseOrderItem, SalesOrderItem
 from app.models.payment import Payment, Receipt
 from app.models.product import Product
-from app.models.inventory import InventoryItem, InventoryTransaction
+from app.models.inventory import (
+    InventoryCostLayer,
+    InventoryItem,
+    InventoryLocation,
+    InventorySnapshot,
+    InventoryTransaction,
+)
 from app.models.bank import BankAccount, BankStatement
 from app.models.reconciliation import Reconciliation
 
+# 注册会话事件：应用层科目余额维护（需在模型加载后导入）
+import app.utils.account_balance  # noqa: E402, F401
+
 __all__ = [
     "Company",
     "User",
     "Account",
+    "AccountBalanceSnapshot",
     "StandardAccount",
     "JournalEntry",
     "LedgerLine",
@@ -31,6 +41,9 @@ __all__ = [
     "Product",
     "InventoryItem",
     "InventoryTransaction",
+    "InventoryLocation",
+    "InventorySnapshot",
+    "InventoryCostLayer",
     "BankAccount",
     "BankStatement",
     "Reconciliation",
@@ -7,9 +7,11 @@ from sqlalchemy import (
     DECIMAL,
     Boolean,
     Column,
+    Date,
     DateTime,
     Enum,
     ForeignKey,
+    Index,
     String,
     UniqueConstraint,
 )
@@ -62,3 +64,30 @@ class Account(Base):
 
     def __repr__(self):
         return f"<Account {self.code} {self.name}>"
+
+
+class AccountBalanceSnapshot(Base):
+    """科目期末余额快照表（按期末日期保存含下级科目的累计借贷发生额）"""
+
+    __tablename__ = "account_balance_snapshot"
+    __table_args__ = (
+        UniqueConstraint(
+            "account_id", "period_end", name="uq_balance_snapshot_account_period"
+        ),
+        Index("idx_balance_snapshot_company_period", "company_id", "period_end"),
+    )
+
+    snapshot_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    company_id = Column(
+        String(36), ForeignKey("company.company_id"), nullable=False, comment="所属公司"
+    )
+    account_id = Column(
+        String(36), ForeignKey("account.account_id"), nullable=False, comment="科目"
+    )
+    period_end = Column(Date, nullable=False, comment="快照截止日期（含）")
+    balance_debit = Column(DECIMAL(18, 2), default=0, comment="截至期末借方累计")
+    balance_credit = Column(DECIMAL(18, 2), default=0, comment="截至期末贷方累计")
+    created_at = Column(DateTime, default=get_beijing_time, comment="创建时间")
+
+    def __repr__(self):
+        return f"<AccountBalanceSnapshot {self.account_id} {self.period_end}>"
@@ -27,6 +27,11 @@ class Customer(Base):
     address = Column(String(255), comment="地址")
     tax_no = Column(String(50), comment="税号")
     credit_limit = Column(DECIMAL(18, 2), default=0, comment="信用额度")
+    outstanding_receivable = Column(
+        DECIMAL(18, 2),
+        default=0,
+        comment="当前应收余额（已过账赊销订单的未收金额合计，过账/收款时维护）",
+    )
     remark = Column(Text, comment="备注")
     created_at = Column(DateTime, default=get_beijing_time, comment="创建时间")
 
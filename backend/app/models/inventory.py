@@ -3,7 +3,19 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DECIMAL, Column, DateTime, Enum, ForeignKey, String
+from sqlalchemy import (
+    DECIMAL,
+    BigInteger,
+    Column,
+    Date,
+    DateTime,
+    Enum,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+)
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -53,6 +65,14 @@ class InventoryTransaction(Base):
     """库存流水表"""
 
     __tablename__ = "inventory_transaction"
+    __table_args__ = (
+        Index(
+            "idx_inventory_transaction_product_time",
+            "company_id",
+            "product_id",
+            "created_at",
+        ),
+    )
 
     transaction_id = Column(
         String(36), primary_key=True, default=lambda: str(uuid.uuid4())
@@ -94,3 +114,103 @@ class InventoryTransaction(Base):
 
     def __repr__(self):
         return f"<InventoryTransaction {self.transaction_id} {self.type}>"
+
+
+class InventoryLocation(Base):
+    """库存位置汇总表（按商品、仓库位置汇总流水数量，由库存流水触发器维护）"""
+
+    __tablename__ = "inventory_location"
+    __table_args__ = (
+        UniqueConstraint(
+            "company_id",
+            "product_id",
+            "warehouse_location",
+            name="uq_inventory_location_product_location",
+        ),
+    )
+
+    location_id = Column(
+        String(36), primary_key=True, default=lambda: str(uuid.uuid4())
+    )
+    company_id = Column(
+        String(36), ForeignKey("company.company_id"), nullable=False, comment="公司"
+    )
+    product_id = Column(
+        String(36), ForeignKey("product.product_id"), nullable=False, comment="商品"
+    )
+    warehouse_location = Column(String(100), nullable=False, comment="仓库位置")
+    quantity = Column(
+        DECIMAL(18, 2),
+        default=0,
+        comment="该位置数量（=SUM(带该位置的 inventory_transaction.quantity)）",
+    )
+    updated_at = Column(
+        DateTime,
+        default=get_beijing_time,
+        onupdate=get_beijing_time,
+        comment="更新时间",
+    )
+
+    def __repr__(self):
+        return f"<InventoryLocation {self.product_id} {self.warehouse_location}>"
+
+
+class InventorySnapshot(Base):
+    """库存期末快照表（按期末日期保存每个商品的库存数量与加权平均成本）"""
+
+    __tablename__ = "inventory_snapshot"
+    __table_args__ = (
+        UniqueConstraint(
+            "product_id", "period_end", name="uq_inventory_snapshot_product_period"
+        ),
+        Index("idx_inventory_snapshot_company_period", "company_id", "period_end"),
+    )
+
+    snapshot_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    company_id = Column(
+        String(36), ForeignKey("company.company_id"), nullable=False, comment="公司"
+    )
+    product_id = Column(
+        String(36), ForeignKey("product.product_id"), nullable=False, comment="商品"
+    )
+    period_end = Column(Date, nullable=False, comment="快照截止日期（含）")
+    quantity = Column(DECIMAL(18, 2), default=0, comment="期末库存数量")
+    average_cost = Column(DECIMAL(18, 2), default=0, comment="期末加权平均成本")
+    created_at = Column(DateTime, default=get_beijing_time, comment="创建时间")
+
+    def __repr__(self):
+        return f"<InventorySnapshot {self.product_id} {self.period_end}>"
+
+
+class InventoryCostLayer(Base):
+    """库存成本层表（先进先出计价：每个采购入库批次的剩余数量与单位成本）
+
+    只保留仍有剩余数量的批次，耗尽后删除；自增主键即入库先后顺序。
+    """
+
+    __tablename__ = "inventory_cost_layer"
+    __table_args__ = (
+        Index("idx_cost_layer_product", "company_id", "product_id", "layer_id"),
+    )
+
+    layer_id = Column(
+        BigInteger().with_variant(Integer, "sqlite"),
+        primary_key=True,
+        autoincrement=True,
+        comment="成本层ID（自增，即入库顺序）",
+    )
+    company_id = Column(
+        String(36), ForeignKey("company.company_id"), nullable=False, comment="公司"
+    )
+    product_id = Column(
+        String(36), ForeignKey("product.product_id"), nullable=False, comment="商品"
+    )
+    source_type = Column(String(20), comment="来源类型（PO-采购入库；Opening-期初层）")
+    source_id = Column(String(36), comment="来源ID（如采购订单ID）")
+    quantity = Column(DECIMAL(18, 2), nullable=False, comment="入库数量")
+    remaining_quantity = Column(DECIMAL(18, 2), nullable=False, comment="剩余数量")
+    unit_cost = Column(DECIMAL(18, 2), nullable=False, comment="单位成本")
+    created_at = Column(DateTime, default=get_beijing_time, comment="入库时间")
+
+    def __repr__(self):
+        return f"<InventoryCostLayer {self.layer_id} {self.product_id}>"
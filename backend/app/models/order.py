@@ -12,12 +12,16 @@ from sqlalchemy import (
     ForeignKey,
     String,
     Text,
+    bindparam,
     event,
+    inspect,
+    select,
+    update,
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
-from app.database import Base
+from app.database import Base, SessionLocal
 from app.utils.helpers import get_beijing_time
 
 
@@ -73,6 +77,9 @@ class SalesOrder(Base):
         DECIMAL(18, 2), default=0, comment="总金额（自动计算：SUM(items.subtotal)）"
     )
     payment_method = Column(Enum("Cash", "BankTransfer", "Credit"), comment="收款方式")
+    received_amount = Column(
+        DECIMAL(18, 2), default=0, comment="已收金额（收款时维护：SUM(receipt.amount)）"
+    )
     status = Column(
         Enum("Draft", "Posted", "Collected"), default="Draft", comment="状态"
     )
@@ -156,44 +163,79 @@ class SalesOrderItem(Base):
         return f"<SalesOrderItem {self.item_id} {self.product_name}>"
 
 
-# 事件监听器：自动更新订单总金额
-@event.listens_for(PurchaseOrderItem, "after_insert")
-@event.listens_for(PurchaseOrderItem, "after_update")
-@event.listens_for(PurchaseOrderItem, "after_delete")
-def update_purchase_order_total(mapper, connection, target):
-    """采购订单明细变更后自动更新订单总金额"""
-    from sqlalchemy import func, select
-
-    order_id = target.purchase_order_id
-    result = connection.execute(
-        select(func.sum(PurchaseOrderItem.subtotal)).where(
-            PurchaseOrderItem.purchase_order_id == order_id
-        )
-    ).scalar()
-    total = result or 0
-    connection.execute(
-        PurchaseOrder.__table__.update()
-        .where(PurchaseOrder.po_id == order_id)
-        .values(total_amount=total)
-    )
-
-
-@event.listens_for(SalesOrderItem, "after_insert")
-@event.listens_for(SalesOrderItem, "after_update")
-@event.listens_for(SalesOrderItem, "after_delete")
-def update_sales_order_total(mapper, connection, target):
-    """销售订单明细变更后自动更新订单总金额"""
-    from sqlalchemy import func, select
-
-    order_id = target.sales_order_id
-    result = connection.execute(
-        select(func.sum(SalesOrderItem.subtotal)).where(
-            SalesOrderItem.sales_order_id == order_id
-        )
-    ).scalar()
-    total = result or 0
-    connection.execute(
-        SalesOrder.__table__.update()
-        .where(SalesOrder.so_id == order_id)
-        .values(total_amount=total)
-    )
+# 会话事件：订单总金额按订单汇总维护
+# 明细变更只在 flush 时记录受影响的订单，提交前对每个订单执行一次 SUM(subtotal)，
+# 避免逐条明细重算整张订单（N 行明细 O(N²)）。
+_DIRTY_ORDERS_KEY = "order_total_dirty"
+
+# 明细模型 -> (订单表, 订单主键列, 明细外键属性名)
+_ORDER_ITEM_TABLES = {
+    PurchaseOrderItem: (PurchaseOrder, "po_id", "purchase_order_id"),
+    SalesOrderItem: (SalesOrder, "so_id", "sales_order_id"),
+}
+
+
+def _mark_order(session, item, include_old: bool = False) -> None:
+    fk_name = _ORDER_ITEM_TABLES[type(item)][2]
+    dirty = session.info.setdefault(_DIRTY_ORDERS_KEY, {})
+    orders = dirty.setdefault(type(item), set())
+    history = inspect(item).attrs[fk_name].history
+    current = history.added[0] if history.added else getattr(item, fk_name)
+    if current:
+        orders.add(current)
+    if include_old and history.deleted and history.deleted[0]:
+        orders.add(history.deleted[0])
+
+
+def _recalc_order_totals(session, item_model, order_ids) -> None:
+    """按明细汇总重算指定订单的总金额（一条分组查询、批量写回）"""
+    if not order_ids:
+        return
+    order_model, pk_name, fk_name = _ORDER_ITEM_TABLES[item_model]
+    fk_column = getattr(item_model, fk_name)
+    totals = dict(
+        session.execute(
+            select(fk_column, func.sum(item_model.subtotal))
+            .where(fk_column.in_(order_ids))
+            .group_by(fk_column)
+        ).all()
+    )
+    table = order_model.__table__
+    session.connection().execute(
+        update(table)
+        .where(table.c[pk_name] == bindparam("b_order_id"))
+        .values(total_amount=bindparam("b_total")),
+        [
+            {"b_order_id": order_id, "b_total": totals.get(order_id) or 0}
+            for order_id in sorted(order_ids)
+        ],
+    )
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_dirty_orders(session, flush_context) -> None:
+    """记录本次 flush 中明细发生变化的订单"""
+    for obj in session.new:
+        if type(obj) in _ORDER_ITEM_TABLES:
+            _mark_order(session, obj)
+    for obj in session.deleted:
+        if type(obj) in _ORDER_ITEM_TABLES:
+            _mark_order(session, obj, include_old=True)
+    for obj in session.dirty:
+        if type(obj) in _ORDER_ITEM_TABLES and session.is_modified(obj):
+            _mark_order(session, obj, include_old=True)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _update_order_totals(session) -> None:
+    """提交前对每个受影响的订单重算一次总金额"""
+    session.flush()
+    dirty = session.info.pop(_DIRTY_ORDERS_KEY, None)
+    for item_model, order_ids in (dirty or {}).items():
+        _recalc_order_totals(session, item_model, order_ids)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_dirty_orders(session, previous_transaction) -> None:
+    """回滚时丢弃待重算的订单"""
+    session.info.pop(_DIRTY_ORDERS_KEY, None)
@@ -2,7 +2,7 @@
 
 import uuid
 
-from sqlalchemy import DECIMAL, Column, ForeignKey, String
+from sqlalchemy import DECIMAL, Column, ForeignKey, Index, String
 from sqlalchemy.orm import relationship
 
 from app.database import Base
@@ -12,6 +12,15 @@ class Product(Base):
     """商品表"""
 
     __tablename__ = "product"
+    __table_args__ = (
+        # 商品名称搜索：MySQL 使用 ngram 全文索引（支持中文）
+        Index(
+            "ft_product_name",
+            "name",
+            mysql_prefix="FULLTEXT",
+            mysql_with_parser="ngram",
+        ),
+    )
 
     product_id = Column(String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
     company_id = Column(
@@ -1,8 +1,13 @@
 """会计科目路由"""
 
-from typing import List
-
-from fastapi import APIRouter, Depends, HTTPException
+import hashlib
+import json
+from collections import defaultdict
+from datetime import date
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -14,6 +19,12 @@ from app.schemas.account import (
     AccountTreeNode,
     AccountUpdate,
 )
+from app.utils.account_balance import (
+    create_balance_snapshot,
+    forget_accounts,
+    get_account_balances,
+)
+from app.utils.account_codes import invalidate_account_codes
 from app.utils.auth import get_current_user, require_permission
 from app.utils.helpers import success_response
 
@@ -89,6 +100,7 @@ def create_account(
     db.add(account)
     db.commit()
     db.refresh(account)
+    invalidate_account_codes(current_user.company_id)
 
     return success_response(
         data=AccountResponse.from_orm(account).dict(), message="科目创建成功"
@@ -116,37 +128,88 @@ def get_accounts(
 
 @router.get("/tree", response_model=dict)
 def get_account_tree(
-    current_user=Depends(get_current_user), db: Session = Depends(get_db)
+    request: Request,
+    include_balance: bool = Query(False, description="是否附带缓存余额"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
 ):
-    """获取会计科目树"""
+    """获取会计科目树（一次查询构建，支持 ETag 协商缓存）"""
+    accounts = (
+        db.query(Account)
+        .filter(Account.company_id == current_user.company_id)
+        .order_by(Account.code)
+        .all()
+    )
 
-    def build_tree(parent_id=None):
-        """递归构建科目树"""
-        accounts = (
-            db.query(Account)
-            .filter(
-                Account.company_id == current_user.company_id,
-                Account.parent_id == parent_id,
+    # 按 parent_id 分组，一次遍历即可挂接子节点
+    children_map = defaultdict(list)
+    for account in accounts:
+        node = {
+            "account_id": account.account_id,
+            "code": account.code,
+            "name": account.name,
+            "type": account.type,
+            "is_core": account.is_core,
+            "children": [],
+        }
+        if include_balance:
+            debit = float(account.balance_debit or 0)
+            credit = float(account.balance_credit or 0)
+            node["balance_debit"] = debit
+            node["balance_credit"] = credit
+            node["balance"] = (
+                debit - credit if account.normal_balance == "Debit" else credit - debit
             )
-            .all()
-        )
+        children_map[account.parent_id].append(node)
+
+    for nodes in children_map.values():
+        for node in nodes:
+            node["children"] = children_map.get(node["account_id"], [])
 
-        tree = []
-        for account in accounts:
-            node = {
-                "account_id": account.account_id,
-                "code": account.code,
-                "name": account.name,
-                "type": account.type,
-                "is_core": account.is_core,
-                "children": build_tree(account.account_id),
-            }
-            tree.append(node)
+    # 父科目不存在（如已删除）的节点挂到根级，避免丢失
+    known_ids = {account.account_id for account in accounts}
+    tree = list(children_map.get(None, []))
+    for parent_id, nodes in children_map.items():
+        if parent_id is not None and parent_id not in known_ids:
+            tree.extend(nodes)
 
-        return tree
+    payload = json.dumps(tree, sort_keys=True, ensure_ascii=False)
+    etag = f'"{hashlib.md5(payload.encode("utf-8")).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
 
-    tree = build_tree()
-    return success_response(data=tree)
+    return JSONResponse(content=success_response(data=tree), headers=headers)
+
+
+@router.get("/balances", response_model=dict)
+def get_balances(
+    as_of: Optional[date] = Query(None, description="余额截止日期，默认今天"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_db),
+):
+    """获取全部科目截至指定日期的余额（期末快照 + 之后的已过账发生额）"""
+    data = get_account_balances(db, current_user.company_id, as_of)
+    return success_response(data=data)
+
+
+@router.post("/balances/snapshots", response_model=dict)
+def create_balances_snapshot(
+    period_end: date = Query(..., description="快照截止日期（通常为月末）"),
+    current_user=Depends(require_permission("account:update")),
+    db: Session = Depends(get_db),
+):
+    """生成科目期末余额快照（同一日期重复生成会覆盖）"""
+    try:
+        count = create_balance_snapshot(db, current_user.company_id, period_end)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    db.commit()
+
+    return success_response(
+        data={"period_end": period_end.isoformat(), "accounts": count},
+        message="余额快照生成成功",
+    )
 
 
 @router.get("/{account_id}", response_model=dict)
@@ -199,6 +262,7 @@ def update_account(
 
     db.commit()
     db.refresh(account)
+    invalidate_account_codes(current_user.company_id)
 
     return success_response(
         data=AccountResponse.from_orm(account).dict(), message="科目更新成功"
@@ -242,5 +306,7 @@ def delete_account(
 
     db.delete(account)
     db.commit()
+    invalidate_account_codes(current_user.company_id)
+    forget_accounts([account_id])
 
     return success_response(message="科目删除成功")
@@ -3,6 +3,7 @@
 from datetime import timedelta
 
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel, Field, field_validator
 from sqlalchemy.orm import Session
@@ -13,24 +14,25 @@ from app.models.company import Company
 from app.models.user import User
 from app.schemas.user import UserCreate
 from app.utils.auth import (
-    authenticate_user,
+    authenticate_user_async,
     create_access_token,
     get_current_user,
-    get_password_hash,
+    get_password_hash_async,
     require_role,
 )
 from app.utils.helpers import success_response
+from app.utils.user_cache import invalidate_user
 
 settings = get_settings()
 router = APIRouter(prefix="/auth", tags=["认证"])
 
 
 @router.post("/login", response_model=dict)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)
 ):
-    """用户登录"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    """用户登录（密码校验在密码哈希线程池中执行）"""
+    user = await authenticate_user_async(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -38,6 +40,11 @@ def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    return await run_in_threadpool(_login_response, db, user)
+
+
+def _login_response(db: Session, user: User) -> dict:
+    """签发访问令牌并返回登录用户信息"""
     # 创建访问令牌
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -71,7 +78,7 @@ def login(
 
 
 @router.post("/register", response_model=dict)
-def register(
+async def register(
     user_data: UserCreate,
     current_user=Depends(require_role("Owner")),
     db: Session = Depends(get_db),
@@ -83,7 +90,14 @@ def register(
             status_code=status.HTTP_403_FORBIDDEN, detail="不能为其他公司创建用户"
         )
 
-    # 检查用户名是否已存在（同一公司内）
+    # 先做数据库校验，校验通过后才计算密码哈希
+    await run_in_threadpool(_check_username_available, db, user_data)
+    password_hash = await get_password_hash_async(user_data.password)
+    return await run_in_threadpool(_register_user, db, user_data, password_hash)
+
+
+def _check_username_available(db: Session, user_data: UserCreate) -> None:
+    """检查用户名是否已存在（同一公司内）"""
     existing_user = (
         db.query(User)
         .filter(
@@ -96,10 +110,13 @@ def register(
             status_code=status.HTTP_400_BAD_REQUEST, detail="该用户名在此公司已存在"
         )
 
+
+def _register_user(db: Session, user_data: UserCreate, password_hash: str) -> dict:
+    """创建用户记录"""
     # 创建新用户
     new_user = User(
         username=user_data.username,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=password_hash,
         role=user_data.role.value
         if hasattr(user_data.role, "value")
         else user_data.role,
@@ -189,17 +206,21 @@ def update_profile(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="该用户名在此公司已存在"
             )
 
-    # 更新用户名
-    current_user.username = profile_data.username
+    # 更新用户名（current_user 为缓存的只读身份信息，需按 user_id 加载用户记录）
+    user = db.query(User).filter(User.user_id == current_user.user_id).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="用户不存在")
+    user.username = profile_data.username
     db.commit()
-    db.refresh(current_user)
+    invalidate_user(user.user_id)
+    db.refresh(user)
 
     # 获取企业信息
     company_name = None
-    if current_user.company_id:
+    if user.company_id:
         company = (
             db.query(Company)
-            .filter(Company.company_id == current_user.company_id)
+            .filter(Company.company_id == user.company_id)
             .first()
         )
         if company:
@@ -207,13 +228,13 @@ def update_profile(
 
     return success_response(
         data={
-            "user_id": current_user.user_id,
-            "username": current_user.username,
-            "role": current_user.role,
-            "company_id": current_user.company_id,
+            "user_id": user.user_id,
+            "username": user.username,
+            "role": user.role,
+            "company_id": user.company_id,
             "company_name": company_name,
-            "created_at": current_user.created_at.isoformat()
-            if current_user.created_at
+            "created_at": user.created_at.isoformat()
+            if user.created_at
             else None,
         },
         message="个人资料更新成功",
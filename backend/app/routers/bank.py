@@ -22,6 +22,7 @@ from app.schemas.bank import (
     ReconciliationCreate,
     ReconciliationResponse,
 )
+from app.utils.account_codes import get_account_id
 from app.utils.auth import get_current_user
 from app.utils.helpers import success_response
 
@@ -260,21 +261,14 @@ def get_reconciliation_data(
         raise HTTPException(status_code=404, detail="银行账户不存在")
 
     # 查找银行存款科目（1002）及其所有子科目
-    bank_account_subject = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "1002",  # 银行存款
-        )
-        .first()
-    )
-    if not bank_account_subject:
+    bank_account_subject_id = get_account_id(db, current_user.company_id, "1002")
+    if not bank_account_subject_id:
         raise HTTPException(
             status_code=400, detail="缺少银行存款科目（1002），请先创建"
         )
 
     # 获取银行存款科目及其所有子科目的ID列表
-    bank_account_ids = get_all_child_account_ids(db, bank_account_subject.account_id)
+    bank_account_ids = get_all_child_account_ids(db, bank_account_subject_id)
 
     from app.models.journal import JournalEntry, LedgerLine
 
@@ -438,21 +432,14 @@ def auto_match_reconciliation(
         raise HTTPException(status_code=404, detail="银行账户不存在")
 
     # 查找银行存款科目（1002）及其所有子科目
-    bank_account_subject = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "1002",  # 银行存款
-        )
-        .first()
-    )
-    if not bank_account_subject:
+    bank_account_subject_id = get_account_id(db, current_user.company_id, "1002")
+    if not bank_account_subject_id:
         raise HTTPException(
             status_code=400, detail="缺少银行存款科目（1002），请先创建"
         )
 
     # 获取银行存款科目及其所有子科目的ID列表
-    bank_account_ids = get_all_child_account_ids(db, bank_account_subject.account_id)
+    bank_account_ids = get_all_child_account_ids(db, bank_account_subject_id)
 
     from app.models.journal import JournalEntry, LedgerLine
 
@@ -673,20 +660,13 @@ def get_balance_sheet(
     if not bank_account:
         raise HTTPException(status_code=404, detail="银行账户不存在")
 
-    bank_account_subject = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "1002",
-        )
-        .first()
-    )
-    if not bank_account_subject:
+    bank_account_subject_id = get_account_id(db, current_user.company_id, "1002")
+    if not bank_account_subject_id:
         raise HTTPException(
             status_code=400, detail="缺少银行存款科目（1002），请先创建"
         )
 
-    bank_account_ids = get_all_child_account_ids(db, bank_account_subject.account_id)
+    bank_account_ids = get_all_child_account_ids(db, bank_account_subject_id)
     from app.models.journal import JournalEntry, LedgerLine
 
     latest_statement = (
@@ -1,6 +1,7 @@
 """企业管理路由"""
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.database import get_db
@@ -8,17 +9,38 @@ from app.models.account import Account
 from app.models.company import Company
 from app.models.user import User
 from app.schemas.company import CompanyCreate, CompanyResponse, CompanyUpdate
-from app.utils.auth import generate_random_password, get_current_user, get_password_hash
+from app.utils.account_codes import invalidate_account_codes
+from app.utils.auth import (
+    generate_random_password,
+    get_current_user,
+    get_password_hash_async,
+)
 from app.utils.core_accounts import get_core_accounts
 from app.utils.helpers import success_response
+from app.utils.user_cache import invalidate_company_users
 
 router = APIRouter(prefix="/company", tags=["企业管理"])
 
 
 @router.post("", response_model=dict)
-def create_company(company_data: CompanyCreate, db: Session = Depends(get_db)):
+async def create_company(company_data: CompanyCreate, db: Session = Depends(get_db)):
     """初始化企业信息 (UC-001)"""
+    # 生成默认管理员随机密码（bcrypt 在密码哈希线程池中计算）
+    admin_password = generate_random_password(12)
+    admin_password_hash = await get_password_hash_async(admin_password)
+
+    return await run_in_threadpool(
+        _initialize_company, db, company_data, admin_password, admin_password_hash
+    )
 
+
+def _initialize_company(
+    db: Session,
+    company_data: CompanyCreate,
+    admin_password: str,
+    admin_password_hash: str,
+) -> dict:
+    """创建企业、默认管理员与核心会计科目"""
     # 检查企业名称是否已存在
     existing = db.query(Company).filter(Company.name == company_data.name).first()
     if existing:
@@ -34,14 +56,11 @@ def create_company(company_data: CompanyCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(company)
 
-    # 生成随机密码
-    admin_password = generate_random_password(12)
-
     # 创建默认管理员账户
     admin_user = User(
         company_id=company.company_id,
         username=f"admin_{company.company_id[:8]}",
-        password_hash=get_password_hash(admin_password),
+        password_hash=admin_password_hash,
         role="Owner",
     )
     db.add(admin_user)
@@ -72,6 +91,7 @@ def create_company(company_data: CompanyCreate, db: Session = Depends(get_db)):
         )
         db.add(account)
     db.commit()
+    invalidate_account_codes(company.company_id)
 
     return success_response(
         data={
@@ -121,6 +141,7 @@ def update_company(
             setattr(company, key, value)
 
     db.commit()
+    invalidate_company_users(company_id)
     db.refresh(company)
 
     return success_response(
@@ -1,18 +1,20 @@
 """客户管理路由"""
 
 from decimal import Decimal
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import async_db_route, get_db
 from app.models.customer import Customer
 from app.models.order import SalesOrder
 from app.models.payment import Receipt
 from app.schemas.customer import CustomerCreate, CustomerResponse, CustomerUpdate
 from app.utils.auth import get_current_user, require_permission
 from app.utils.helpers import success_response
+from app.utils.read_db import get_async_read_db
 
 router = APIRouter(prefix="/customers", tags=["客户管理"])
 
@@ -55,95 +57,148 @@ def create_customer(
     )
 
 
+# 可用于排序/筛选的统计字段
+CUSTOMER_STAT_FIELDS = (
+    "total_orders",
+    "draft_count",
+    "posted_count",
+    "collected_count",
+    "current_debt",
+    "total_sales",
+    "total_received",
+    "available_credit",
+)
+
+
+def _customer_stats_query(db: Session, company_id: str):
+    """客户列表查询，附带订单统计列
+
+    销售订单、收款各一个按客户分组的子查询，与客户表左连接，
+    统计列可直接用于 WHERE / ORDER BY 和分页。
+    """
+    order_stats = (
+        db.query(
+            SalesOrder.customer_id.label("customer_id"),
+            func.count(SalesOrder.so_id).label("total_orders"),
+            func.sum(case((SalesOrder.status == "Draft", 1), else_=0)).label(
+                "draft_count"
+            ),
+            func.sum(case((SalesOrder.status == "Posted", 1), else_=0)).label(
+                "posted_count"
+            ),
+            func.sum(case((SalesOrder.status == "Collected", 1), else_=0)).label(
+                "collected_count"
+            ),
+            func.sum(
+                case(
+                    (
+                        SalesOrder.status.in_(("Posted", "Collected")),
+                        SalesOrder.total_amount,
+                    ),
+                    else_=0,
+                )
+            ).label("total_sales"),
+        )
+        .filter(SalesOrder.company_id == company_id)
+        .group_by(SalesOrder.customer_id)
+        .subquery()
+    )
+    receipt_stats = (
+        db.query(
+            SalesOrder.customer_id.label("customer_id"),
+            func.sum(Receipt.amount).label("total_received"),
+        )
+        .join(SalesOrder, Receipt.sales_order_id == SalesOrder.so_id)
+        .filter(Receipt.company_id == company_id)
+        .group_by(SalesOrder.customer_id)
+        .subquery()
+    )
+
+    # 当前欠款取客户应收余额（过账/收款时维护）
+    current_debt = func.coalesce(Customer.outstanding_receivable, 0)
+    columns = {
+        "total_orders": func.coalesce(order_stats.c.total_orders, 0),
+        "draft_count": func.coalesce(order_stats.c.draft_count, 0),
+        "posted_count": func.coalesce(order_stats.c.posted_count, 0),
+        "collected_count": func.coalesce(order_stats.c.collected_count, 0),
+        "current_debt": current_debt,
+        "total_sales": func.coalesce(order_stats.c.total_sales, 0),
+        "total_received": func.coalesce(receipt_stats.c.total_received, 0),
+        "available_credit": case(
+            (Customer.credit_limit > 0, Customer.credit_limit - current_debt),
+            else_=0,
+        ),
+    }
+
+    query = (
+        db.query(Customer, *(col.label(name) for name, col in columns.items()))
+        .outerjoin(order_stats, order_stats.c.customer_id == Customer.customer_id)
+        .outerjoin(receipt_stats, receipt_stats.c.customer_id == Customer.customer_id)
+        .filter(Customer.company_id == company_id)
+    )
+    return query, columns
+
+
 @router.get("", response_model=dict)
+@async_db_route
 def get_customers(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     skip: int = 0,
     limit: int = 50,
+    keyword: Optional[str] = Query(None, description="按客户名称模糊搜索"),
+    sort_by: Optional[str] = Query(None, description="排序字段：name、created_at 或统计字段"),
+    sort_order: str = Query("desc", pattern="^(asc|desc)$", description="排序方向"),
+    min_current_debt: Optional[Decimal] = Query(None, description="当前欠款下限"),
+    min_total_sales: Optional[Decimal] = Query(None, description="总销售额下限"),
+    has_draft: Optional[bool] = Query(None, description="是否有草稿订单"),
 ):
-    """获取客户列表（包含订单统计信息）"""
-    customers = (
-        db.query(Customer)
-        .filter(Customer.company_id == current_user.company_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
-
-    # 为每个客户计算订单统计信息
-    result = []
-    for customer in customers:
-        customer_data = CustomerResponse.from_orm(customer).dict()
-
-        # 查询该客户的所有销售订单
-        orders = (
-            db.query(SalesOrder)
-            .filter(
-                SalesOrder.customer_id == customer.customer_id,
-                SalesOrder.company_id == current_user.company_id,
-            )
-            .all()
+    """获取客户列表（包含订单统计信息）
+
+    统计信息由一条带分组子查询的 SQL 计算，支持按统计字段排序和筛选。
+    """
+    query, columns = _customer_stats_query(db, current_user.company_id)
+
+    if keyword:
+        query = query.filter(Customer.name.contains(keyword, autoescape=True))
+    if min_current_debt is not None:
+        query = query.filter(columns["current_debt"] >= min_current_debt)
+    if min_total_sales is not None:
+        query = query.filter(columns["total_sales"] >= min_total_sales)
+    if has_draft is not None:
+        query = query.filter(
+            columns["draft_count"] > 0 if has_draft else columns["draft_count"] == 0
         )
 
-        # 统计订单数量
-        draft_count = sum(1 for o in orders if o.status == "Draft")
-        posted_count = sum(1 for o in orders if o.status == "Posted")
-        collected_count = sum(1 for o in orders if o.status == "Collected")
-        total_orders = len(orders)
-
-        # 计算当前欠款（所有已过账但未完全收款的赊销订单的未收金额总和）
-        current_debt = Decimal("0")
-        posted_credit_orders = [
-            o for o in orders if o.status == "Posted" and o.payment_method == "Credit"
-        ]
-
-        for order in posted_credit_orders:
-            # 计算该订单的已收金额
-            received_amount = db.query(func.sum(Receipt.amount)).filter(
-                Receipt.sales_order_id == order.so_id,
-                Receipt.company_id == current_user.company_id,
-            ).scalar() or Decimal("0")
-            # 计算未收金额
-            unreceived_amount = order.total_amount - received_amount
-            current_debt += unreceived_amount
-
-        # 计算总销售额（所有已过账订单的总金额）
-        total_sales = sum(
-            float(o.total_amount) for o in orders if o.status in ("Posted", "Collected")
-        )
+    if sort_by:
+        if sort_by in CUSTOMER_STAT_FIELDS:
+            sort_column = columns[sort_by]
+        elif sort_by in ("name", "created_at"):
+            sort_column = getattr(Customer, sort_by)
+        else:
+            raise HTTPException(status_code=400, detail=f"不支持的排序字段：{sort_by}")
+        sort_column = sort_column.asc() if sort_order == "asc" else sort_column.desc()
+        query = query.order_by(sort_column, Customer.customer_id)
 
-        # 计算已收款总额
-        total_received = db.query(func.sum(Receipt.amount)).join(
-            SalesOrder, Receipt.sales_order_id == SalesOrder.so_id
-        ).filter(
-            SalesOrder.customer_id == customer.customer_id,
-            Receipt.company_id == current_user.company_id,
-        ).scalar() or Decimal("0")
-
-        # 计算可用信用额度
-        available_credit = (
-            customer.credit_limit - current_debt
-            if customer.credit_limit > 0
-            else Decimal("0")
-        )
+    rows = query.offset(skip).limit(limit).all()
 
-        # 添加统计信息
+    result = []
+    for row in rows:
+        customer_data = CustomerResponse.from_orm(row.Customer).dict()
         customer_data.update(
             {
                 "order_stats": {
-                    "total_orders": total_orders,
-                    "draft_count": draft_count,
-                    "posted_count": posted_count,
-                    "collected_count": collected_count,
-                    "current_debt": float(current_debt),
-                    "total_sales": total_sales,
-                    "total_received": float(total_received),
-                    "available_credit": float(available_credit),
+                    "total_orders": int(row.total_orders),
+                    "draft_count": int(row.draft_count),
+                    "posted_count": int(row.posted_count),
+                    "collected_count": int(row.collected_count),
+                    "current_debt": float(row.current_debt),
+                    "total_sales": float(row.total_sales),
+                    "total_received": float(row.total_received),
+                    "available_credit": float(row.available_credit),
                 }
             }
         )
-
         result.append(customer_data)
 
     return success_response(data=result)
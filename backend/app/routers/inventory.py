@@ -1,10 +1,20 @@
 """库存管理路由"""
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-
-from app.database import get_db
-from app.models.inventory import InventoryItem, InventoryTransaction
+import csv
+import io
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import and_, case, func, or_
+from sqlalchemy.orm import Session, joinedload
+
+from app.database import async_db_route, get_db
+from app.models.inventory import InventoryItem, InventoryLocation, InventoryTransaction
 from app.models.product import Product
 from app.schemas.inventory import (
     InventoryItemResponse,
@@ -12,22 +22,73 @@ from app.schemas.inventory import (
     InventoryTransactionResponse,
 )
 from app.utils.auth import get_current_user
+from app.utils.excel import write_only_excel_response
 from app.utils.helpers import success_response
+from app.utils.read_db import get_async_read_db, get_read_db
 
 router = APIRouter(prefix="/inventory", tags=["库存管理"])
 
 
+def _inventory_items_with_locations(db: Session, items: list) -> list:
+    """序列化库存记录并附加仓库位置
+
+    位置来自 inventory_location 汇总表（库存流水触发器维护），
+    整页库存只执行一次 IN 查询，不再逐条扫描流水。
+    location_quantities 只统计带位置的流水：销售出库按位置分配，
+    未指定位置的手工流水和位置表启用前的库存不计入任何位置。
+    """
+    locations = defaultdict(list)
+    if items:
+        rows = (
+            db.query(
+                InventoryLocation.company_id,
+                InventoryLocation.product_id,
+                InventoryLocation.warehouse_location,
+                InventoryLocation.quantity,
+            )
+            .filter(
+                InventoryLocation.company_id == items[0].company_id,
+                InventoryLocation.product_id.in_({item.product_id for item in items}),
+            )
+            .order_by(InventoryLocation.warehouse_location)
+            .all()
+        )
+        for company_id, product_id, location, quantity in rows:
+            locations[(company_id, product_id)].append((location, quantity))
+
+    result = []
+    for item in items:
+        item_dict = InventoryItemResponse.from_orm(item).dict()
+        # 确保quantity被序列化为数字而不是字符串
+        if "quantity" in item_dict and item_dict["quantity"] is not None:
+            item_dict["quantity"] = float(item_dict["quantity"])
+        if item.product:
+            item_dict["product_name"] = item.product.name
+            item_dict["product_sku"] = item.product.sku
+
+        item_locations = locations.get((item.company_id, item.product_id), [])
+        location_list = [location for location, _ in item_locations]
+        item_dict["warehouse_locations"] = location_list
+        # 兼容字段，显示所有位置的汇总
+        item_dict["warehouse_location"] = ", ".join(location_list) or None
+        item_dict["location_quantities"] = {
+            location: float(quantity or 0) for location, quantity in item_locations
+        }
+        result.append(item_dict)
+
+    return result
+
+
 @router.get("/items", response_model=dict)
+@async_db_route
 def get_inventory_items(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     product_id: str = None,
     skip: int = 0,
     limit: int = 20,
 ):
     """获取库存列表"""
-    from sqlalchemy.orm import joinedload
-
     query = (
         db.query(InventoryItem)
         .filter(InventoryItem.company_id == current_user.company_id)
@@ -39,43 +100,7 @@ def get_inventory_items(
 
     items = query.offset(skip).limit(limit).all()
 
-    result = []
-    for item in items:
-        item_dict = InventoryItemResponse.from_orm(item).dict()
-        # 确保quantity被序列化为数字而不是字符串
-        if "quantity" in item_dict and item_dict["quantity"] is not None:
-            item_dict["quantity"] = float(item_dict["quantity"])
-        if item.product:
-            item_dict["product_name"] = item.product.name
-            item_dict["product_sku"] = item.product.sku
-
-        # 从流水记录中汇总仓库位置（获取所有不同的位置）
-        locations = (
-            db.query(InventoryTransaction.warehouse_location)
-            .filter(
-                InventoryTransaction.product_id == item.product_id,
-                InventoryTransaction.company_id == item.company_id,
-                InventoryTransaction.type == "IN",
-                InventoryTransaction.warehouse_location.isnot(None),
-                InventoryTransaction.warehouse_location != "",
-            )
-            .distinct()
-            .all()
-        )
-        # 提取位置字符串并去重
-        location_list = [loc[0] for loc in locations if loc[0]]
-        if location_list:
-            item_dict["warehouse_locations"] = location_list
-            item_dict["warehouse_location"] = ", ".join(
-                location_list
-            )  # 兼容字段，显示所有位置的汇总
-        else:
-            item_dict["warehouse_locations"] = []
-            item_dict["warehouse_location"] = None
-
-        result.append(item_dict)
-
-    return success_response(data=result)
+    return success_response(data=_inventory_items_with_locations(db, items))
 
 
 @router.get("/items/{inventory_id}", response_model=dict)
@@ -85,8 +110,6 @@ def get_inventory_item(
     db: Session = Depends(get_db),
 ):
     """获取库存详情"""
-    from sqlalchemy.orm import joinedload
-
     item = (
         db.query(InventoryItem)
         .options(joinedload(InventoryItem.product))
@@ -100,36 +123,7 @@ def get_inventory_item(
     if not item:
         raise HTTPException(status_code=404, detail="库存记录不存在")
 
-    item_dict = InventoryItemResponse.from_orm(item).dict()
-    # 确保quantity被序列化为数字而不是字符串
-    if "quantity" in item_dict and item_dict["quantity"] is not None:
-        item_dict["quantity"] = float(item_dict["quantity"])
-    if item.product:
-        item_dict["product_name"] = item.product.name
-        item_dict["product_sku"] = item.product.sku
-
-    # 从流水记录中汇总仓库位置
-    locations = (
-        db.query(InventoryTransaction.warehouse_location)
-        .filter(
-            InventoryTransaction.product_id == item.product_id,
-            InventoryTransaction.company_id == item.company_id,
-            InventoryTransaction.type == "IN",
-            InventoryTransaction.warehouse_location.isnot(None),
-            InventoryTransaction.warehouse_location != "",
-        )
-        .distinct()
-        .all()
-    )
-    location_list = [loc[0] for loc in locations if loc[0]]
-    if location_list:
-        item_dict["warehouse_locations"] = location_list
-        item_dict["warehouse_location"] = ", ".join(location_list)
-    else:
-        item_dict["warehouse_locations"] = []
-        item_dict["warehouse_location"] = None
-
-    return success_response(data=item_dict)
+    return success_response(data=_inventory_items_with_locations(db, [item])[0])
 
 
 @router.post("/transactions", response_model=dict)
@@ -198,17 +192,16 @@ def create_inventory_transaction(
 
 
 @router.get("/transactions", response_model=dict)
+@async_db_route
 def get_inventory_transactions(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     product_id: str = None,
     source_type: str = None,
     skip: int = 0,
     limit: int = 50,
 ):
     """获取库存流水列表"""
-    from sqlalchemy.orm import joinedload
-
     query = (
         db.query(InventoryTransaction)
         .filter(InventoryTransaction.company_id == current_user.company_id)
@@ -241,4 +234,300 @@ def get_inventory_transactions(
     return success_response(data=result)
 
 
-# 已移除按位置查询库存的API，系统简化为单一仓库模式
+# ==================== 库存台账（stock card） ====================
+
+STOCK_CARD_HEADERS = [
+    "时间",
+    "类型",
+    "来源",
+    "来源ID",
+    "数量",
+    "单位成本",
+    "金额",
+    "结存数量",
+    "结存金额",
+    "仓库位置",
+    "备注",
+]
+
+
+def _get_product(db: Session, company_id: str, product_id: str) -> Product:
+    product = (
+        db.query(Product)
+        .filter(Product.product_id == product_id, Product.company_id == company_id)
+        .first()
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="商品不存在")
+    return product
+
+
+def _stock_card_range(
+    company_id: str,
+    product_id: str,
+    start_date: Optional[date],
+    end_date: Optional[date],
+):
+    """区间内该商品流水的过滤条件"""
+    conditions = [
+        InventoryTransaction.company_id == company_id,
+        InventoryTransaction.product_id == product_id,
+    ]
+    if start_date:
+        conditions.append(
+            InventoryTransaction.created_at >= datetime.combine(start_date, time.min)
+        )
+    if end_date:
+        conditions.append(
+            InventoryTransaction.created_at
+            < datetime.combine(end_date + timedelta(days=1), time.min)
+        )
+    return conditions
+
+
+def _signed_columns():
+    """带方向的数量与金额（入库为正、出库为负；无单位成本的流水金额按 0 计）"""
+    sign = case((InventoryTransaction.type == "OUT", -1), else_=1)
+    quantity = sign * InventoryTransaction.quantity
+    amount = sign * InventoryTransaction.quantity * func.coalesce(
+        InventoryTransaction.unit_cost, 0
+    )
+    return quantity, amount
+
+
+def _stock_card_opening(
+    db: Session, company_id: str, product_id: str, start_date: Optional[date]
+):
+    """期初结存数量与金额（start_date 之前的全部流水）"""
+    if not start_date:
+        return _round2(0), _round2(0)
+    quantity, amount = _signed_columns()
+    opening_quantity, opening_value = (
+        db.query(func.coalesce(func.sum(quantity), 0), func.coalesce(func.sum(amount), 0))
+        .filter(
+            InventoryTransaction.company_id == company_id,
+            InventoryTransaction.product_id == product_id,
+            InventoryTransaction.created_at < datetime.combine(start_date, time.min),
+        )
+        .one()
+    )
+    return _round2(opening_quantity), _round2(opening_value)
+
+
+def _stock_card_query(
+    db: Session,
+    company_id: str,
+    product_id: str,
+    start_date: Optional[date],
+    end_date: Optional[date],
+    cursor: Optional[tuple] = None,
+):
+    """区间流水及窗口函数累计的数量与金额，按 (时间, 流水ID) 排序
+
+    累计值在子查询内对整个区间计算，再按游标取页，翻页不影响结存数字。
+    """
+    quantity, amount = _signed_columns()
+    window = {
+        "order_by": (InventoryTransaction.created_at, InventoryTransaction.transaction_id),
+        "rows": (None, 0),
+    }
+    movements = (
+        db.query(
+            InventoryTransaction.transaction_id.label("transaction_id"),
+            InventoryTransaction.created_at.label("created_at"),
+            InventoryTransaction.type.label("type"),
+            InventoryTransaction.source_type.label("source_type"),
+            InventoryTransaction.source_id.label("source_id"),
+            quantity.label("quantity"),
+            InventoryTransaction.unit_cost.label("unit_cost"),
+            amount.label("amount"),
+            func.sum(quantity).over(**window).label("cumulative_quantity"),
+            func.sum(amount).over(**window).label("cumulative_value"),
+            InventoryTransaction.warehouse_location.label("warehouse_location"),
+            InventoryTransaction.remark.label("remark"),
+        )
+        .filter(*_stock_card_range(company_id, product_id, start_date, end_date))
+        .subquery()
+    )
+
+    query = db.query(movements)
+    if cursor:
+        after_time, after_id = cursor
+        query = query.filter(
+            or_(
+                movements.c.created_at > after_time,
+                and_(
+                    movements.c.created_at == after_time,
+                    movements.c.transaction_id > after_id,
+                ),
+            )
+        )
+    return query.order_by(movements.c.created_at, movements.c.transaction_id)
+
+
+def _parse_stock_card_cursor(cursor: Optional[str]) -> Optional[tuple]:
+    """游标格式：<ISO 时间>,<流水ID>"""
+    if not cursor:
+        return None
+    try:
+        created_at, transaction_id = cursor.split(",", 1)
+        return datetime.fromisoformat(created_at), transaction_id
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的分页游标")
+
+
+def _round2(value) -> Decimal:
+    return Decimal(str(value or 0)).quantize(Decimal("0.01"))
+
+
+def _stock_card_rows(rows, opening_quantity: Decimal, opening_value: Decimal):
+    """流水行 -> 台账行（累计值加上期初）"""
+    for row in rows:
+        yield {
+            "transaction_id": row.transaction_id,
+            "created_at": row.created_at,
+            "type": row.type,
+            "source_type": row.source_type,
+            "source_id": row.source_id,
+            "quantity": _round2(row.quantity),
+            "unit_cost": row.unit_cost,
+            "amount": _round2(row.amount),
+            "running_quantity": _round2(opening_quantity + _round2(row.cumulative_quantity)),
+            "running_value": _round2(opening_value + Decimal(str(row.cumulative_value))),
+            "warehouse_location": row.warehouse_location,
+            "remark": row.remark,
+        }
+
+
+def _to_float(value):
+    return float(value) if value is not None else None
+
+
+@router.get("/stock-card/{product_id}", response_model=dict)
+@async_db_route
+def get_stock_card(
+    product_id: str,
+    start_date: Optional[date] = Query(None, description="开始日期（含）"),
+    end_date: Optional[date] = Query(None, description="结束日期（含）"),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor"),
+    limit: int = Query(100, ge=1, le=1000),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_async_read_db),
+):
+    """商品库存台账：期初结存、逐笔流水及累计结存数量/金额（游标分页）"""
+    company_id = current_user.company_id
+    product = _get_product(db, company_id, product_id)
+    opening_quantity, opening_value = _stock_card_opening(
+        db, company_id, product_id, start_date
+    )
+
+    rows = (
+        _stock_card_query(
+            db,
+            company_id,
+            product_id,
+            start_date,
+            end_date,
+            _parse_stock_card_cursor(cursor),
+        )
+        .limit(limit + 1)
+        .all()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    movements = []
+    for row in _stock_card_rows(rows, opening_quantity, opening_value):
+        row["created_at"] = row["created_at"].isoformat() if row["created_at"] else None
+        for key in ("quantity", "unit_cost", "amount", "running_quantity", "running_value"):
+            row[key] = _to_float(row[key])
+        movements.append(row)
+
+    next_cursor = None
+    if has_more and movements:
+        next_cursor = f"{movements[-1]['created_at']},{movements[-1]['transaction_id']}"
+
+    return success_response(
+        data={
+            "product_id": product.product_id,
+            "product_sku": product.sku,
+            "product_name": product.name,
+            "start_date": start_date.isoformat() if start_date else None,
+            "end_date": end_date.isoformat() if end_date else None,
+            "opening_quantity": float(opening_quantity),
+            "opening_value": float(opening_value),
+            "movements": movements,
+            "next_cursor": next_cursor,
+        }
+    )
+
+
+@router.get("/stock-card/{product_id}/export")
+def export_stock_card(
+    product_id: str,
+    start_date: Optional[date] = Query(None, description="开始日期（含）"),
+    end_date: Optional[date] = Query(None, description="结束日期（含）"),
+    format: str = Query("xlsx", pattern="^(csv|xlsx)$", description="导出格式"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+):
+    """导出商品库存台账（CSV 逐行流式输出 / Excel 只写模式）"""
+    company_id = current_user.company_id
+    product = _get_product(db, company_id, product_id)
+    opening_quantity, opening_value = _stock_card_opening(
+        db, company_id, product_id, start_date
+    )
+    query = _stock_card_query(db, company_id, product_id, start_date, end_date)
+    period = f"{start_date or '最早'} 至 {end_date or '至今'}"
+
+    def values():
+        yield ["期初结存", "", "", "", "", "", "", opening_quantity, opening_value, "", ""]
+        for row in _stock_card_rows(
+            query.yield_per(1000), opening_quantity, opening_value
+        ):
+            yield [
+                row["created_at"].strftime("%Y-%m-%d %H:%M:%S") if row["created_at"] else "",
+                "入库" if row["type"] == "IN" else "出库",
+                row["source_type"],
+                row["source_id"] or "",
+                row["quantity"],
+                row["unit_cost"] if row["unit_cost"] is not None else "",
+                row["amount"],
+                row["running_quantity"],
+                row["running_value"],
+                row["warehouse_location"] or "",
+                row["remark"] or "",
+            ]
+
+    filename = f"库存台账_{product.sku}_{start_date or ''}_{end_date or ''}"
+    if format == "xlsx":
+        return write_only_excel_response(
+            filename=f"{filename}.xlsx",
+            sheet_title="库存台账",
+            title=f"库存台账 - {product.name}（{product.sku}）",
+            subtitle=f"期间：{period}",
+            headers=STOCK_CARD_HEADERS,
+            rows=([float(v) if isinstance(v, Decimal) else v for v in row] for row in values()),
+            column_widths=[20, 8, 12, 38, 12, 12, 14, 12, 14, 16, 30],
+        )
+
+    def csv_lines():
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        buffer.write("\ufeff")  # Excel 识别 UTF-8
+        writer.writerow(STOCK_CARD_HEADERS)
+        for row in values():
+            writer.writerow(row)
+            if buffer.tell() > 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    return StreamingResponse(
+        csv_lines(),
+        media_type="text/csv; charset=utf-8",
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{quote(filename + '.csv', safe='')}"
+        },
+    )
@@ -5,7 +5,7 @@ from decimal import Decimal
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import async_db_route, get_db
 from app.models.account import Account
 from app.models.journal import JournalEntry, LedgerLine
 from app.schemas.journal import (
@@ -15,6 +15,7 @@ from app.schemas.journal import (
 )
 from app.utils.auth import get_current_user, require_permission
 from app.utils.helpers import success_response
+from app.utils.read_db import get_async_read_db
 
 router = APIRouter(prefix="/journals", tags=["会计分录"])
 
@@ -83,9 +84,10 @@ def create_journal_entry(
 
 
 @router.get("", response_model=dict)
+@async_db_route
 def get_journal_entries(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     skip: int = 0,
     limit: int = 20,
 ):
@@ -127,10 +129,11 @@ def get_journal_entry(
 
 
 @router.get("/account/{account_id}/ledger", response_model=dict)
+@async_db_route
 def get_account_ledger(
     account_id: str,
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     skip: int = 0,
     limit: int = 50,
 ):
@@ -1,13 +1,14 @@
 """订单管理路由"""
 
+import uuid
 from datetime import date
 from decimal import Decimal
 
-from fastapi import APIRouter, Body, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Body, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
 
-from app.database import get_db
-from app.models.account import Account
+from app.database import async_db_route, get_db
 from app.models.customer import Customer
 from app.models.inventory import InventoryItem, InventoryTransaction
 from app.models.journal import JournalEntry, LedgerLine
@@ -19,15 +20,28 @@ from app.models.order import (
 )
 from app.models.supplier import Supplier
 from app.schemas.order import (
+    PostPurchaseOrderBatchRequest,
     PostPurchaseOrderRequest,
+    PostSalesOrderBatchRequest,
     PostSalesOrderRequest,
     PurchaseOrderCreate,
     PurchaseOrderResponse,
     SalesOrderCreate,
     SalesOrderResponse,
 )
+from app.utils.account_codes import get_account_ids
 from app.utils.auth import get_current_user, require_permission
+from app.utils.costing import (
+    FifoCostLayers,
+    add_cost_layers,
+    cost_layer_row,
+    fifo_enabled,
+    unit_cost_of,
+)
 from app.utils.helpers import success_response
+from app.utils.inventory_locations import StockLocations
+from app.utils.read_db import get_async_read_db
+from app.utils.receivables import adjust_customer_receivable
 
 router = APIRouter(tags=["订单管理"])
 
@@ -73,21 +87,24 @@ def create_purchase_order(
     db.add(purchase_order)
     db.flush()
 
-    # 创建订单明细
-    from app.models.order import PurchaseOrderItem
-
-    for item_data in order_data.items:
-        subtotal = item_data.quantity * item_data.unit_price * item_data.discount_rate
-        item = PurchaseOrderItem(
-            purchase_order_id=purchase_order.po_id,
-            product_id=item_data.product_id,
-            product_name=item_data.product_name,
-            quantity=item_data.quantity,
-            unit_price=item_data.unit_price,
-            discount_rate=item_data.discount_rate,
-            subtotal=subtotal,
-        )
-        db.add(item)
+    # 创建订单明细（预先生成主键，整批写入一条多行 INSERT；订单总金额在提交时按订单汇总一次）
+    db.add_all(
+        [
+            PurchaseOrderItem(
+                item_id=str(uuid.uuid4()),
+                purchase_order_id=purchase_order.po_id,
+                product_id=item_data.product_id,
+                product_name=item_data.product_name,
+                quantity=item_data.quantity,
+                unit_price=item_data.unit_price,
+                discount_rate=item_data.discount_rate,
+                subtotal=item_data.quantity
+                * item_data.unit_price
+                * item_data.discount_rate,
+            )
+            for item_data in order_data.items
+        ]
+    )
 
     db.commit()
     db.refresh(purchase_order)
@@ -99,14 +116,44 @@ def create_purchase_order(
 
 
 @router.get("/purchase/orders", response_model=dict)
+@async_db_route
 def get_purchase_orders(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     status: str = None,
     skip: int = 0,
     limit: int = 20,
+    fields: str = Query(
+        "full", pattern="^(full|summary)$", description="full=含明细，summary=仅表头"
+    ),
 ):
-    """获取采购订单列表"""
+    """获取采购订单列表
+
+    fields=summary 时只查询表头列（Core 查询，不构造 ORM 对象），适合大列表；
+    默认返回完整订单，明细与供应商批量预加载。
+    """
+    if fields == "summary":
+        stmt = (
+            select(
+                PurchaseOrder.po_id,
+                PurchaseOrder.supplier_id,
+                Supplier.name.label("supplier_name"),
+                PurchaseOrder.date,
+                PurchaseOrder.expected_delivery_date,
+                PurchaseOrder.total_amount,
+                PurchaseOrder.status,
+                PurchaseOrder.created_at,
+            )
+            .outerjoin(Supplier, Supplier.supplier_id == PurchaseOrder.supplier_id)
+            .where(PurchaseOrder.company_id == current_user.company_id)
+        )
+        if status:
+            stmt = stmt.where(PurchaseOrder.status == status)
+        stmt = stmt.order_by(PurchaseOrder.created_at.desc()).offset(skip).limit(limit)
+        return success_response(
+            data=[dict(row) for row in db.execute(stmt).mappings()]
+        )
+
     query = db.query(PurchaseOrder).filter(
         PurchaseOrder.company_id == current_user.company_id
     )
@@ -115,12 +162,22 @@ def get_purchase_orders(
         query = query.filter(PurchaseOrder.status == status)
 
     orders = (
-        query.order_by(PurchaseOrder.created_at.desc()).offset(skip).limit(limit).all()
+        query.options(
+            selectinload(PurchaseOrder.items),
+            selectinload(PurchaseOrder.supplier),
+        )
+        .order_by(PurchaseOrder.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
     )
 
-    return success_response(
-        data=[PurchaseOrderResponse.from_orm(o).dict() for o in orders]
-    )
+    data = []
+    for o in orders:
+        item = PurchaseOrderResponse.from_orm(o).dict()
+        item["supplier_name"] = o.supplier.name if o.supplier else None
+        data.append(item)
+    return success_response(data=data)
 
 
 @router.get("/purchase/orders/{po_id}", response_model=dict)
@@ -173,28 +230,13 @@ def post_purchase_order(
     # 获取仓库位置信息（如果有）
     warehouse_locations = post_data.warehouse_locations if post_data else {}
 
-    # 查找必需的会计科目
-    # 库存商品（资产类）- 借方
-    inventory_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "1405",  # 库存商品
-        )
-        .first()
-    )
-
-    # 应付账款（负债类）- 贷方
-    payable_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "2202",  # 应付账款
-        )
-        .first()
-    )
+    # 查找必需的会计科目（编码缓存）
+    # 库存商品（资产类）1405 - 借方；应付账款（负债类）2202 - 贷方
+    account_ids = get_account_ids(db, current_user.company_id, ["1405", "2202"])
+    inventory_account_id = account_ids["1405"]
+    payable_account_id = account_ids["2202"]
 
-    if not inventory_account or not payable_account:
+    if not inventory_account_id or not payable_account_id:
         raise HTTPException(
             status_code=400,
             detail="缺少必需的会计科目（1405-库存商品 或 2202-应付账款），请先创建",
@@ -202,6 +244,8 @@ def post_purchase_order(
 
     try:
         # 1. 创建库存流水（入库）
+        cost_layers = []
+        opening_stock = {}  # 入库前的库存，用于补齐先进先出期初成本层
         for item in order.items:
             if item.product_id:
                 # 获取或创建库存记录
@@ -239,6 +283,9 @@ def post_purchase_order(
                 old_quantity = inventory.quantity
                 old_average_cost = inventory.average_cost or Decimal("0")
                 new_quantity = item.quantity
+                opening_stock.setdefault(
+                    item.product_id, (old_quantity, old_average_cost)
+                )
 
                 if old_quantity + new_quantity > 0:
                     new_average_cost = (
@@ -269,6 +316,21 @@ def post_purchase_order(
                 inventory.average_cost = new_average_cost
                 db.flush()
 
+                # 先进先出计价：记录本批次成本层
+                if fifo_enabled():
+                    cost_layers.append(
+                        cost_layer_row(
+                            current_user.company_id,
+                            item.product_id,
+                            item.quantity,
+                            purchase_unit_price,
+                            "PO",
+                            order.po_id,
+                        )
+                    )
+
+        add_cost_layers(db, cost_layers, opening_stock)
+
         # 2. 创建会计分录
         # 借：库存商品  贷：应付账款
         journal = JournalEntry(
@@ -288,7 +350,7 @@ def post_purchase_order(
         # 借方：库存商品
         debit_line = LedgerLine(
             journal_id=journal.journal_id,
-            account_id=inventory_account.account_id,
+            account_id=inventory_account_id,
             debit=order.total_amount,
             credit=0,
             memo=f"采购入库",
@@ -298,7 +360,7 @@ def post_purchase_order(
         # 贷方：应付账款
         credit_line = LedgerLine(
             journal_id=journal.journal_id,
-            account_id=payable_account.account_id,
+            account_id=payable_account_id,
             debit=0,
             credit=order.total_amount,
             memo=f"应付供应商",
@@ -321,6 +383,237 @@ def post_purchase_order(
         raise HTTPException(status_code=500, detail=f"过账失败：{str(e)}")
 
 
+def _load_inventory_items(
+    db: Session, company_id: str, product_ids: set
+) -> dict[str, InventoryItem]:
+    """一次查询加载（并锁定）批量过账涉及的库存记录，key 为 product_id"""
+    if not product_ids:
+        return {}
+    items = (
+        db.query(InventoryItem)
+        .filter(
+            InventoryItem.company_id == company_id,
+            InventoryItem.product_id.in_(product_ids),
+        )
+        .order_by(InventoryItem.inventory_id)
+        .with_for_update()
+        .all()
+    )
+    inventories = {}
+    for inventory in items:
+        inventories.setdefault(inventory.product_id, inventory)
+    return inventories
+
+
+@router.post("/purchase/orders/post-batch", response_model=dict)
+def post_purchase_orders_batch(
+    batch_data: PostPurchaseOrderBatchRequest,
+    current_user=Depends(require_permission("purchase:create")),
+    db: Session = Depends(get_db),
+):
+    """采购订单批量过账
+
+    一次性加载全部订单和库存记录，在内存中按订单顺序计算加权平均成本，
+    库存流水、会计分录批量写入，每个库存记录只更新一次平均成本。
+    不存在或非草稿状态的订单跳过并返回失败原因，不影响其他订单。
+    """
+    company_id = current_user.company_id
+    po_ids = list(dict.fromkeys(batch_data.po_ids))
+
+    orders = {
+        order.po_id: order
+        for order in db.query(PurchaseOrder)
+        .options(selectinload(PurchaseOrder.items))
+        .filter(
+            PurchaseOrder.po_id.in_(po_ids),
+            PurchaseOrder.company_id == company_id,
+        )
+        .with_for_update()
+    }
+
+    failed = []
+    to_post = []
+    for po_id in po_ids:
+        order = orders.get(po_id)
+        if not order:
+            failed.append({"order_id": po_id, "reason": "采购订单不存在"})
+        elif order.status != "Draft":
+            failed.append(
+                {
+                    "order_id": po_id,
+                    "reason": f"订单状态为 {order.status}，只有草稿状态才能过账",
+                }
+            )
+        else:
+            to_post.append(order)
+
+    if not to_post:
+        return success_response(
+            data={"posted": [], "failed": failed}, message="没有可过账的采购订单"
+        )
+
+    account_ids = get_account_ids(db, company_id, ["1405", "2202"])
+    inventory_account_id = account_ids["1405"]
+    payable_account_id = account_ids["2202"]
+
+    if not inventory_account_id or not payable_account_id:
+        raise HTTPException(
+            status_code=400,
+            detail="缺少必需的会计科目（1405-库存商品 或 2202-应付账款），请先创建",
+        )
+
+    try:
+        product_ids = {
+            item.product_id
+            for order in to_post
+            for item in order.items
+            if item.product_id
+        }
+        inventories = _load_inventory_items(db, company_id, product_ids)
+
+        # 内存中滚动维护数量与平均成本（数量仍由触发器根据流水写回）
+        quantities = {
+            product_id: inventory.quantity or Decimal("0")
+            for product_id, inventory in inventories.items()
+        }
+        average_costs = {
+            product_id: inventory.average_cost or Decimal("0")
+            for product_id, inventory in inventories.items()
+        }
+
+        # 入库前的库存，用于补齐先进先出期初成本层
+        opening_stock = {
+            product_id: (quantities[product_id], average_costs[product_id])
+            for product_id in inventories
+        }
+
+        transactions = []
+        cost_layers = []
+        journals = []
+        lines = []
+        for order in to_post:
+            warehouse_locations = batch_data.warehouse_locations.get(order.po_id, {})
+
+            # 1. 入库流水
+            for item in order.items:
+                if not item.product_id:
+                    continue
+
+                inventory = inventories.get(item.product_id)
+                if inventory is None:
+                    inventory = InventoryItem(
+                        inventory_id=str(uuid.uuid4()),
+                        product_id=item.product_id,
+                        company_id=company_id,
+                        quantity=0,
+                        average_cost=0,
+                    )
+                    db.add(inventory)
+                    inventories[item.product_id] = inventory
+                    quantities[item.product_id] = Decimal("0")
+                    average_costs[item.product_id] = Decimal("0")
+
+                # 加权平均成本，公式同单张过账
+                purchase_unit_price = item.unit_price * item.discount_rate
+                old_quantity = quantities[item.product_id]
+                new_quantity = old_quantity + item.quantity
+                if new_quantity > 0:
+                    average_costs[item.product_id] = (
+                        old_quantity * average_costs[item.product_id]
+                        + item.quantity * purchase_unit_price
+                    ) / new_quantity
+                else:
+                    average_costs[item.product_id] = purchase_unit_price
+                quantities[item.product_id] = new_quantity
+
+                transactions.append(
+                    InventoryTransaction(
+                        transaction_id=str(uuid.uuid4()),
+                        company_id=company_id,
+                        product_id=item.product_id,
+                        inventory_id=inventory.inventory_id,
+                        type="IN",
+                        quantity=item.quantity,
+                        unit_cost=purchase_unit_price,
+                        source_type="PO",
+                        source_id=order.po_id,
+                        warehouse_location=warehouse_locations.get(item.product_id),
+                        remark=f"采购入库：{item.product_name}",
+                    )
+                )
+                if fifo_enabled():
+                    cost_layers.append(
+                        cost_layer_row(
+                            company_id,
+                            item.product_id,
+                            item.quantity,
+                            purchase_unit_price,
+                            "PO",
+                            order.po_id,
+                        )
+                    )
+
+            # 2. 会计分录：借 库存商品  贷 应付账款
+            journal_id = str(uuid.uuid4())
+            journals.append(
+                JournalEntry(
+                    journal_id=journal_id,
+                    company_id=company_id,
+                    date=order.date,
+                    description=f"采购入库 - 订单号：{order.po_id[:8]}",
+                    source_type="PO",
+                    source_id=order.po_id,
+                    total_debit=order.total_amount,
+                    total_credit=order.total_amount,
+                    posted=True,
+                    posted_by=current_user.user_id,
+                )
+            )
+            lines.append(
+                LedgerLine(
+                    journal_id=journal_id,
+                    account_id=inventory_account_id,
+                    debit=order.total_amount,
+                    credit=0,
+                    memo="采购入库",
+                )
+            )
+            lines.append(
+                LedgerLine(
+                    journal_id=journal_id,
+                    account_id=payable_account_id,
+                    debit=0,
+                    credit=order.total_amount,
+                    memo="应付供应商",
+                )
+            )
+
+            # 3. 更新订单状态
+            order.status = "Posted"
+
+        # 每个库存记录只更新一次平均成本
+        for product_id, inventory in inventories.items():
+            if inventory.average_cost != average_costs[product_id]:
+                inventory.average_cost = average_costs[product_id]
+
+        # 主键已预先生成，flush 时同类记录合并为批量 INSERT
+        db.add_all(transactions)
+        db.add_all(journals)
+        db.add_all(lines)
+        add_cost_layers(db, cost_layers, opening_stock)
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"批量过账失败：{str(e)}")
+
+    posted = [order.po_id for order in to_post]
+    return success_response(
+        data={"posted": posted, "failed": failed},
+        message=f"批量过账完成：成功 {len(posted)} 张，失败 {len(failed)} 张",
+    )
+
+
 # ==================== 销售订单 ====================
 
 
@@ -364,34 +657,8 @@ def create_sales_order(
                 detail="该客户没有设置信用额度，不能使用赊销方式",
             )
 
-        # 计算客户当前欠款（所有已过账但未完全收款的赊销订单的未收金额总和）
-        from sqlalchemy import func
-
-        from app.models.payment import Receipt
-
-        # 查询该客户所有已过账的赊销订单
-        posted_credit_orders = (
-            db.query(SalesOrder)
-            .filter(
-                SalesOrder.customer_id == order_data.customer_id,
-                SalesOrder.company_id == current_user.company_id,
-                SalesOrder.payment_method == "Credit",
-                SalesOrder.status == "Posted",  # 只有已过账的才产生应收账款
-            )
-            .all()
-        )
-
-        # 计算所有已过账赊销订单的未收金额总和
-        current_debt = Decimal("0")
-        for order in posted_credit_orders:
-            # 计算该订单的已收金额
-            received_amount = db.query(func.sum(Receipt.amount)).filter(
-                Receipt.sales_order_id == order.so_id,
-                Receipt.company_id == current_user.company_id,
-            ).scalar() or Decimal("0")
-            # 计算未收金额
-            unreceived_amount = order.total_amount - received_amount
-            current_debt += unreceived_amount
+        # 客户当前欠款（已过账赊销订单的未收金额合计，过账/收款时维护）
+        current_debt = customer.outstanding_receivable or Decimal("0")
 
         # 检查加上本次订单金额后是否超出信用额度
         if current_debt + total_amount > customer.credit_limit:
@@ -415,21 +682,24 @@ def create_sales_order(
     db.add(sales_order)
     db.flush()
 
-    # 创建订单明细
-    from app.models.order import SalesOrderItem
-
-    for item_data in order_data.items:
-        subtotal = item_data.quantity * item_data.unit_price * item_data.discount_rate
-        item = SalesOrderItem(
-            sales_order_id=sales_order.so_id,
-            product_id=item_data.product_id,
-            product_name=item_data.product_name,
-            quantity=item_data.quantity,
-            unit_price=item_data.unit_price,
-            discount_rate=item_data.discount_rate,
-            subtotal=subtotal,
-        )
-        db.add(item)
+    # 创建订单明细（预先生成主键，整批写入一条多行 INSERT；订单总金额在提交时按订单汇总一次）
+    db.add_all(
+        [
+            SalesOrderItem(
+                item_id=str(uuid.uuid4()),
+                sales_order_id=sales_order.so_id,
+                product_id=item_data.product_id,
+                product_name=item_data.product_name,
+                quantity=item_data.quantity,
+                unit_price=item_data.unit_price,
+                discount_rate=item_data.discount_rate,
+                subtotal=item_data.quantity
+                * item_data.unit_price
+                * item_data.discount_rate,
+            )
+            for item_data in order_data.items
+        ]
+    )
 
     db.commit()
     db.refresh(sales_order)
@@ -440,14 +710,46 @@ def create_sales_order(
 
 
 @router.get("/sales/orders", response_model=dict)
+@async_db_route
 def get_sales_orders(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     status: str = None,
     skip: int = 0,
     limit: int = 20,
+    fields: str = Query(
+        "full", pattern="^(full|summary)$", description="full=含明细，summary=仅表头"
+    ),
 ):
-    """获取销售订单列表"""
+    """获取销售订单列表
+
+    fields=summary 时只查询表头列（Core 查询，不构造 ORM 对象），适合大列表；
+    默认返回完整订单，明细与客户批量预加载。
+    """
+    if fields == "summary":
+        stmt = (
+            select(
+                SalesOrder.so_id,
+                SalesOrder.customer_id,
+                Customer.name.label("customer_name"),
+                SalesOrder.date,
+                SalesOrder.expected_delivery_date,
+                SalesOrder.total_amount,
+                SalesOrder.received_amount,
+                SalesOrder.payment_method,
+                SalesOrder.status,
+                SalesOrder.created_at,
+            )
+            .outerjoin(Customer, Customer.customer_id == SalesOrder.customer_id)
+            .where(SalesOrder.company_id == current_user.company_id)
+        )
+        if status:
+            stmt = stmt.where(SalesOrder.status == status)
+        stmt = stmt.order_by(SalesOrder.created_at.desc()).offset(skip).limit(limit)
+        return success_response(
+            data=[dict(row) for row in db.execute(stmt).mappings()]
+        )
+
     query = db.query(SalesOrder).filter(
         SalesOrder.company_id == current_user.company_id
     )
@@ -456,12 +758,22 @@ def get_sales_orders(
         query = query.filter(SalesOrder.status == status)
 
     orders = (
-        query.order_by(SalesOrder.created_at.desc()).offset(skip).limit(limit).all()
+        query.options(
+            selectinload(SalesOrder.items),
+            selectinload(SalesOrder.customer),
+        )
+        .order_by(SalesOrder.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
     )
 
-    return success_response(
-        data=[SalesOrderResponse.from_orm(o).dict() for o in orders]
-    )
+    data = []
+    for o in orders:
+        item = SalesOrderResponse.from_orm(o).dict()
+        item["customer_name"] = o.customer.name if o.customer else None
+        data.append(item)
+    return success_response(data=data)
 
 
 @router.get("/sales/orders/{so_id}", response_model=dict)
@@ -512,13 +824,14 @@ def post_sales_order(
 
     # 如果是赊销，在过账时检查信用额度（过账后才真正产生应收账款）
     if order.payment_method == "Credit":
-        # 获取客户信息
+        # 获取客户信息（锁定客户行，保证并发过账时欠款校验与累加一致）
         customer = (
             db.query(Customer)
             .filter(
                 Customer.customer_id == order.customer_id,
                 Customer.company_id == current_user.company_id,
             )
+            .with_for_update()
             .first()
         )
 
@@ -532,35 +845,8 @@ def post_sales_order(
                 detail="该客户没有设置信用额度，不能对赊销订单进行过账",
             )
 
-        # 计算客户当前欠款（所有已过账但未完全收款的赊销订单的未收金额总和）
-        from sqlalchemy import func
-
-        from app.models.payment import Receipt
-
-        # 查询该客户所有已过账的赊销订单（不包括当前订单）
-        posted_credit_orders = (
-            db.query(SalesOrder)
-            .filter(
-                SalesOrder.customer_id == order.customer_id,
-                SalesOrder.company_id == current_user.company_id,
-                SalesOrder.payment_method == "Credit",
-                SalesOrder.status == "Posted",  # 只有已过账的才产生应收账款
-                SalesOrder.so_id != order.so_id,  # 排除当前订单
-            )
-            .all()
-        )
-
-        # 计算所有已过账赊销订单的未收金额总和
-        current_debt = Decimal("0")
-        for posted_order in posted_credit_orders:
-            # 计算该订单的已收金额
-            received_amount = db.query(func.sum(Receipt.amount)).filter(
-                Receipt.sales_order_id == posted_order.so_id,
-                Receipt.company_id == current_user.company_id,
-            ).scalar() or Decimal("0")
-            # 计算未收金额
-            unreceived_amount = posted_order.total_amount - received_amount
-            current_debt += unreceived_amount
+        # 客户当前欠款（已过账赊销订单的未收金额合计，不含当前草稿订单）
+        current_debt = customer.outstanding_receivable or Decimal("0")
 
         # 检查加上本次订单金额后是否超出信用额度
         if current_debt + order.total_amount > customer.credit_limit:
@@ -572,57 +858,27 @@ def post_sales_order(
                 f"请先收款或调整信用额度后再过账。",
             )
 
-    # 查找必需的会计科目（按照标准科目）
-    # 库存商品（资产类）- 1405
-    inventory_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "1405",  # 库存商品
-        )
-        .first()
-    )
-
-    # 主营业务收入（收入类）- 6001
-    revenue_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "6001",  # 主营业务收入
-        )
-        .first()
-    )
-
-    # 主营业务成本（费用类）- 6401
-    cost_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "6401",  # 主营业务成本
-        )
-        .first()
-    )
-
-    # 应收账款（资产类）- 1122
+    # 查找必需的会计科目（按照标准科目，编码缓存）
     # 销售收入过账应统一使用应收账款科目，无论付款方式如何
-    receivable_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "1122",  # 应收账款
-        )
-        .first()
+    account_ids = get_account_ids(
+        db, current_user.company_id, ["1405", "6001", "6401", "1122"]
     )
-
-    if not all([inventory_account, revenue_account, cost_account, receivable_account]):
+    inventory_account_id = account_ids["1405"]  # 库存商品
+    revenue_account_id = account_ids["6001"]  # 主营业务收入
+    cost_account_id = account_ids["6401"]  # 主营业务成本
+    receivable_account_id = account_ids["1122"]  # 应收账款
+
+    if not all(
+        [inventory_account_id, revenue_account_id, cost_account_id, receivable_account_id]
+    ):
         missing = []
-        if not inventory_account:
+        if not inventory_account_id:
             missing.append("1405-库存商品")
-        if not revenue_account:
+        if not revenue_account_id:
             missing.append("6001-主营业务收入")
-        if not cost_account:
+        if not cost_account_id:
             missing.append("6401-主营业务成本")
-        if not receivable_account:
+        if not receivable_account_id:
             missing.append("1122-应收账款")
         raise HTTPException(
             status_code=400,
@@ -632,6 +888,20 @@ def post_sales_order(
     try:
         # 1. 检查库存并创建出库流水（简化版：只检查总库存，不涉及位置）
         total_cost = Decimal(0)
+        fifo_layers = (
+            FifoCostLayers(
+                db,
+                current_user.company_id,
+                {item.product_id for item in order.items if item.product_id},
+            )
+            if fifo_enabled()
+            else None
+        )
+        stock_locations = StockLocations(
+            db,
+            current_user.company_id,
+            {item.product_id for item in order.items if item.product_id},
+        )
 
         for item in order.items:
             if item.product_id:
@@ -665,27 +935,41 @@ def post_sales_order(
                         detail=f"商品 {item.product_name} 没有成本信息，请先进行采购入库",
                     )
 
-                unit_cost = inventory.average_cost
-                cost = item.quantity * unit_cost
+                if fifo_layers is not None:
+                    # 先进先出：按入库批次消耗成本层
+                    cost = fifo_layers.consume(
+                        item.product_id, item.quantity, inventory.average_cost
+                    )
+                    unit_cost = unit_cost_of(cost, item.quantity)
+                else:
+                    unit_cost = inventory.average_cost
+                    cost = item.quantity * unit_cost
                 total_cost += cost
 
-                # 创建出库流水（触发器会自动减少库存数量）
-                # 不记录位置信息，因为系统只支持单一仓库
-                transaction = InventoryTransaction(
-                    company_id=current_user.company_id,
-                    product_id=item.product_id,
-                    inventory_id=inventory.inventory_id,
-                    type="OUT",
-                    quantity=item.quantity,
-                    unit_cost=unit_cost,  # 记录出库时的加权平均成本
-                    source_type="SO",
-                    source_id=order.so_id,
-                    warehouse_location=None,  # 不记录位置
-                    remark=f"销售出库：{item.product_name}",
-                )
-                db.add(transaction)
+                # 创建出库流水（触发器会自动减少库存数量及对应位置的数量）
+                # 出库数量按位置库存分配，涉及多个位置时每个位置一条流水
+                for location, quantity in stock_locations.allocate(
+                    item.product_id, item.quantity
+                ):
+                    db.add(
+                        InventoryTransaction(
+                            company_id=current_user.company_id,
+                            product_id=item.product_id,
+                            inventory_id=inventory.inventory_id,
+                            type="OUT",
+                            quantity=quantity,
+                            unit_cost=unit_cost,  # 记录出库时的单位成本
+                            source_type="SO",
+                            source_id=order.so_id,
+                            warehouse_location=location,
+                            remark=f"销售出库：{item.product_name}",
+                        )
+                    )
                 db.flush()  # 立即刷新，确保触发器执行并更新库存数量
 
+        if fifo_layers is not None:
+            fifo_layers.flush()
+
         # 2. 创建会计分录1：确认收入
         # 借：应收账款/银行存款  贷：主营业务收入
         journal_revenue = JournalEntry(
@@ -705,7 +989,7 @@ def post_sales_order(
         # 借方：应收账款/银行存款
         debit_line1 = LedgerLine(
             journal_id=journal_revenue.journal_id,
-            account_id=receivable_account.account_id,
+            account_id=receivable_account_id,
             debit=order.total_amount,
             credit=0,
             memo=f"销售收入",
@@ -715,7 +999,7 @@ def post_sales_order(
         # 贷方：主营业务收入
         credit_line1 = LedgerLine(
             journal_id=journal_revenue.journal_id,
-            account_id=revenue_account.account_id,
+            account_id=revenue_account_id,
             debit=0,
             credit=order.total_amount,
             memo=f"销售收入",
@@ -741,7 +1025,7 @@ def post_sales_order(
         # 借方：主营业务成本
         debit_line2 = LedgerLine(
             journal_id=journal_cost.journal_id,
-            account_id=cost_account.account_id,
+            account_id=cost_account_id,
             debit=total_cost,
             credit=0,
             memo=f"销售成本",
@@ -751,15 +1035,17 @@ def post_sales_order(
         # 贷方：库存商品
         credit_line2 = LedgerLine(
             journal_id=journal_cost.journal_id,
-            account_id=inventory_account.account_id,
+            account_id=inventory_account_id,
             debit=0,
             credit=total_cost,
             memo=f"结转成本",
         )
         db.add(credit_line2)
 
-        # 4. 更新订单状态
+        # 4. 更新订单状态；赊销订单计入客户应收余额
         order.status = "Posted"
+        if order.payment_method == "Credit":
+            adjust_customer_receivable(db, order.customer_id, order.total_amount)
 
         db.commit()
         db.refresh(order)
@@ -775,3 +1061,297 @@ def post_sales_order(
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"过账失败：{str(e)}")
+
+
+@router.post("/sales/orders/post-batch", response_model=dict)
+def post_sales_orders_batch(
+    batch_data: PostSalesOrderBatchRequest,
+    current_user=Depends(require_permission("sales:create")),
+    db: Session = Depends(get_db),
+):
+    """销售订单批量过账
+
+    一条 SELECT ... FOR UPDATE 锁定全部涉及的库存记录，按订单顺序在内存中
+    扣减可用库存（同一商品的需求跨订单累计），并按客户累计校验信用额度。
+    校验失败的订单跳过并返回原因，其余订单的流水、分录批量写入。
+    """
+    company_id = current_user.company_id
+    so_ids = list(dict.fromkeys(batch_data.so_ids))
+
+    orders = {
+        order.so_id: order
+        for order in db.query(SalesOrder)
+        .options(selectinload(SalesOrder.items))
+        .filter(
+            SalesOrder.so_id.in_(so_ids),
+            SalesOrder.company_id == company_id,
+        )
+        .with_for_update()
+    }
+
+    failed = []
+    candidates = []
+    for so_id in so_ids:
+        order = orders.get(so_id)
+        if not order:
+            failed.append({"order_id": so_id, "reason": "销售订单不存在"})
+        elif order.status != "Draft":
+            failed.append(
+                {
+                    "order_id": so_id,
+                    "reason": f"订单状态为 {order.status}，只有草稿状态才能过账",
+                }
+            )
+        else:
+            candidates.append(order)
+
+    if not candidates:
+        return success_response(
+            data={"posted": [], "failed": failed}, message="没有可过账的销售订单"
+        )
+
+    account_ids = get_account_ids(db, company_id, ["1405", "6001", "6401", "1122"])
+    inventory_account_id = account_ids["1405"]  # 库存商品
+    revenue_account_id = account_ids["6001"]  # 主营业务收入
+    cost_account_id = account_ids["6401"]  # 主营业务成本
+    receivable_account_id = account_ids["1122"]  # 应收账款
+
+    missing = [
+        label
+        for account_id, label in (
+            (inventory_account_id, "1405-库存商品"),
+            (revenue_account_id, "6001-主营业务收入"),
+            (cost_account_id, "6401-主营业务成本"),
+            (receivable_account_id, "1122-应收账款"),
+        )
+        if not account_id
+    ]
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"缺少必需的会计科目：{', '.join(missing)}，请先创建",
+        )
+
+    try:
+        # 赊销订单涉及的客户一次查询并锁定，当前欠款直接取客户应收余额
+        credit_customer_ids = {
+            order.customer_id
+            for order in candidates
+            if order.payment_method == "Credit"
+        }
+        customers = {}
+        if credit_customer_ids:
+            customers = {
+                customer.customer_id: customer
+                for customer in db.query(Customer)
+                .filter(
+                    Customer.customer_id.in_(credit_customer_ids),
+                    Customer.company_id == company_id,
+                )
+                .order_by(Customer.customer_id)
+                .with_for_update()
+            }
+        current_debts = {
+            customer_id: customer.outstanding_receivable or Decimal("0")
+            for customer_id, customer in customers.items()
+        }
+
+        product_ids = {
+            item.product_id
+            for order in candidates
+            for item in order.items
+            if item.product_id
+        }
+        inventories = _load_inventory_items(db, company_id, product_ids)
+        available = {
+            product_id: inventory.quantity or Decimal("0")
+            for product_id, inventory in inventories.items()
+        }
+        fifo_layers = (
+            FifoCostLayers(db, company_id, product_ids) if fifo_enabled() else None
+        )
+        stock_locations = StockLocations(db, company_id, product_ids)
+
+        to_post = []
+        transactions = []
+        journals = []
+        lines = []
+        for order in candidates:
+            # 1. 信用额度校验（批内同一客户的赊销订单累计计算）
+            if order.payment_method == "Credit":
+                customer = customers.get(order.customer_id)
+                if not customer:
+                    failed.append({"order_id": order.so_id, "reason": "客户不存在"})
+                    continue
+                if customer.credit_limit <= 0:
+                    failed.append(
+                        {
+                            "order_id": order.so_id,
+                            "reason": "该客户没有设置信用额度，不能对赊销订单进行过账",
+                        }
+                    )
+                    continue
+                current_debt = current_debts.get(order.customer_id, Decimal("0"))
+                if current_debt + order.total_amount > customer.credit_limit:
+                    failed.append(
+                        {
+                            "order_id": order.so_id,
+                            "reason": f"超出信用额度！当前欠款: ¥{current_debt:.2f}, "
+                            f"本次订单金额: ¥{order.total_amount:.2f}, "
+                            f"信用额度: ¥{customer.credit_limit:.2f}",
+                        }
+                    )
+                    continue
+
+            # 2. 库存校验：订单内同一商品的需求先合并，再与批内剩余库存比较
+            demand = {}
+            for item in order.items:
+                if item.product_id:
+                    demand[item.product_id] = (
+                        demand.get(item.product_id, Decimal("0")) + item.quantity
+                    )
+
+            reason = None
+            for item in order.items:
+                if not item.product_id:
+                    continue
+                inventory = inventories.get(item.product_id)
+                if inventory is None:
+                    reason = f"商品 {item.product_name} 没有库存记录"
+                elif available[item.product_id] < demand[item.product_id]:
+                    reason = (
+                        f"商品 {item.product_name} 库存不足，"
+                        f"当前可用：{available[item.product_id]}，"
+                        f"需要：{demand[item.product_id]}"
+                    )
+                elif not inventory.average_cost:
+                    reason = f"商品 {item.product_name} 没有成本信息，请先进行采购入库"
+                if reason:
+                    break
+            if reason:
+                failed.append({"order_id": order.so_id, "reason": reason})
+                continue
+
+            # 3. 校验通过：扣减可用库存，生成出库流水并计算成本
+            total_cost = Decimal("0")
+            for item in order.items:
+                if not item.product_id:
+                    continue
+                inventory = inventories[item.product_id]
+                if fifo_layers is not None:
+                    cost = fifo_layers.consume(
+                        item.product_id, item.quantity, inventory.average_cost
+                    )
+                    unit_cost = unit_cost_of(cost, item.quantity)
+                else:
+                    unit_cost = inventory.average_cost
+                    cost = item.quantity * unit_cost
+                total_cost += cost
+                available[item.product_id] -= item.quantity
+                for location, quantity in stock_locations.allocate(
+                    item.product_id, item.quantity
+                ):
+                    transactions.append(
+                        InventoryTransaction(
+                            transaction_id=str(uuid.uuid4()),
+                            company_id=company_id,
+                            product_id=item.product_id,
+                            inventory_id=inventory.inventory_id,
+                            type="OUT",
+                            quantity=quantity,
+                            unit_cost=unit_cost,
+                            source_type="SO",
+                            source_id=order.so_id,
+                            warehouse_location=location,
+                            remark=f"销售出库：{item.product_name}",
+                        )
+                    )
+
+            if order.payment_method == "Credit":
+                current_debts[order.customer_id] += order.total_amount
+                adjust_customer_receivable(db, order.customer_id, order.total_amount)
+
+            # 4. 会计分录：确认收入 + 结转成本
+            revenue_journal_id = str(uuid.uuid4())
+            cost_journal_id = str(uuid.uuid4())
+            journals.append(
+                JournalEntry(
+                    journal_id=revenue_journal_id,
+                    company_id=company_id,
+                    date=order.date,
+                    description=f"销售收入 - 订单号：{order.so_id[:8]}",
+                    source_type="SO",
+                    source_id=order.so_id,
+                    total_debit=order.total_amount,
+                    total_credit=order.total_amount,
+                    posted=True,
+                    posted_by=current_user.user_id,
+                )
+            )
+            journals.append(
+                JournalEntry(
+                    journal_id=cost_journal_id,
+                    company_id=company_id,
+                    date=order.date,
+                    description=f"销售成本 - 订单号：{order.so_id[:8]}",
+                    source_type="SO",
+                    source_id=order.so_id,
+                    total_debit=total_cost,
+                    total_credit=total_cost,
+                    posted=True,
+                    posted_by=current_user.user_id,
+                )
+            )
+            lines.extend(
+                [
+                    LedgerLine(
+                        journal_id=revenue_journal_id,
+                        account_id=receivable_account_id,
+                        debit=order.total_amount,
+                        credit=0,
+                        memo="销售收入",
+                    ),
+                    LedgerLine(
+                        journal_id=revenue_journal_id,
+                        account_id=revenue_account_id,
+                        debit=0,
+                        credit=order.total_amount,
+                        memo="销售收入",
+                    ),
+                    LedgerLine(
+                        journal_id=cost_journal_id,
+                        account_id=cost_account_id,
+                        debit=total_cost,
+                        credit=0,
+                        memo="销售成本",
+                    ),
+                    LedgerLine(
+                        journal_id=cost_journal_id,
+                        account_id=inventory_account_id,
+                        debit=0,
+                        credit=total_cost,
+                        memo="结转成本",
+                    ),
+                ]
+            )
+
+            order.status = "Posted"
+            to_post.append(order)
+
+        # 主键已预先生成，flush 时同类记录合并为批量 INSERT；库存数量由触发器扣减
+        db.add_all(transactions)
+        db.add_all(journals)
+        db.add_all(lines)
+        if fifo_layers is not None:
+            fifo_layers.flush()
+        db.commit()
+
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"批量过账失败：{str(e)}")
+
+    posted = [order.so_id for order in to_post]
+    return success_response(
+        data={"posted": posted, "failed": failed},
+        message=f"批量过账完成：成功 {len(posted)} 张，失败 {len(failed)} 张",
+    )
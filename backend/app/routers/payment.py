@@ -1,24 +1,33 @@
 """付款和收款路由"""
 
+import uuid
 from decimal import Decimal
+from typing import Optional
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session
 
-from app.database import get_db
-from app.models.account import Account
+from app.database import async_db_route, get_db
+from app.models.customer import Customer
 from app.models.journal import JournalEntry, LedgerLine
 from app.models.order import PurchaseOrder, SalesOrder
 from app.models.payment import Payment, Receipt
+from app.models.supplier import Supplier
 from app.schemas.payment import (
+    PaymentBatchCreate,
     PaymentCreate,
     PaymentResponse,
+    ReceiptBatchCreate,
     ReceiptCreate,
     ReceiptResponse,
 )
+from app.utils.account_codes import get_account_ids
+from app.utils.aging import paid_by_order, received_by_order
 from app.utils.auth import get_current_user, require_permission
 from app.utils.helpers import success_response
+from app.utils.read_db import get_async_read_db
+from app.utils.receivables import adjust_customer_receivable
 
 router = APIRouter(tags=["付款收款"])
 
@@ -100,16 +109,6 @@ def create_payment(
     # 自动生成付款分录
     # 借：应付账款  贷：银行存款/库存现金
     try:
-        # 查找应付账款科目（2202）
-        payable_account = (
-            db.query(Account)
-            .filter(
-                Account.company_id == current_user.company_id,
-                Account.code == "2202",  # 应付账款
-            )
-            .first()
-        )
-
         # 根据付款方式选择贷方科目
         if payment_data.payment_method.value == "Cash":
             credit_account_code = "1001"  # 库存现金
@@ -122,20 +121,18 @@ def create_payment(
             credit_account_code = "1002"
             credit_account_name = "银行存款"
 
-        credit_account = (
-            db.query(Account)
-            .filter(
-                Account.company_id == current_user.company_id,
-                Account.code == credit_account_code,
-            )
-            .first()
+        # 应付账款（2202）与贷方科目（编码缓存）
+        account_ids = get_account_ids(
+            db, current_user.company_id, ["2202", credit_account_code]
         )
+        payable_account_id = account_ids["2202"]
+        credit_account_id = account_ids[credit_account_code]
 
-        if not payable_account or not credit_account:
+        if not payable_account_id or not credit_account_id:
             missing = []
-            if not payable_account:
+            if not payable_account_id:
                 missing.append("2202-应付账款")
-            if not credit_account:
+            if not credit_account_id:
                 missing.append(f"{credit_account_code}-{credit_account_name}")
             raise HTTPException(
                 status_code=400,
@@ -160,7 +157,7 @@ def create_payment(
         # 借方：应付账款
         debit_line = LedgerLine(
             journal_id=journal.journal_id,
-            account_id=payable_account.account_id,
+            account_id=payable_account_id,
             debit=payment_data.amount,
             credit=0,
             memo=f"支付供应商货款",
@@ -170,7 +167,7 @@ def create_payment(
         # 贷方：银行存款/库存现金
         credit_line = LedgerLine(
             journal_id=journal.journal_id,
-            account_id=credit_account.account_id,
+            account_id=credit_account_id,
             debit=0,
             credit=payment_data.amount,
             memo=f"付款",
@@ -194,10 +191,158 @@ def create_payment(
     )
 
 
+# 收付款方式对应的资金科目：(编码, 名称)；Credit 方式按银行存款处理
+CASH_ACCOUNTS = {
+    "Cash": ("1001", "库存现金"),
+    "BankTransfer": ("1002", "银行存款"),
+    "Credit": ("1002", "银行存款"),
+}
+
+
+def _missing_accounts_reason(account_ids: dict, required: list) -> Optional[str]:
+    """检查所需科目是否存在，返回缺失说明"""
+    missing = [f"{code}-{name}" for code, name in required if not account_ids.get(code)]
+    if missing:
+        return f"缺少必需的会计科目：{', '.join(missing)}，请先创建"
+    return None
+
+
+@router.post("/payments/batch", response_model=dict)
+def create_payments_batch(
+    batch_data: PaymentBatchCreate,
+    current_user=Depends(require_permission("payment:create")),
+    db: Session = Depends(get_db),
+):
+    """批量创建付款记录（如银行付款批次）
+
+    关联的采购单连同已付金额一次分组查询加载并锁定，逐项按与单笔付款相同的规则校验
+    （同一采购单在批内的付款累计计算），通过的付款、分录和明细在同一事务中批量写入。
+    返回每一项的处理结果，失败项不影响其他项。
+    """
+    company_id = current_user.company_id
+    po_ids = {item.purchase_order_id for item in batch_data.items if item.purchase_order_id}
+
+    orders = {}
+    paid_amounts = {}
+    if po_ids:
+        paid = paid_by_order(db, company_id)
+        for order, paid_amount in (
+            db.query(PurchaseOrder, func.coalesce(paid.c.paid, 0))
+            .outerjoin(paid, paid.c.po_id == PurchaseOrder.po_id)
+            .filter(
+                PurchaseOrder.po_id.in_(po_ids),
+                PurchaseOrder.company_id == company_id,
+            )
+            .with_for_update(of=PurchaseOrder)
+        ):
+            orders[order.po_id] = order
+            paid_amounts[order.po_id] = paid_amount
+
+    account_ids = get_account_ids(db, company_id, ["2202", "1001", "1002"])
+
+    results = []
+    payments = []
+    journals = []
+    lines = []
+    for index, item in enumerate(batch_data.items):
+        reason = None
+        order = None
+        if item.amount <= 0:
+            reason = "付款金额必须大于0"
+        elif item.purchase_order_id:
+            order = orders.get(item.purchase_order_id)
+            if not order:
+                reason = "采购订单不存在"
+            elif order.status != "Posted":
+                reason = f"只能对已过账的采购单进行付款，当前状态：{order.status}"
+            else:
+                unpaid_amount = order.total_amount - paid_amounts[order.po_id]
+                if item.amount != unpaid_amount:
+                    reason = f"必须一次付清，付款金额必须等于未付金额 {unpaid_amount}"
+
+        credit_code, credit_name = CASH_ACCOUNTS[item.payment_method.value]
+        reason = reason or _missing_accounts_reason(
+            account_ids, [("2202", "应付账款"), (credit_code, credit_name)]
+        )
+        if reason:
+            results.append({"index": index, "success": False, "reason": reason})
+            continue
+
+        payment_id = str(uuid.uuid4())
+        payments.append(
+            Payment(
+                payment_id=payment_id,
+                company_id=company_id,
+                purchase_order_id=item.purchase_order_id,
+                date=item.date,
+                amount=item.amount,
+                payment_method=item.payment_method.value,
+                remark=item.remark,
+            )
+        )
+        if order is not None:
+            paid_amounts[order.po_id] += item.amount
+            if paid_amounts[order.po_id] >= order.total_amount:
+                order.status = "Paid"
+
+        # 借：应付账款  贷：银行存款/库存现金
+        journal_id = str(uuid.uuid4())
+        journals.append(
+            JournalEntry(
+                journal_id=journal_id,
+                company_id=company_id,
+                date=item.date,
+                description=f"付款 - 采购单：{item.purchase_order_id[:8] if item.purchase_order_id else '无关联订单'}",
+                source_type="PAYMENT",
+                source_id=payment_id,
+                total_debit=item.amount,
+                total_credit=item.amount,
+                posted=True,
+                posted_by=current_user.user_id,
+            )
+        )
+        lines.append(
+            LedgerLine(
+                journal_id=journal_id,
+                account_id=account_ids["2202"],
+                debit=item.amount,
+                credit=0,
+                memo="支付供应商货款",
+            )
+        )
+        lines.append(
+            LedgerLine(
+                journal_id=journal_id,
+                account_id=account_ids[credit_code],
+                debit=0,
+                credit=item.amount,
+                memo="付款",
+            )
+        )
+        results.append({"index": index, "success": True, "payment_id": payment_id})
+
+    try:
+        # 主键已预先生成，flush 时同类记录合并为批量 INSERT
+        db.add_all(payments)
+        db.add_all(journals)
+        db.add_all(lines)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"批量付款失败：{str(e)}")
+
+    succeeded = len(payments)
+    return success_response(
+        data=results,
+        message=f"批量付款完成：成功 {succeeded} 笔，失败 {len(results) - succeeded} 笔",
+    )
+
+
 @router.get("/payments", response_model=dict)
+@async_db_route
 def get_payments(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     purchase_order_id: str = None,
     skip: int = 0,
     limit: int = 20,
@@ -217,42 +362,51 @@ def get_payments(
 def get_available_purchase_orders(
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
+    keyword: Optional[str] = Query(None, description="按供应商名称或订单号搜索"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
 ):
     """获取可付款的采购单列表（已过账且未完全支付）"""
-    # 查询已过账的采购单
-    orders = (
-        db.query(PurchaseOrder)
+    # 已付金额按订单分组汇总后外连接，未付金额在 SQL 中计算和过滤
+    paid = paid_by_order(db, current_user.company_id)
+    paid_amount = func.coalesce(paid.c.paid, 0)
+    query = (
+        db.query(PurchaseOrder, Supplier.name, paid_amount.label("paid_amount"))
+        .join(Supplier, Supplier.supplier_id == PurchaseOrder.supplier_id)
+        .outerjoin(paid, paid.c.po_id == PurchaseOrder.po_id)
         .filter(
             PurchaseOrder.company_id == current_user.company_id,
             PurchaseOrder.status == "Posted",
+            PurchaseOrder.total_amount - paid_amount > 0,
+        )
+    )
+    if keyword:
+        query = query.filter(
+            or_(
+                Supplier.name.contains(keyword, autoescape=True),
+                PurchaseOrder.po_id.startswith(keyword, autoescape=True),
+            )
         )
+    rows = (
+        query.order_by(PurchaseOrder.date, PurchaseOrder.po_id)
+        .offset(skip)
+        .limit(limit)
         .all()
     )
 
-    result = []
-    for order in orders:
-        # 计算已付金额
-        paid_amount = db.query(func.sum(Payment.amount)).filter(
-            Payment.purchase_order_id == order.po_id,
-            Payment.company_id == current_user.company_id,
-        ).scalar() or Decimal("0")
-
-        # 计算未付金额
-        unpaid_amount = order.total_amount - paid_amount
-
-        # 只返回未完全支付的采购单
-        if unpaid_amount > 0:
-            result.append(
-                {
-                    "po_id": order.po_id,
-                    "supplier_id": order.supplier_id,
-                    "date": order.date.isoformat() if order.date else None,
-                    "total_amount": float(order.total_amount),
-                    "paid_amount": float(paid_amount),
-                    "unpaid_amount": float(unpaid_amount),
-                    "status": order.status,
-                }
-            )
+    result = [
+        {
+            "po_id": order.po_id,
+            "supplier_id": order.supplier_id,
+            "supplier_name": supplier_name,
+            "date": order.date.isoformat() if order.date else None,
+            "total_amount": float(order.total_amount),
+            "paid_amount": float(paid_amount),
+            "unpaid_amount": float(order.total_amount - paid_amount),
+            "status": order.status,
+        }
+        for order, supplier_name, paid_amount in rows
+    ]
 
     return success_response(data=result)
 
@@ -298,6 +452,7 @@ def create_receipt(
                 SalesOrder.so_id == receipt_data.sales_order_id,
                 SalesOrder.company_id == current_user.company_id,
             )
+            .with_for_update()
             .first()
         )
         if not so:
@@ -310,11 +465,8 @@ def create_receipt(
                 detail=f"只能对已过账的销售单进行收款，当前状态：{so.status}",
             )
 
-        # 计算已收金额（该销售单的所有收款记录总和）
-        received_amount = db.query(func.sum(Receipt.amount)).filter(
-            Receipt.sales_order_id == receipt_data.sales_order_id,
-            Receipt.company_id == current_user.company_id,
-        ).scalar() or Decimal("0")
+        # 已收金额（收款时维护，等于该销售单所有收款记录总和）
+        received_amount = so.received_amount or Decimal("0")
 
         # 计算未收金额
         unreceived_amount = so.total_amount - received_amount
@@ -342,15 +494,16 @@ def create_receipt(
         remark=receipt_data.remark,
     )
     db.add(receipt)
-    db.flush()  # 先flush以便计算新的已收金额
+    db.flush()
 
-    # 如果关联了销售单，检查是否需要更新销售单状态
+    # 如果关联了销售单，累加已收金额并检查是否需要更新销售单状态
     if receipt_data.sales_order_id:
-        # 重新计算已收金额（包括本次收款）
-        new_received_amount = db.query(func.sum(Receipt.amount)).filter(
-            Receipt.sales_order_id == receipt_data.sales_order_id,
-            Receipt.company_id == current_user.company_id,
-        ).scalar() or Decimal("0")
+        new_received_amount = received_amount + receipt_data.amount
+        so.received_amount = new_received_amount
+
+        # 赊销订单收款冲减客户应收余额
+        if so.payment_method == "Credit":
+            adjust_customer_receivable(db, so.customer_id, -receipt_data.amount)
 
         # 如果已收金额等于或超过总金额，更新销售单状态为"Collected"
         if new_received_amount >= so.total_amount:
@@ -359,16 +512,6 @@ def create_receipt(
     # 自动生成收款分录
     # 借：银行存款/库存现金  贷：应收账款
     try:
-        # 查找应收账款科目（1122）
-        receivable_account = (
-            db.query(Account)
-            .filter(
-                Account.company_id == current_user.company_id,
-                Account.code == "1122",  # 应收账款
-            )
-            .first()
-        )
-
         # 根据收款方式选择借方科目
         if receipt_data.method.value == "Cash":
             debit_account_code = "1001"  # 库存现金
@@ -381,20 +524,18 @@ def create_receipt(
             debit_account_code = "1002"
             debit_account_name = "银行存款"
 
-        debit_account = (
-            db.query(Account)
-            .filter(
-                Account.company_id == current_user.company_id,
-                Account.code == debit_account_code,
-            )
-            .first()
+        # 应收账款（1122）与借方科目（编码缓存）
+        account_ids = get_account_ids(
+            db, current_user.company_id, ["1122", debit_account_code]
         )
+        receivable_account_id = account_ids["1122"]
+        debit_account_id = account_ids[debit_account_code]
 
-        if not receivable_account or not debit_account:
+        if not receivable_account_id or not debit_account_id:
             missing = []
-            if not receivable_account:
+            if not receivable_account_id:
                 missing.append("1122-应收账款")
-            if not debit_account:
+            if not debit_account_id:
                 missing.append(f"{debit_account_code}-{debit_account_name}")
             raise HTTPException(
                 status_code=400,
@@ -419,7 +560,7 @@ def create_receipt(
         # 借方：银行存款/库存现金
         debit_line = LedgerLine(
             journal_id=journal.journal_id,
-            account_id=debit_account.account_id,
+            account_id=debit_account_id,
             debit=receipt_data.amount,
             credit=0,
             memo=f"收到客户货款",
@@ -429,7 +570,7 @@ def create_receipt(
         # 贷方：应收账款
         credit_line = LedgerLine(
             journal_id=journal.journal_id,
-            account_id=receivable_account.account_id,
+            account_id=receivable_account_id,
             debit=0,
             credit=receipt_data.amount,
             memo=f"收回应收账款",
@@ -453,10 +594,153 @@ def create_receipt(
     )
 
 
+@router.post("/receipts/batch", response_model=dict)
+def create_receipts_batch(
+    batch_data: ReceiptBatchCreate,
+    current_user=Depends(require_permission("receipt:create")),
+    db: Session = Depends(get_db),
+):
+    """批量创建收款记录（如银行回款批次）
+
+    关联的销售单连同已收金额一次分组查询加载并锁定，逐项按与单笔收款相同的规则校验
+    （同一销售单在批内的收款累计计算），通过的收款、分录和明细在同一事务中批量写入，
+    并同步订单已收金额与客户应收余额。返回每一项的处理结果，失败项不影响其他项。
+    """
+    company_id = current_user.company_id
+    so_ids = {item.sales_order_id for item in batch_data.items if item.sales_order_id}
+
+    orders = {}
+    received_amounts = {}
+    if so_ids:
+        received = received_by_order(db, company_id)
+        for order, received_amount in (
+            db.query(SalesOrder, func.coalesce(received.c.received, 0))
+            .outerjoin(received, received.c.so_id == SalesOrder.so_id)
+            .filter(
+                SalesOrder.so_id.in_(so_ids),
+                SalesOrder.company_id == company_id,
+            )
+            .with_for_update(of=SalesOrder)
+        ):
+            orders[order.so_id] = order
+            received_amounts[order.so_id] = received_amount
+
+    account_ids = get_account_ids(db, company_id, ["1122", "1001", "1002"])
+
+    results = []
+    receipts = []
+    journals = []
+    lines = []
+    receivable_deltas = {}
+    for index, item in enumerate(batch_data.items):
+        reason = None
+        order = None
+        if item.amount <= 0:
+            reason = "收款金额必须大于0"
+        elif item.sales_order_id:
+            order = orders.get(item.sales_order_id)
+            if not order:
+                reason = "销售订单不存在"
+            elif order.status != "Posted":
+                reason = f"只能对已过账的销售单进行收款，当前状态：{order.status}"
+            else:
+                unreceived_amount = order.total_amount - received_amounts[order.so_id]
+                if unreceived_amount <= 0:
+                    reason = "该销售单已完全收款，无法再次收款"
+                elif item.amount > unreceived_amount:
+                    reason = f"收款金额不能超过未收金额 {unreceived_amount}"
+
+        debit_code, debit_name = CASH_ACCOUNTS[item.method.value]
+        reason = reason or _missing_accounts_reason(
+            account_ids, [("1122", "应收账款"), (debit_code, debit_name)]
+        )
+        if reason:
+            results.append({"index": index, "success": False, "reason": reason})
+            continue
+
+        receipt_id = str(uuid.uuid4())
+        receipts.append(
+            Receipt(
+                receipt_id=receipt_id,
+                company_id=company_id,
+                sales_order_id=item.sales_order_id,
+                date=item.date,
+                amount=item.amount,
+                method=item.method.value,
+                remark=item.remark,
+            )
+        )
+        if order is not None:
+            received_amounts[order.so_id] += item.amount
+            order.received_amount = received_amounts[order.so_id]
+            if order.payment_method == "Credit":
+                receivable_deltas[order.customer_id] = (
+                    receivable_deltas.get(order.customer_id, Decimal("0")) - item.amount
+                )
+            if received_amounts[order.so_id] >= order.total_amount:
+                order.status = "Collected"
+
+        # 借：银行存款/库存现金  贷：应收账款
+        journal_id = str(uuid.uuid4())
+        journals.append(
+            JournalEntry(
+                journal_id=journal_id,
+                company_id=company_id,
+                date=item.date,
+                description=f"收款 - 销售单：{item.sales_order_id[:8] if item.sales_order_id else '无关联订单'}",
+                source_type="RECEIPT",
+                source_id=receipt_id,
+                total_debit=item.amount,
+                total_credit=item.amount,
+                posted=True,
+                posted_by=current_user.user_id,
+            )
+        )
+        lines.append(
+            LedgerLine(
+                journal_id=journal_id,
+                account_id=account_ids[debit_code],
+                debit=item.amount,
+                credit=0,
+                memo="收到客户货款",
+            )
+        )
+        lines.append(
+            LedgerLine(
+                journal_id=journal_id,
+                account_id=account_ids["1122"],
+                debit=0,
+                credit=item.amount,
+                memo="收回应收账款",
+            )
+        )
+        results.append({"index": index, "success": True, "receipt_id": receipt_id})
+
+    try:
+        # 主键已预先生成，flush 时同类记录合并为批量 INSERT
+        db.add_all(receipts)
+        db.add_all(journals)
+        db.add_all(lines)
+        # 每个客户的应收余额只更新一次，按主键顺序避免死锁
+        for customer_id in sorted(receivable_deltas):
+            adjust_customer_receivable(db, customer_id, receivable_deltas[customer_id])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"批量收款失败：{str(e)}")
+
+    succeeded = len(receipts)
+    return success_response(
+        data=results,
+        message=f"批量收款完成：成功 {succeeded} 笔，失败 {len(results) - succeeded} 笔",
+    )
+
+
 @router.get("/receipts", response_model=dict)
+@async_db_route
 def get_receipts(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     sales_order_id: str = None,
     skip: int = 0,
     limit: int = 20,
@@ -476,43 +760,52 @@ def get_receipts(
 def get_available_sales_orders(
     current_user=Depends(get_current_user),
     db: Session = Depends(get_db),
+    keyword: Optional[str] = Query(None, description="按客户名称或订单号搜索"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
 ):
     """获取可收款的销售单列表（已过账且未完全收款）"""
-    # 查询已过账的销售单
-    orders = (
-        db.query(SalesOrder)
+    # 已收金额按订单分组汇总后外连接，未收金额在 SQL 中计算和过滤
+    received = received_by_order(db, current_user.company_id)
+    received_amount = func.coalesce(received.c.received, 0)
+    query = (
+        db.query(SalesOrder, Customer.name, received_amount.label("received_amount"))
+        .join(Customer, Customer.customer_id == SalesOrder.customer_id)
+        .outerjoin(received, received.c.so_id == SalesOrder.so_id)
         .filter(
             SalesOrder.company_id == current_user.company_id,
             SalesOrder.status == "Posted",
+            SalesOrder.total_amount - received_amount > 0,
+        )
+    )
+    if keyword:
+        query = query.filter(
+            or_(
+                Customer.name.contains(keyword, autoescape=True),
+                SalesOrder.so_id.startswith(keyword, autoescape=True),
+            )
         )
+    rows = (
+        query.order_by(SalesOrder.date, SalesOrder.so_id)
+        .offset(skip)
+        .limit(limit)
         .all()
     )
 
-    result = []
-    for order in orders:
-        # 计算已收金额
-        received_amount = db.query(func.sum(Receipt.amount)).filter(
-            Receipt.sales_order_id == order.so_id,
-            Receipt.company_id == current_user.company_id,
-        ).scalar() or Decimal("0")
-
-        # 计算未收金额
-        unreceived_amount = order.total_amount - received_amount
-
-        # 只返回未完全收款的销售单
-        if unreceived_amount > 0:
-            result.append(
-                {
-                    "so_id": order.so_id,
-                    "customer_id": order.customer_id,
-                    "date": order.date.isoformat() if order.date else None,
-                    "total_amount": float(order.total_amount),
-                    "received_amount": float(received_amount),
-                    "unreceived_amount": float(unreceived_amount),
-                    "status": order.status,
-                    "payment_method": order.payment_method,
-                }
-            )
+    result = [
+        {
+            "so_id": order.so_id,
+            "customer_id": order.customer_id,
+            "customer_name": customer_name,
+            "date": order.date.isoformat() if order.date else None,
+            "total_amount": float(order.total_amount),
+            "received_amount": float(received_amount),
+            "unreceived_amount": float(order.total_amount - received_amount),
+            "status": order.status,
+            "payment_method": order.payment_method,
+        }
+        for order, customer_name, received_amount in rows
+    ]
 
     return success_response(data=result)
 
@@ -1,17 +1,25 @@
 """商品管理路由"""
 
-from fastapi import APIRouter, Depends, HTTPException
+import re
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, or_, select, text
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import async_db_route, get_db
 from app.models.inventory import InventoryItem
 from app.models.product import Product
 from app.schemas.product import ProductCreate, ProductResponse, ProductUpdate
 from app.utils.auth import get_current_user
 from app.utils.helpers import success_response
+from app.utils.read_db import get_async_read_db
 
 router = APIRouter(prefix="/products", tags=["商品管理"])
 
+# MySQL ngram 全文解析器的分词长度（ngram_token_size，默认 2）
+NGRAM_TOKEN_SIZE = 2
+
 
 @router.post("", response_model=dict)
 def create_product(
@@ -48,42 +56,74 @@ def create_product(
     )
 
 
+def _products_with_inventory(db: Session, company_id: str):
+    """商品左连接库存记录，一次查询带出库存数量与加权平均成本"""
+    return (
+        db.query(Product, InventoryItem.quantity, InventoryItem.average_cost)
+        .outerjoin(
+            InventoryItem,
+            and_(
+                InventoryItem.product_id == Product.product_id,
+                InventoryItem.company_id == Product.company_id,
+            ),
+        )
+        .filter(Product.company_id == company_id)
+    )
+
+
+def _product_dict(product: Product, quantity, average_cost) -> dict:
+    product_dict = ProductResponse.from_orm(product).dict()
+    product_dict["quantity"] = quantity
+    product_dict["average_cost"] = average_cost
+    return product_dict
+
+
+def _search_condition(db: Session, keyword: str):
+    """按 SKU 前缀或名称搜索
+
+    SKU 前缀走 (company_id, sku) 唯一索引；名称在 MySQL 上先用 ngram 全文索引
+    取出匹配的商品（短于分词长度的关键字退化为前缀匹配），其他数据库使用 LIKE。
+    """
+    sku_prefix = Product.sku.startswith(keyword.upper(), autoescape=True)
+    if db.bind.dialect.name != "mysql":
+        return or_(sku_prefix, Product.name.contains(keyword, autoescape=True))
+
+    terms = re.sub(r'[+\-<>()~*"@]', " ", keyword).split()
+    if not terms or min(len(term) for term in terms) < NGRAM_TOKEN_SIZE:
+        return or_(sku_prefix, Product.name.startswith(keyword, autoescape=True))
+
+    # 布尔模式下每个词作为短语匹配（ngram 分词后要求连续出现）
+    against = " ".join(f'+"{term}"' for term in terms)
+    matched = select(Product.product_id).correlate(None).where(
+        text("MATCH (product.name) AGAINST (:product_search IN BOOLEAN MODE)").bindparams(
+            product_search=against
+        )
+    )
+    return or_(sku_prefix, Product.product_id.in_(matched))
+
+
 @router.get("", response_model=dict)
+@async_db_route
 def get_products(
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
+    keyword: Optional[str] = Query(None, description="按 SKU 前缀或商品名称搜索"),
     skip: int = 0,
     limit: int = 20,
 ):
-    """获取商品列表"""
-    products = (
-        db.query(Product)
-        .filter(Product.company_id == current_user.company_id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    """获取商品列表（含库存数量与加权平均成本）"""
+    query = _products_with_inventory(db, current_user.company_id)
+    if keyword and keyword.strip():
+        query = query.filter(_search_condition(db, keyword.strip()))
 
-    # 获取每个商品的库存信息（加权平均成本）
-    product_dicts = []
-    for product in products:
-        product_dict = ProductResponse.from_orm(product).dict()
-        # 查询库存信息
-        inventory = (
-            db.query(InventoryItem)
-            .filter(
-                InventoryItem.product_id == product.product_id,
-                InventoryItem.company_id == current_user.company_id,
-            )
-            .first()
-        )
-        if inventory:
-            product_dict["average_cost"] = inventory.average_cost
-        else:
-            product_dict["average_cost"] = None
-        product_dicts.append(product_dict)
+    rows = query.order_by(Product.sku).offset(skip).limit(limit).all()
 
-    return success_response(data=product_dicts)
+    return success_response(
+        data=[
+            _product_dict(product, quantity, average_cost)
+            for product, quantity, average_cost in rows
+        ]
+    )
 
 
 @router.get("/{product_id}", response_model=dict)
@@ -93,34 +133,16 @@ def get_product(
     db: Session = Depends(get_db),
 ):
     """获取商品详情"""
-    product = (
-        db.query(Product)
-        .filter(
-            Product.product_id == product_id,
-            Product.company_id == current_user.company_id,
-        )
+    row = (
+        _products_with_inventory(db, current_user.company_id)
+        .filter(Product.product_id == product_id)
         .first()
     )
 
-    if not product:
+    if not row:
         raise HTTPException(status_code=404, detail="商品不存在")
 
-    product_dict = ProductResponse.from_orm(product).dict()
-    # 查询库存信息（加权平均成本）
-    inventory = (
-        db.query(InventoryItem)
-        .filter(
-            InventoryItem.product_id == product.product_id,
-            InventoryItem.company_id == current_user.company_id,
-        )
-        .first()
-    )
-    if inventory:
-        product_dict["average_cost"] = inventory.average_cost
-    else:
-        product_dict["average_cost"] = None
-
-    return success_response(data=product_dict)
+    return success_response(data=_product_dict(*row))
 
 
 @router.put("/{product_id}", response_model=dict)
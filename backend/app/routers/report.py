@@ -1,5 +1,6 @@
 """报表管理路由"""
 
+from collections import defaultdict
 from datetime import date
 from decimal import Decimal
 from io import BytesIO
@@ -7,47 +8,59 @@ from typing import Optional
 from urllib.parse import quote
 
 import pandas as pd
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
 from fastapi.responses import StreamingResponse
 from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import async_db_route, get_db
 from app.models.account import Account
+from app.models.customer import Customer
 from app.models.journal import JournalEntry, LedgerLine
-from app.utils.auth import get_current_user
+from app.models.order import PurchaseOrder, SalesOrder
+from app.models.supplier import Supplier
+from app.utils.aging import (
+    AGING_BUCKET_KEYS,
+    AGING_BUCKETS,
+    aging_bucket_columns,
+    aging_bucket_key,
+    paid_by_order,
+    received_by_order,
+)
+from app.utils.account_codes import get_account_id
+from app.utils.auth import get_current_user, require_permission
+from app.utils.excel import write_only_excel_response
 from app.utils.helpers import success_response
+from app.utils.inventory_valuation import (
+    create_inventory_snapshot,
+    get_inventory_valuation,
+)
+from app.utils.read_db import get_async_read_db, get_read_db
 
 router = APIRouter(prefix="/reports", tags=["报表管理"])
 
 
 @router.get("/income-statement", response_model=dict)
+@async_db_route
 def generate_income_statement(
     start_date: date = Query(..., description="开始日期"),
     end_date: date = Query(..., description="结束日期"),
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
 ):
     """生成利润表"""
 
     # 1. 获取营业收入（主营业务收入 6001）
-    revenue_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "6001",
-        )
-        .first()
-    )
+    revenue_account_id = get_account_id(db, current_user.company_id, "6001")
 
     revenue = Decimal(0)
-    if revenue_account:
+    if revenue_account_id:
         revenue_result = (
             db.query(func.sum(LedgerLine.credit) - func.sum(LedgerLine.debit))
             .join(Account)
             .join(JournalEntry, LedgerLine.journal_id == JournalEntry.journal_id)
             .filter(
-                Account.account_id == revenue_account.account_id,
+                Account.account_id == revenue_account_id,
                 Account.company_id == current_user.company_id,
                 JournalEntry.date >= start_date,
                 JournalEntry.date <= end_date,
@@ -58,23 +71,16 @@ def generate_income_statement(
         revenue = revenue_result if revenue_result else Decimal(0)
 
     # 2. 获取营业成本（主营业务成本 6401）
-    cost_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "6401",
-        )
-        .first()
-    )
+    cost_account_id = get_account_id(db, current_user.company_id, "6401")
 
     cost = Decimal(0)
-    if cost_account:
+    if cost_account_id:
         cost_result = (
             db.query(func.sum(LedgerLine.debit) - func.sum(LedgerLine.credit))
             .join(Account)
             .join(JournalEntry, LedgerLine.journal_id == JournalEntry.journal_id)
             .filter(
-                Account.account_id == cost_account.account_id,
+                Account.account_id == cost_account_id,
                 Account.company_id == current_user.company_id,
                 JournalEntry.date >= start_date,
                 JournalEntry.date <= end_date,
@@ -114,23 +120,16 @@ def generate_income_statement(
                 expenses += expense_result
 
     # 4. 获取税金及附加（税金及附加 6403）
-    tax_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == current_user.company_id,
-            Account.code == "6403",  # 税金及附加费用账户
-        )
-        .first()
-    )
+    tax_account_id = get_account_id(db, current_user.company_id, "6403")  # 税金及附加费用账户
 
     tax = Decimal(0)
-    if tax_account:
+    if tax_account_id:
         tax_result = (
             db.query(func.sum(LedgerLine.debit) - func.sum(LedgerLine.credit))
             .join(Account)
             .join(JournalEntry, LedgerLine.journal_id == JournalEntry.journal_id)
             .filter(
-                Account.account_id == tax_account.account_id,
+                Account.account_id == tax_account_id,
                 Account.company_id == current_user.company_id,
                 JournalEntry.date >= start_date,
                 JournalEntry.date <= end_date,
@@ -237,26 +236,30 @@ def calculate_account_balance(
 
 
 def build_account_tree(accounts: list, parent_id: str = None) -> list:
-    """构建科目树形结构"""
-    tree = []
+    """构建科目树形结构（按 parent_id 分组，一次遍历完成）"""
+    children_map = defaultdict(list)
     for account in accounts:
-        if account.parent_id == parent_id:
-            node = {
+        children_map[account.parent_id].append(
+            {
                 "account_id": account.account_id,
                 "code": account.code,
                 "name": account.name,
                 "balance": None,  # 将在外部计算
-                "children": build_account_tree(accounts, account.account_id),
+                "children": [],
             }
-            tree.append(node)
-    return tree
+        )
+    for nodes in children_map.values():
+        for node in nodes:
+            node["children"] = children_map.get(node["account_id"], [])
+    return children_map.get(parent_id, [])
 
 
 @router.get("/balance-sheet", response_model=dict)
+@async_db_route
 def generate_balance_sheet(
     as_of_date: date = Query(..., description="报表日期"),
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
 ):
     """生成资产负债表"""
 
@@ -562,11 +565,12 @@ def generate_balance_sheet(
 
 
 @router.get("/cash-flow", response_model=dict)
+@async_db_route
 def generate_cash_flow(
     start_date: date = Query(..., description="开始日期"),
     end_date: date = Query(..., description="结束日期"),
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
 ):
     """生成现金流量表"""
 
@@ -712,23 +716,16 @@ def _get_income_statement_data(
 ) -> dict:
     """获取利润表数据（内部函数，用于导出）"""
     # 1. 获取营业收入（主营业务收入 6001）
-    revenue_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == company_id,
-            Account.code == "6001",
-        )
-        .first()
-    )
+    revenue_account_id = get_account_id(db, company_id, "6001")
 
     revenue = Decimal(0)
-    if revenue_account:
+    if revenue_account_id:
         revenue_result = (
             db.query(func.sum(LedgerLine.credit) - func.sum(LedgerLine.debit))
             .join(Account)
             .join(JournalEntry, LedgerLine.journal_id == JournalEntry.journal_id)
             .filter(
-                Account.account_id == revenue_account.account_id,
+                Account.account_id == revenue_account_id,
                 Account.company_id == company_id,
                 JournalEntry.date >= start_date,
                 JournalEntry.date <= end_date,
@@ -739,23 +736,16 @@ def _get_income_statement_data(
         revenue = revenue_result if revenue_result else Decimal(0)
 
     # 2. 获取营业成本（主营业务成本 6401）
-    cost_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == company_id,
-            Account.code == "6401",
-        )
-        .first()
-    )
+    cost_account_id = get_account_id(db, company_id, "6401")
 
     cost = Decimal(0)
-    if cost_account:
+    if cost_account_id:
         cost_result = (
             db.query(func.sum(LedgerLine.debit) - func.sum(LedgerLine.credit))
             .join(Account)
             .join(JournalEntry, LedgerLine.journal_id == JournalEntry.journal_id)
             .filter(
-                Account.account_id == cost_account.account_id,
+                Account.account_id == cost_account_id,
                 Account.company_id == company_id,
                 JournalEntry.date >= start_date,
                 JournalEntry.date <= end_date,
@@ -794,23 +784,16 @@ def _get_income_statement_data(
             expenses += expense_result
 
     # 4. 获取税金及附加（税金及附加 6403）
-    tax_account = (
-        db.query(Account)
-        .filter(
-            Account.company_id == company_id,
-            Account.code == "6403",  # 税金及附加费用账户
-        )
-        .first()
-    )
+    tax_account_id = get_account_id(db, company_id, "6403")  # 税金及附加费用账户
 
     tax = Decimal(0)
-    if tax_account:
+    if tax_account_id:
         tax_result = (
             db.query(func.sum(LedgerLine.debit) - func.sum(LedgerLine.credit))
             .join(Account)
             .join(JournalEntry, LedgerLine.journal_id == JournalEntry.journal_id)
             .filter(
-                Account.account_id == tax_account.account_id,
+                Account.account_id == tax_account_id,
                 Account.company_id == company_id,
                 JournalEntry.date >= start_date,
                 JournalEntry.date <= end_date,
@@ -841,7 +824,7 @@ def export_income_statement(
     start_date: date = Query(..., description="开始日期"),
     end_date: date = Query(..., description="结束日期"),
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """导出利润表（Excel）"""
     # 生成利润表数据
@@ -1132,7 +1115,7 @@ def _get_balance_sheet_data(
 def export_balance_sheet(
     as_of_date: date = Query(..., description="报表日期"),
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """导出资产负债表（Excel）"""
     # 生成资产负债表数据
@@ -1427,7 +1410,7 @@ def export_cash_flow(
     start_date: date = Query(..., description="开始日期"),
     end_date: date = Query(..., description="结束日期"),
     current_user=Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """导出现金流量表（Excel）"""
     # 生成现金流量表数据
@@ -1541,3 +1524,279 @@ def export_cash_flow(
             "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
         },
     )
+
+
+# ==================== 账龄分析 ====================
+
+
+def _aging_rows_to_data(rows, as_of_date: date, party_key: str) -> dict:
+    """把按往来单位分组的账龄结果整理为响应数据"""
+    totals = {key: Decimal("0") for key in AGING_BUCKET_KEYS + ["total"]}
+    parties = []
+    for row in rows:
+        item = {
+            f"{party_key}_id": row.party_id,
+            f"{party_key}_name": row.party_name,
+        }
+        if hasattr(row, "credit_limit"):
+            item["credit_limit"] = float(row.credit_limit or 0)
+        for key in AGING_BUCKET_KEYS + ["total"]:
+            value = getattr(row, key) or Decimal("0")
+            totals[key] += value
+            item[key] = float(value)
+        parties.append(item)
+
+    return {
+        "as_of_date": as_of_date.isoformat(),
+        "buckets": [{"key": key, "label": label} for key, label, _, _ in AGING_BUCKETS],
+        f"{party_key}s": parties,
+        "totals": {key: float(value) for key, value in totals.items()},
+    }
+
+
+def _ar_open_orders(db: Session, company_id: str, as_of_date: date):
+    """截至 as_of_date 的未收赊销订单：返回 (未收金额表达式, 已收子查询, 过滤条件)"""
+    received = received_by_order(db, company_id, as_of_date)
+    outstanding = SalesOrder.total_amount - func.coalesce(received.c.received, 0)
+    conditions = (
+        SalesOrder.company_id == company_id,
+        SalesOrder.payment_method == "Credit",
+        SalesOrder.status.in_(("Posted", "Collected")),
+        SalesOrder.date <= as_of_date,
+        outstanding > 0,
+    )
+    return outstanding, received, conditions
+
+
+def _get_ar_aging_data(as_of_date: date, company_id: str, db: Session) -> dict:
+    """应收账款账龄数据（一条分组查询按客户汇总各账龄区间）"""
+    outstanding, received, conditions = _ar_open_orders(db, company_id, as_of_date)
+
+    rows = (
+        db.query(
+            Customer.customer_id.label("party_id"),
+            Customer.name.label("party_name"),
+            Customer.credit_limit,
+            *aging_bucket_columns(SalesOrder.date, outstanding, as_of_date),
+            func.sum(outstanding).label("total"),
+        )
+        .select_from(SalesOrder)
+        .join(Customer, Customer.customer_id == SalesOrder.customer_id)
+        .outerjoin(received, received.c.so_id == SalesOrder.so_id)
+        .filter(*conditions)
+        .group_by(Customer.customer_id, Customer.name, Customer.credit_limit)
+        .order_by(func.sum(outstanding).desc())
+        .all()
+    )
+    return _aging_rows_to_data(rows, as_of_date, "customer")
+
+
+def _ap_open_orders(db: Session, company_id: str, as_of_date: date):
+    """截至 as_of_date 的未付采购订单：返回 (未付金额表达式, 到期日表达式, 已付子查询, 过滤条件)
+
+    采购订单没有单独的付款期限，以预计交货日期为到期日，未填写时取订单日期。
+    """
+    paid = paid_by_order(db, company_id, as_of_date)
+    outstanding = PurchaseOrder.total_amount - func.coalesce(paid.c.paid, 0)
+    due_date = func.coalesce(PurchaseOrder.expected_delivery_date, PurchaseOrder.date)
+    conditions = (
+        PurchaseOrder.company_id == company_id,
+        PurchaseOrder.status.in_(("Posted", "Paid")),
+        PurchaseOrder.date <= as_of_date,
+        outstanding > 0,
+    )
+    return outstanding, due_date, paid, conditions
+
+
+def _get_ap_aging_data(as_of_date: date, company_id: str, db: Session) -> dict:
+    """应付账款账龄数据（一条分组查询按供应商汇总各账龄区间）"""
+    outstanding, due_date, paid, conditions = _ap_open_orders(db, company_id, as_of_date)
+
+    rows = (
+        db.query(
+            Supplier.supplier_id.label("party_id"),
+            Supplier.name.label("party_name"),
+            *aging_bucket_columns(due_date, outstanding, as_of_date),
+            func.sum(outstanding).label("total"),
+        )
+        .select_from(PurchaseOrder)
+        .join(Supplier, Supplier.supplier_id == PurchaseOrder.supplier_id)
+        .outerjoin(paid, paid.c.po_id == PurchaseOrder.po_id)
+        .filter(*conditions)
+        .group_by(Supplier.supplier_id, Supplier.name)
+        .order_by(func.sum(outstanding).desc())
+        .all()
+    )
+    return _aging_rows_to_data(rows, as_of_date, "supplier")
+
+
+@router.get("/ar-aging", response_model=dict)
+@async_db_route
+def generate_ar_aging(
+    as_of_date: Optional[date] = Query(None, description="账龄截止日期，默认今天"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_async_read_db),
+):
+    """应收账款账龄分析（按客户汇总）"""
+    data = _get_ar_aging_data(as_of_date or date.today(), current_user.company_id, db)
+    return success_response(data=data)
+
+
+@router.get("/ar-aging/{customer_id}", response_model=dict)
+@async_db_route
+def get_ar_aging_detail(
+    customer_id: str,
+    as_of_date: Optional[date] = Query(None, description="账龄截止日期，默认今天"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_async_read_db),
+):
+    """应收账款账龄明细（单个客户的未收订单）"""
+    as_of_date = as_of_date or date.today()
+    customer = (
+        db.query(Customer)
+        .filter(
+            Customer.customer_id == customer_id,
+            Customer.company_id == current_user.company_id,
+        )
+        .first()
+    )
+    if not customer:
+        raise HTTPException(status_code=404, detail="客户不存在")
+
+    outstanding, received, conditions = _ar_open_orders(
+        db, current_user.company_id, as_of_date
+    )
+    rows = (
+        db.query(
+            SalesOrder.so_id,
+            SalesOrder.date,
+            SalesOrder.total_amount,
+            func.coalesce(received.c.received, 0).label("received"),
+            outstanding.label("outstanding"),
+        )
+        .outerjoin(received, received.c.so_id == SalesOrder.so_id)
+        .filter(*conditions, SalesOrder.customer_id == customer_id)
+        .order_by(SalesOrder.date, SalesOrder.so_id)
+        .all()
+    )
+
+    orders = [
+        {
+            "so_id": row.so_id,
+            "date": row.date.isoformat(),
+            "total_amount": float(row.total_amount),
+            "received_amount": float(row.received),
+            "outstanding_amount": float(row.outstanding),
+            "days_outstanding": (as_of_date - row.date).days,
+            "bucket": aging_bucket_key(row.date, as_of_date),
+        }
+        for row in rows
+    ]
+
+    return success_response(
+        data={
+            "as_of_date": as_of_date.isoformat(),
+            "customer_id": customer.customer_id,
+            "customer_name": customer.name,
+            "credit_limit": float(customer.credit_limit or 0),
+            "orders": orders,
+            "total": sum(order["outstanding_amount"] for order in orders),
+        }
+    )
+
+
+@router.get("/ap-aging", response_model=dict)
+@async_db_route
+def generate_ap_aging(
+    as_of_date: Optional[date] = Query(None, description="账龄截止日期，默认今天"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_async_read_db),
+):
+    """应付账款账龄分析（按供应商汇总，以预计交货日期为到期日）"""
+    data = _get_ap_aging_data(as_of_date or date.today(), current_user.company_id, db)
+    return success_response(data=data)
+
+
+def _aging_export(data: dict, as_of_date: date, title: str, party_key: str, party_label: str):
+    """账龄分析导出（只写模式 Excel）"""
+    with_credit_limit = party_key == "customer"
+    headers = [party_label]
+    if with_credit_limit:
+        headers.append("信用额度")
+    headers += [label for _, label, _, _ in AGING_BUCKETS] + ["合计"]
+
+    def rows():
+        for item in data[f"{party_key}s"]:
+            row = [item[f"{party_key}_name"]]
+            if with_credit_limit:
+                row.append(item["credit_limit"])
+            yield row + [item[key] for key in AGING_BUCKET_KEYS] + [item["total"]]
+
+    footer = ["合计"] + ([None] if with_credit_limit else [])
+    footer += [data["totals"][key] for key in AGING_BUCKET_KEYS + ["total"]]
+
+    return write_only_excel_response(
+        filename=f"{title}_{as_of_date}.xlsx",
+        sheet_title=title,
+        title=title,
+        subtitle=f"截止日期：{as_of_date}",
+        headers=headers,
+        rows=rows(),
+        footer=footer,
+        column_widths=[30] + [15] * (len(headers) - 1),
+    )
+
+
+@router.get("/export/ar-aging")
+def export_ar_aging(
+    as_of_date: Optional[date] = Query(None, description="账龄截止日期，默认今天"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+):
+    """导出应收账款账龄分析（Excel）"""
+    as_of_date = as_of_date or date.today()
+    data = _get_ar_aging_data(as_of_date, current_user.company_id, db)
+    return _aging_export(data, as_of_date, "应收账款账龄", "customer", "客户")
+
+
+@router.get("/export/ap-aging")
+def export_ap_aging(
+    as_of_date: Optional[date] = Query(None, description="账龄截止日期，默认今天"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_read_db),
+):
+    """导出应付账款账龄分析（Excel）"""
+    as_of_date = as_of_date or date.today()
+    data = _get_ap_aging_data(as_of_date, current_user.company_id, db)
+    return _aging_export(data, as_of_date, "应付账款账龄", "supplier", "供应商")
+
+
+@router.get("/inventory-valuation", response_model=dict)
+@async_db_route
+def generate_inventory_valuation(
+    as_of: Optional[date] = Query(None, description="估值截止日期，默认今天"),
+    current_user=Depends(get_current_user),
+    db: Session = Depends(get_async_read_db),
+):
+    """库存估值（任何日期都读期末快照+之后的流水）"""
+    data = get_inventory_valuation(db, current_user.company_id, as_of)
+    return success_response(data=data)
+
+
+@router.post("/inventory-valuation/snapshots", response_model=dict)
+def create_inventory_valuation_snapshot(
+    period_end: date = Query(..., description="快照截止日期（通常为月末，须早于今天）"),
+    current_user=Depends(require_permission("report:create")),
+    db: Session = Depends(get_db),
+):
+    """生成库存期末快照（同一日期重复生成会覆盖）"""
+    try:
+        count = create_inventory_snapshot(db, current_user.company_id, period_end)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    db.commit()
+
+    return success_response(
+        data={"period_end": period_end.isoformat(), "products": count},
+        message="库存快照生成成功",
+    )
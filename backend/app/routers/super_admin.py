@@ -3,6 +3,7 @@
 from typing import Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
@@ -11,14 +12,20 @@ from app.models.company import Company
 from app.models.user import User
 from app.schemas.company import CompanyCreate, CompanyResponse, CompanyUpdate
 from app.schemas.user import UserCreate, UserResponse, UserRole, UserUpdate
+from app.utils.account_codes import invalidate_account_codes
 from app.utils.auth import (
     generate_random_password,
     get_current_user,
-    get_password_hash,
+    get_password_hash_async,
     is_super_admin,
     require_super_admin,
 )
 from app.utils.helpers import success_response
+from app.utils.user_cache import (
+    CurrentUser,
+    invalidate_company_users,
+    invalidate_user,
+)
 
 
 class ResetPasswordRequest(BaseModel):
@@ -35,7 +42,7 @@ router = APIRouter(prefix="/super-admin", tags=["超级管理员"])
 
 @router.get("/companies", response_model=dict)
 def get_all_companies(
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
@@ -57,7 +64,7 @@ def get_all_companies(
 @router.get("/companies/{company_id}", response_model=dict)
 def get_company_detail(
     company_id: str,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """获取公司详情（仅超级管理员）"""
@@ -71,7 +78,7 @@ def get_company_detail(
 @router.post("/companies", response_model=dict)
 def create_company(
     company_data: CompanyCreate,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """创建公司（仅超级管理员）"""
@@ -98,7 +105,7 @@ def create_company(
 def update_company(
     company_id: str,
     company_data: CompanyUpdate,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """更新公司信息（仅超级管理员）"""
@@ -115,6 +122,7 @@ def update_company(
                 setattr(company, key, value)
 
     db.commit()
+    invalidate_company_users(company_id)
     db.refresh(company)
 
     return success_response(
@@ -125,7 +133,7 @@ def update_company(
 @router.delete("/companies/{company_id}", response_model=dict)
 def delete_company(
     company_id: str,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """删除公司（仅超级管理员）"""
@@ -143,6 +151,8 @@ def delete_company(
 
     db.delete(company)
     db.commit()
+    invalidate_account_codes(company_id)
+    invalidate_company_users(company_id)
 
     return success_response(message="公司删除成功")
 
@@ -152,7 +162,7 @@ def delete_company(
 
 @router.get("/users", response_model=dict)
 def get_all_users(
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
     skip: int = 0,
     limit: int = 100,
@@ -200,7 +210,7 @@ def get_all_users(
 @router.get("/users/{user_id}", response_model=dict)
 def get_user_detail(
     user_id: str,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """获取用户详情（仅超级管理员）"""
@@ -221,12 +231,20 @@ def get_user_detail(
 
 
 @router.post("/users", response_model=dict)
-def create_user(
+async def create_user(
     user_data: UserCreate,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """创建用户（仅超级管理员，可跨公司）"""
+    # 先做数据库校验，校验通过后才计算密码哈希
+    await run_in_threadpool(_check_new_user, db, user_data)
+    password_hash = await get_password_hash_async(user_data.password)
+    return await run_in_threadpool(_create_user, db, user_data, password_hash)
+
+
+def _check_new_user(db: Session, user_data: UserCreate) -> None:
+    """校验用户名唯一与所属公司存在"""
     # 检查用户名是否已存在
     # 超级管理员用户名全局唯一，普通用户在公司内唯一
     if user_data.role == UserRole.SUPER_ADMIN:
@@ -258,9 +276,12 @@ def create_user(
         if not company:
             raise HTTPException(status_code=404, detail="公司不存在")
 
+
+def _create_user(db: Session, user_data: UserCreate, password_hash: str) -> dict:
+    """创建用户记录"""
     new_user = User(
         username=user_data.username,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=password_hash,
         role=user_data.role.value
         if hasattr(user_data.role, "value")
         else user_data.role,
@@ -283,22 +304,32 @@ def create_user(
 
 
 @router.put("/users/{user_id}", response_model=dict)
-def update_user(
+async def update_user(
     user_id: str,
     user_data: UserUpdate,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """更新用户信息（仅超级管理员）"""
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="用户不存在")
+    user = await run_in_threadpool(_get_user_or_404, db, user_id)
 
     # 不能修改自己的角色（防止误操作）
     if user.user_id == current_user.user_id and user_data.role:
         raise HTTPException(status_code=400, detail="不能修改自己的角色")
 
     update_data = user_data.dict(exclude_unset=True)
+    password_hash = None
+    if "password" in update_data and update_data["password"]:
+        password_hash = await get_password_hash_async(update_data["password"])
+    return await run_in_threadpool(
+        _update_user, db, user, update_data, password_hash
+    )
+
+
+def _update_user(
+    db: Session, user: User, update_data: dict, password_hash: Optional[str]
+) -> dict:
+    """保存用户信息变更"""
     if "role" in update_data and update_data["role"]:
         user.role = (
             update_data["role"].value
@@ -306,10 +337,11 @@ def update_user(
             else update_data["role"]
         )
 
-    if "password" in update_data and update_data["password"]:
-        user.password_hash = get_password_hash(update_data["password"])
+    if password_hash:
+        user.password_hash = password_hash
 
     db.commit()
+    invalidate_user(user.user_id)
     db.refresh(user)
 
     user_dict = UserResponse.from_orm(user).dict()
@@ -325,24 +357,40 @@ def update_user(
 
 
 @router.post("/users/{user_id}/reset-password", response_model=dict)
-def reset_user_password(
+async def reset_user_password(
     user_id: str,
     request_data: ResetPasswordRequest,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """重置用户密码（仅超级管理员）"""
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=404, detail="用户不存在")
-
     # 如果未提供新密码，生成随机密码
     new_password = request_data.new_password
     if not new_password:
         new_password = generate_random_password(12)
 
-    user.password_hash = get_password_hash(new_password)
+    # 先确认用户存在，再计算密码哈希
+    user = await run_in_threadpool(_get_user_or_404, db, user_id)
+    password_hash = await get_password_hash_async(new_password)
+    return await run_in_threadpool(
+        _reset_user_password, db, user, new_password, password_hash
+    )
+
+
+def _get_user_or_404(db: Session, user_id: str) -> User:
+    user = db.query(User).filter(User.user_id == user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="用户不存在")
+    return user
+
+
+def _reset_user_password(
+    db: Session, user: User, new_password: str, password_hash: str
+) -> dict:
+    """保存重置后的密码哈希"""
+    user.password_hash = password_hash
     db.commit()
+    invalidate_user(user.user_id)
 
     return success_response(
         data={
@@ -357,7 +405,7 @@ def reset_user_password(
 @router.delete("/users/{user_id}", response_model=dict)
 def delete_user(
     user_id: str,
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """删除用户（仅超级管理员）"""
@@ -371,6 +419,7 @@ def delete_user(
 
     db.delete(user)
     db.commit()
+    invalidate_user(user_id)
 
     return success_response(message="用户删除成功")
 
@@ -380,7 +429,7 @@ def delete_user(
 
 @router.get("/stats", response_model=dict)
 def get_system_stats(
-    current_user: User = Depends(require_super_admin()),
+    current_user: CurrentUser = Depends(require_super_admin()),
     db: Session = Depends(get_db),
 ):
     """获取系统统计信息（仅超级管理员）"""
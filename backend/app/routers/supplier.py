@@ -1,12 +1,22 @@
 """供应商管理路由"""
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from decimal import Decimal
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from app.database import get_db
+from app.database import async_db_route, get_db
+from app.models.order import PurchaseOrder
+from app.models.payment import Payment
 from app.models.supplier import Supplier
 from app.schemas.supplier import SupplierCreate, SupplierUpdate, SupplierResponse
+from app.utils.aging import AGING_BUCKET_KEYS, AGING_BUCKETS, aging_bucket_columns, paid_by_order
 from app.utils.auth import get_current_user, require_permission
+from app.utils.excel import write_only_excel_response
 from app.utils.helpers import success_response
+from app.utils.read_db import get_async_read_db, get_read_db
 
 router = APIRouter(prefix="/suppliers", tags=["供应商管理"])
 
@@ -48,9 +58,10 @@ def create_supplier(
 
 
 @router.get("", response_model=dict)
+@async_db_route
 def get_suppliers(
     current_user = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_async_read_db),
     skip: int = 0,
     limit: int = 50
 ):
@@ -136,3 +147,176 @@ def delete_supplier(
     
     return success_response(message="供应商删除成功")
 
+
+def _get_supplier(db: Session, supplier_id: str, company_id: str) -> Supplier:
+    supplier = db.query(Supplier).filter(
+        Supplier.supplier_id == supplier_id,
+        Supplier.company_id == company_id
+    ).first()
+    if not supplier:
+        raise HTTPException(status_code=404, detail="供应商不存在")
+    return supplier
+
+
+def _get_supplier_statement_data(
+    db: Session,
+    supplier: Supplier,
+    start_date: Optional[date],
+    end_date: date
+) -> dict:
+    """供应商对账单数据
+
+    采购订单（已过账/已付款）记为应付增加，关联该供应商订单的付款记为应付减少。
+    期初余额、期末账龄各用一条聚合查询，期间明细按日期合并并计算滚动余额。
+    """
+    company_id = supplier.company_id
+    po_filter = (
+        PurchaseOrder.company_id == company_id,
+        PurchaseOrder.supplier_id == supplier.supplier_id,
+        PurchaseOrder.status.in_(("Posted", "Paid")),
+    )
+
+    # 期初余额 = 期初前采购金额 - 期初前付款金额
+    opening_balance = Decimal("0")
+    if start_date:
+        purchased = db.query(func.sum(PurchaseOrder.total_amount)).filter(
+            *po_filter, PurchaseOrder.date < start_date
+        ).scalar() or Decimal("0")
+        paid = db.query(func.sum(Payment.amount)).join(
+            PurchaseOrder, Payment.purchase_order_id == PurchaseOrder.po_id
+        ).filter(
+            *po_filter, Payment.company_id == company_id, Payment.date < start_date
+        ).scalar() or Decimal("0")
+        opening_balance = purchased - paid
+
+    # 期间明细
+    order_query = db.query(PurchaseOrder).filter(*po_filter, PurchaseOrder.date <= end_date)
+    payment_query = db.query(Payment).join(
+        PurchaseOrder, Payment.purchase_order_id == PurchaseOrder.po_id
+    ).filter(*po_filter, Payment.company_id == company_id, Payment.date <= end_date)
+    if start_date:
+        order_query = order_query.filter(PurchaseOrder.date >= start_date)
+        payment_query = payment_query.filter(Payment.date >= start_date)
+
+    entries = [
+        {
+            "date": order.date,
+            "created_at": order.created_at,
+            "type": "PO",
+            "reference_id": order.po_id,
+            "description": f"采购订单 {order.po_id[:8]}",
+            "purchase_amount": order.total_amount,
+            "payment_amount": Decimal("0"),
+        }
+        for order in order_query
+    ] + [
+        {
+            "date": payment.date,
+            "created_at": payment.created_at,
+            "type": "PAYMENT",
+            "reference_id": payment.payment_id,
+            "description": f"付款 - 采购订单 {payment.purchase_order_id[:8]}",
+            "purchase_amount": Decimal("0"),
+            "payment_amount": payment.amount,
+        }
+        for payment in payment_query
+    ]
+    entries.sort(key=lambda e: (e["date"], e["created_at"] or e["date"], e["type"]))
+
+    balance = opening_balance
+    total_purchase = Decimal("0")
+    total_payment = Decimal("0")
+    lines = []
+    for entry in entries:
+        balance += entry["purchase_amount"] - entry["payment_amount"]
+        total_purchase += entry["purchase_amount"]
+        total_payment += entry["payment_amount"]
+        lines.append({
+            "date": entry["date"].isoformat(),
+            "type": entry["type"],
+            "reference_id": entry["reference_id"],
+            "description": entry["description"],
+            "purchase_amount": float(entry["purchase_amount"]),
+            "payment_amount": float(entry["payment_amount"]),
+            "balance": float(balance),
+        })
+
+    # 期末未付订单按到期日（预计交货日期，未填则为订单日期）分账龄
+    paid_sq = paid_by_order(db, company_id, end_date)
+    outstanding = PurchaseOrder.total_amount - func.coalesce(paid_sq.c.paid, 0)
+    due_date = func.coalesce(PurchaseOrder.expected_delivery_date, PurchaseOrder.date)
+    aging_row = db.query(
+        *aging_bucket_columns(due_date, outstanding, end_date)
+    ).select_from(PurchaseOrder).outerjoin(
+        paid_sq, paid_sq.c.po_id == PurchaseOrder.po_id
+    ).filter(
+        *po_filter, PurchaseOrder.date <= end_date, outstanding > 0
+    ).one()
+
+    return {
+        "supplier_id": supplier.supplier_id,
+        "supplier_name": supplier.name,
+        "start_date": start_date.isoformat() if start_date else None,
+        "end_date": end_date.isoformat(),
+        "opening_balance": float(opening_balance),
+        "total_purchase": float(total_purchase),
+        "total_payment": float(total_payment),
+        "closing_balance": float(balance),
+        "lines": lines,
+        "aging": {key: float(getattr(aging_row, key) or 0) for key in AGING_BUCKET_KEYS},
+    }
+
+
+@router.get("/{supplier_id}/statement", response_model=dict)
+def get_supplier_statement(
+    supplier_id: str,
+    start_date: Optional[date] = Query(None, description="开始日期，为空时从第一笔业务开始"),
+    end_date: Optional[date] = Query(None, description="结束日期，默认今天"),
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """供应商对账单（采购、付款明细及期末应付账龄）"""
+    supplier = _get_supplier(db, supplier_id, current_user.company_id)
+    data = _get_supplier_statement_data(db, supplier, start_date, end_date or date.today())
+    return success_response(data=data)
+
+
+@router.get("/{supplier_id}/statement/export")
+def export_supplier_statement(
+    supplier_id: str,
+    start_date: Optional[date] = Query(None, description="开始日期，为空时从第一笔业务开始"),
+    end_date: Optional[date] = Query(None, description="结束日期，默认今天"),
+    current_user = Depends(get_current_user),
+    db: Session = Depends(get_read_db)
+):
+    """导出供应商对账单（Excel）"""
+    supplier = _get_supplier(db, supplier_id, current_user.company_id)
+    end_date = end_date or date.today()
+    data = _get_supplier_statement_data(db, supplier, start_date, end_date)
+
+    type_labels = {"PO": "采购", "PAYMENT": "付款"}
+    rows = [[data["start_date"], "期初余额", None, None, data["opening_balance"]]]
+    rows += [
+        [
+            line["date"],
+            f"{type_labels[line['type']]}：{line['description']}",
+            line["purchase_amount"] or None,
+            line["payment_amount"] or None,
+            line["balance"],
+        ]
+        for line in data["lines"]
+    ]
+    aging_text = "，".join(
+        f"{label} {data['aging'][key]:.2f}" for key, label, _, _ in AGING_BUCKETS
+    )
+
+    return write_only_excel_response(
+        filename=f"供应商对账单_{supplier.name}_{end_date}.xlsx",
+        sheet_title="供应商对账单",
+        title=f"供应商对账单 - {supplier.name}",
+        subtitle=f"期间：{start_date or '期初'} 至 {end_date}；期末账龄：{aging_text}",
+        headers=["日期", "摘要", "采购金额", "付款金额", "应付余额"],
+        rows=rows,
+        footer=["合计", None, data["total_purchase"], data["total_payment"], data["closing_balance"]],
+        column_widths=[14, 40, 15, 15, 15],
+    )
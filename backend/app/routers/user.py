@@ -1,12 +1,16 @@
 """用户管理路由"""
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 
 from app.database import get_db
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserResponse, UserRole
-from app.utils.auth import get_current_user, get_password_hash, require_role
+from app.utils.auth import get_current_user, get_password_hash_async, require_role
 from app.utils.helpers import success_response
+from app.utils.user_cache import invalidate_user
 
 router = APIRouter(prefix="/users", tags=["用户管理"])
 
@@ -47,12 +51,20 @@ def get_user(
 
 
 @router.post("", response_model=dict)
-def create_user(
+async def create_user(
     user_data: UserCreate,
     current_user = Depends(require_role("Owner")),
     db: Session = Depends(get_db)
 ):
     """创建用户（仅Owner可访问）"""
+    # 先做数据库校验，校验通过后才计算密码哈希
+    await run_in_threadpool(_check_new_user, db, user_data, current_user)
+    password_hash = await get_password_hash_async(user_data.password)
+    return await run_in_threadpool(_create_user, db, user_data, password_hash)
+
+
+def _check_new_user(db: Session, user_data: UserCreate, current_user) -> None:
+    """校验用户名唯一且新用户属于当前公司"""
     # 检查用户名是否已存在（同一公司内）
     existing_user = db.query(User).filter(
         User.username == user_data.username,
@@ -68,11 +80,13 @@ def create_user(
         raise HTTPException(
             status_code=403, detail="不能为其他公司创建用户"
         )
-    
-    # 创建新用户
+
+
+def _create_user(db: Session, user_data: UserCreate, password_hash: str) -> dict:
+    """创建用户记录"""
     new_user = User(
         username=user_data.username,
-        password_hash=get_password_hash(user_data.password),
+        password_hash=password_hash,
         role=user_data.role.value if hasattr(user_data.role, "value") else user_data.role,
         company_id=user_data.company_id,
     )
@@ -87,30 +101,43 @@ def create_user(
 
 
 @router.put("/{user_id}", response_model=dict)
-def update_user(
+async def update_user(
     user_id: str,
     user_data: UserUpdate,
     current_user = Depends(require_role("Owner")),
     db: Session = Depends(get_db)
 ):
     """更新用户信息（仅Owner可访问）"""
-    user = db.query(User).filter(
-        User.user_id == user_id,
-        User.company_id == current_user.company_id
-    ).first()
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(
+            User.user_id == user_id,
+            User.company_id == current_user.company_id
+        ).first()
+    )
     
     if not user:
         raise HTTPException(status_code=404, detail="用户不存在")
     
-    # 更新允许的字段
     update_data = user_data.dict(exclude_unset=True)
+    password_hash = None
+    if update_data.get("password"):
+        password_hash = await get_password_hash_async(update_data["password"])
+    return await run_in_threadpool(_update_user, db, user, update_data, password_hash)
+
+
+def _update_user(
+    db: Session, user: User, update_data: dict, password_hash: Optional[str]
+) -> dict:
+    """保存用户信息变更"""
+    # 更新允许的字段
     if "role" in update_data:
         user.role = update_data["role"].value if hasattr(update_data["role"], "value") else update_data["role"]
     
-    if "password" in update_data:
-        user.password_hash = get_password_hash(update_data["password"])
+    if password_hash:
+        user.password_hash = password_hash
     
     db.commit()
+    invalidate_user(user.user_id)
     db.refresh(user)
     
     return success_response(
@@ -140,6 +167,7 @@ def delete_user(
     
     db.delete(user)
     db.commit()
+    invalidate_user(user_id)
     
     return success_response(message="用户删除成功")
 
@@ -35,6 +35,7 @@ class CustomerResponse(BaseModel):
     phone: Optional[str]
     address: Optional[str]
     credit_limit: Decimal
+    outstanding_receivable: Optional[Decimal] = Decimal("0")
     remark: Optional[str]
     created_at: datetime
 
@@ -71,9 +71,10 @@ class InventoryItemResponse(BaseModel):
     # 商品信息
     product_name: Optional[str] = None
     product_sku: Optional[str] = None
-    # 从流水记录汇总的位置信息（不在模型中，由API动态添加）
+    # 从 inventory_location 汇总的位置信息（不在模型中，由API动态添加）
     warehouse_locations: Optional[list[str]] = None
     warehouse_location: Optional[str] = None  # 兼容字段，显示所有位置的汇总
+    location_quantities: Optional[dict[str, Decimal]] = None  # 各位置数量（仅含带位置的流水）
 
     class Config:
         """Pydantic配置"""
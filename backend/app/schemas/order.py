@@ -4,7 +4,7 @@ from datetime import date, datetime
 from decimal import Decimal
 from enum import Enum
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class OrderStatus(str, Enum):
@@ -121,6 +121,7 @@ class SalesOrderResponse(BaseModel):
     expected_delivery_date: date | None = None
     total_amount: Decimal
     payment_method: str | None = None
+    received_amount: Decimal | None = Decimal("0")
     status: str
     remark: str = ""
     created_at: datetime
@@ -145,6 +146,15 @@ class PostPurchaseOrderRequest(BaseModel):
         from_attributes = True
 
 
+class PostPurchaseOrderBatchRequest(BaseModel):
+    """采购订单批量过账请求"""
+
+    po_ids: list[str] = Field(..., min_length=1, max_length=500, description="采购订单ID列表")
+    warehouse_locations: dict[str, dict[str, str | None]] = Field(
+        default={}, description="仓库位置，key: po_id，value: {product_id: warehouse_location}"
+    )
+
+
 class PostSalesOrderRequest(BaseModel):
     """销售订单过账请求（简化版：不需要位置信息，只检查总库存）"""
 
@@ -152,3 +162,9 @@ class PostSalesOrderRequest(BaseModel):
         """Pydantic配置"""
 
         from_attributes = True
+
+
+class PostSalesOrderBatchRequest(BaseModel):
+    """销售订单批量过账请求"""
+
+    so_ids: list[str] = Field(..., min_length=1, max_length=500, description="销售订单ID列表")
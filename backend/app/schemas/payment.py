@@ -5,7 +5,7 @@ from decimal import Decimal
 from enum import Enum
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class PaymentMethod(str, Enum):
@@ -26,6 +26,12 @@ class PaymentCreate(BaseModel):
     remark: str = ""
 
 
+class PaymentBatchCreate(BaseModel):
+    """批量创建付款记录"""
+
+    items: list[PaymentCreate] = Field(..., min_length=1, max_length=1000)
+
+
 class PaymentResponse(BaseModel):
     """付款记录响应"""
 
@@ -54,6 +60,12 @@ class ReceiptCreate(BaseModel):
     remark: str = ""
 
 
+class ReceiptBatchCreate(BaseModel):
+    """批量创建收款记录"""
+
+    items: list[ReceiptCreate] = Field(..., min_length=1, max_length=1000)
+
+
 class ReceiptResponse(BaseModel):
     """收款记录响应"""
 
@@ -56,6 +56,7 @@ class ProductResponse(BaseModel):
     name: str
     price: Optional[Decimal] = None
     cost: Optional[Decimal] = None
+    quantity: Optional[Decimal] = None  # 库存数量（从库存获取）
     average_cost: Optional[Decimal] = None  # 加权平均成本（从库存获取）
 
     class Config:
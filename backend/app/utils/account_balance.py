@@ -0,0 +1,365 @@
+"""科目余额增量维护（应用层）
+
+ACCOUNT_BALANCE_MODE=app 时，由应用代替 trg_ledger_after_* 触发器维护
+account.balance_debit / balance_credit：
+1. flush 时收集本事务内分录明细的借贷增量，按科目累加；
+2. commit 前把增量沿父级链展开（父级映射常驻缓存，科目父级不可修改）；
+3. 每个受影响科目只执行一条 UPDATE，按主键排序以避免死锁。
+
+此模式下连接会让触发器跳过余额更新，余额只来自 SessionLocal 会话 flush 的分录明细。
+因此分录明细只能通过 SessionLocal 会话的普通 ORM 增删改写入：
+- 对 LedgerLine 的 ORM 批量 insert/update/delete 语句（session.execute / query.delete）会被拒绝；
+- bulk_save_objects / bulk_insert_mappings、Connection 上的 Core 语句、不是由 SessionLocal
+  创建的会话（包括 AsyncSessionLocal）都不经过这里，写入分录明细会使 balance_debit / balance_credit 失真。
+"""
+
+import uuid
+from collections import defaultdict
+from datetime import date as date_type
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, event, func, inspect, select, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import SessionLocal
+from app.models.account import Account, AccountBalanceSnapshot
+from app.models.journal import JournalEntry, LedgerLine
+
+settings = get_settings()
+
+_PENDING_KEY = "account_balance_deltas"
+
+# account_id -> parent_id（科目创建后父级不会变化，可长期缓存）
+_parent_cache: Dict[str, Optional[str]] = {}
+
+
+def app_maintains_balances() -> bool:
+    """是否由应用层维护科目余额"""
+    return settings.ACCOUNT_BALANCE_MODE == "app"
+
+
+def forget_accounts(account_ids: Iterable[str]) -> None:
+    """科目删除后移除父级缓存"""
+    for account_id in account_ids:
+        _parent_cache.pop(account_id, None)
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal("0")
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _pending(session: Session) -> Dict[str, List[Decimal]]:
+    return session.info.setdefault(
+        _PENDING_KEY, defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    )
+
+
+def _add(session: Session, account_id: Optional[str], debit, credit) -> None:
+    if not account_id:
+        return
+    delta = _pending(session)[account_id]
+    delta[0] += _to_decimal(debit)
+    delta[1] += _to_decimal(credit)
+
+
+def _history_values(state, key: str):
+    """返回属性修改前后的值 (old, new)"""
+    history = state.attrs[key].history
+    new = history.added[0] if history.added else state.attrs[key].value
+    old = history.deleted[0] if history.deleted else new
+    return old, new
+
+
+def load_ancestors(session: Session, account_ids: Iterable[str]) -> Dict[str, List[str]]:
+    """获取科目的祖先链（不含自身，由近及远）
+
+    缓存未命中时逐层批量查询父级，每一层级只发一条查询。
+    """
+    missing = {a for a in account_ids if a and a not in _parent_cache}
+    while missing:
+        rows = session.execute(
+            select(Account.account_id, Account.parent_id).where(
+                Account.account_id.in_(missing)
+            )
+        ).all()
+        for account_id, parent_id in rows:
+            _parent_cache[account_id] = parent_id
+        for account_id in missing - {row[0] for row in rows}:
+            _parent_cache[account_id] = None
+        missing = {
+            parent_id
+            for parent_id in (_parent_cache[a] for a in missing)
+            if parent_id and parent_id not in _parent_cache
+        }
+
+    ancestors = {}
+    for account_id in account_ids:
+        chain = []
+        parent_id = _parent_cache.get(account_id)
+        while parent_id and parent_id not in chain:
+            chain.append(parent_id)
+            parent_id = _parent_cache.get(parent_id)
+        ancestors[account_id] = chain
+    return ancestors
+
+
+def roll_up_balances(
+    parent_map: Dict[str, Optional[str]], sums: Dict[str, List[Decimal]]
+) -> Dict[str, List[Decimal]]:
+    """把各科目自身的借贷合计累加到其所有上级科目"""
+    totals: Dict[str, List[Decimal]] = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    for account_id, (debit, credit) in sums.items():
+        target = account_id
+        visited = set()
+        while target and target not in visited:
+            visited.add(target)
+            totals[target][0] += debit
+            totals[target][1] += credit
+            target = parent_map.get(target)
+    return totals
+
+
+def apply_balance_deltas(session: Session, deltas: Dict[str, List[Decimal]]) -> int:
+    """把科目增量展开到祖先并批量写入，返回更新的科目数"""
+    load_ancestors(session, deltas.keys())
+    totals = roll_up_balances(_parent_cache, deltas)
+
+    params = [
+        {"b_account_id": account_id, "b_debit": debit, "b_credit": credit}
+        for account_id, (debit, credit) in sorted(totals.items())
+        if debit or credit
+    ]
+    if not params:
+        return 0
+
+    table = Account.__table__
+    stmt = (
+        update(table)
+        .where(table.c.account_id == bindparam("b_account_id"))
+        .values(
+            balance_debit=func.coalesce(table.c.balance_debit, 0)
+            + bindparam("b_debit"),
+            balance_credit=func.coalesce(table.c.balance_credit, 0)
+            + bindparam("b_credit"),
+        )
+    )
+    session.connection().execute(stmt, params)
+    return len(params)
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _collect_ledger_deltas(session: Session, flush_context) -> None:
+    """收集本次 flush 中分录明细的借贷增量"""
+    if not app_maintains_balances():
+        return
+
+    for obj in session.new:
+        if isinstance(obj, LedgerLine):
+            _add(session, obj.account_id, obj.debit, obj.credit)
+
+    for obj in session.deleted:
+        if isinstance(obj, LedgerLine):
+            state = inspect(obj)
+            account_id = _history_values(state, "account_id")[0]
+            debit = _history_values(state, "debit")[0]
+            credit = _history_values(state, "credit")[0]
+            _add(session, account_id, -_to_decimal(debit), -_to_decimal(credit))
+
+    for obj in session.dirty:
+        if not isinstance(obj, LedgerLine) or not session.is_modified(obj):
+            continue
+        state = inspect(obj)
+        old_account, new_account = _history_values(state, "account_id")
+        old_debit, new_debit = _history_values(state, "debit")
+        old_credit, new_credit = _history_values(state, "credit")
+        _add(session, old_account, -_to_decimal(old_debit), -_to_decimal(old_credit))
+        _add(session, new_account, new_debit, new_credit)
+
+
+@event.listens_for(SessionLocal, "before_commit")
+def _flush_balance_deltas(session: Session) -> None:
+    """提交前一次性写入累计的科目余额"""
+    if not app_maintains_balances():
+        return
+
+    # commit 会在 before_commit 之后才 flush，这里提前 flush 以收集全部明细
+    session.flush()
+    deltas = session.info.pop(_PENDING_KEY, None)
+    if deltas:
+        apply_balance_deltas(session, deltas)
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _refuse_bulk_ledger_writes(orm_execute_state) -> None:
+    """拒绝绕过 flush 的分录明细批量写入（其余额增量无法收集）"""
+    if not app_maintains_balances() or orm_execute_state.is_select:
+        return
+    mapper = orm_execute_state.bind_mapper
+    if mapper is not None and mapper.class_ is LedgerLine:
+        raise RuntimeError(
+            "ACCOUNT_BALANCE_MODE=app 时分录明细只能通过 ORM 对象增删改，不能批量写入"
+        )
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_balance_deltas(session: Session, previous_transaction) -> None:
+    """回滚时丢弃未提交的增量"""
+    session.info.pop(_PENDING_KEY, None)
+
+
+# ==================== 余额查询与快照 ====================
+
+
+def _posted_line_sums(
+    db: Session,
+    company_id: str,
+    after: Optional[date_type],
+    until: date_type,
+) -> Dict[str, List[Decimal]]:
+    """按科目汇总 (after, until] 区间内已过账分录的借贷发生额"""
+    query = (
+        select(
+            LedgerLine.account_id,
+            func.coalesce(func.sum(LedgerLine.debit), 0),
+            func.coalesce(func.sum(LedgerLine.credit), 0),
+        )
+        .join(JournalEntry, LedgerLine.journal_id == JournalEntry.journal_id)
+        .where(
+            JournalEntry.company_id == company_id,
+            JournalEntry.posted == True,  # noqa: E712
+            JournalEntry.date <= until,
+        )
+        .group_by(LedgerLine.account_id)
+    )
+    if after is not None:
+        query = query.where(JournalEntry.date > after)
+    return {
+        account_id: [_to_decimal(debit), _to_decimal(credit)]
+        for account_id, debit, credit in db.execute(query)
+    }
+
+
+def _historical_balances(
+    db: Session, company_id: str, parent_map: Dict[str, Optional[str]], as_of: date_type
+):
+    """期末快照 + 快照之后的发生额，返回 (累计余额, 使用的快照日期)"""
+    snapshot_date = db.execute(
+        select(func.max(AccountBalanceSnapshot.period_end)).where(
+            AccountBalanceSnapshot.company_id == company_id,
+            AccountBalanceSnapshot.period_end <= as_of,
+        )
+    ).scalar()
+
+    totals: Dict[str, List[Decimal]] = defaultdict(lambda: [Decimal("0"), Decimal("0")])
+    if snapshot_date is not None:
+        rows = db.execute(
+            select(
+                AccountBalanceSnapshot.account_id,
+                AccountBalanceSnapshot.balance_debit,
+                AccountBalanceSnapshot.balance_credit,
+            ).where(
+                AccountBalanceSnapshot.company_id == company_id,
+                AccountBalanceSnapshot.period_end == snapshot_date,
+            )
+        )
+        for account_id, debit, credit in rows:
+            totals[account_id][0] += _to_decimal(debit)
+            totals[account_id][1] += _to_decimal(credit)
+
+    if snapshot_date != as_of:
+        deltas = roll_up_balances(
+            parent_map, _posted_line_sums(db, company_id, snapshot_date, as_of)
+        )
+        for account_id, (debit, credit) in deltas.items():
+            totals[account_id][0] += debit
+            totals[account_id][1] += credit
+    return totals, snapshot_date
+
+
+def get_account_balances(
+    db: Session, company_id: str, as_of: Optional[date_type] = None
+) -> dict:
+    """获取公司全部科目截至指定日期的余额（含下级科目）
+
+    任何日期（含今天）都按同一口径计算：最近一次期末快照 + 快照之后截至 as_of 的已过账发生额。
+    account 表的缓存余额包含未过账及未来日期的分录，口径不同，这里不使用。
+    """
+    as_of = as_of or date_type.today()
+    accounts = (
+        db.query(Account)
+        .filter(Account.company_id == company_id)
+        .order_by(Account.code)
+        .all()
+    )
+
+    parent_map = {acc.account_id: acc.parent_id for acc in accounts}
+    totals, snapshot_date = _historical_balances(db, company_id, parent_map, as_of)
+    source = "snapshot" if snapshot_date is not None else "ledger"
+
+    result = []
+    for acc in accounts:
+        debit, credit = totals.get(acc.account_id, (Decimal("0"), Decimal("0")))
+        balance = debit - credit if acc.normal_balance == "Debit" else credit - debit
+        result.append(
+            {
+                "account_id": acc.account_id,
+                "parent_id": acc.parent_id,
+                "code": acc.code,
+                "name": acc.name,
+                "type": acc.type,
+                "normal_balance": acc.normal_balance,
+                "balance_debit": float(debit),
+                "balance_credit": float(credit),
+                "balance": float(balance),
+            }
+        )
+
+    return {
+        "as_of": as_of.isoformat(),
+        "source": source,
+        "snapshot_date": snapshot_date.isoformat() if snapshot_date else None,
+        "accounts": result,
+    }
+
+
+def create_balance_snapshot(db: Session, company_id: str, period_end: date_type) -> int:
+    """生成（或重建）指定期末日期的科目余额快照，返回写入行数
+
+    只能为已结束的期间生成快照（period_end 早于今天），否则之后补记的分录会使快照失效。
+
+    Raises:
+        ValueError: period_end 不早于今天
+    """
+    if period_end >= date_type.today():
+        raise ValueError("只能为已结束的期间生成余额快照")
+    accounts = db.query(Account.account_id, Account.parent_id).filter(
+        Account.company_id == company_id
+    )
+    parent_map = {account_id: parent_id for account_id, parent_id in accounts}
+
+    # 重建同一期末快照时不能以自身为基础
+    db.query(AccountBalanceSnapshot).filter(
+        AccountBalanceSnapshot.company_id == company_id,
+        AccountBalanceSnapshot.period_end == period_end,
+    ).delete(synchronize_session=False)
+    totals, _ = _historical_balances(db, company_id, parent_map, period_end)
+
+    rows = [
+        {
+            "snapshot_id": str(uuid.uuid4()),
+            "company_id": company_id,
+            "account_id": account_id,
+            "period_end": period_end,
+            "balance_debit": debit,
+            "balance_credit": credit,
+        }
+        for account_id, (debit, credit) in totals.items()
+        if account_id in parent_map and (debit or credit)
+    ]
+    if rows:
+        db.execute(AccountBalanceSnapshot.__table__.insert(), rows)
+    return len(rows)
@@ -0,0 +1,68 @@
+"""科目编码缓存
+
+过账、收付款、对账等路径需要按编码（1405、2202、1122 ...）定位科目。
+这里按公司缓存整张科目表的 code -> account_id 映射：首次访问一次查询加载，
+科目新增/修改/删除后由路由调用 invalidate_account_codes 失效。
+多进程部署时各进程缓存独立，因此额外设置了过期时间兜底。
+"""
+
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models.account import Account
+
+# 缓存有效期（秒）
+CACHE_TTL_SECONDS = 300
+
+_lock = threading.Lock()
+# company_id -> (加载时间, {code: account_id})
+_code_cache: Dict[str, tuple] = {}
+
+
+def _load(db: Session, company_id: str) -> Dict[str, str]:
+    rows = db.query(Account.code, Account.account_id).filter(
+        Account.company_id == company_id
+    )
+    mapping = {code: account_id for code, account_id in rows}
+    with _lock:
+        _code_cache[company_id] = (time.monotonic(), mapping)
+    return mapping
+
+
+def _cached(company_id: str) -> Optional[Dict[str, str]]:
+    with _lock:
+        entry = _code_cache.get(company_id)
+    if entry is None:
+        return None
+    loaded_at, mapping = entry
+    if time.monotonic() - loaded_at > CACHE_TTL_SECONDS:
+        return None
+    return mapping
+
+
+def get_account_ids(
+    db: Session, company_id: str, codes: Iterable[str]
+) -> Dict[str, Optional[str]]:
+    """批量按编码获取科目ID，不存在的编码对应 None
+
+    缓存中缺少某个编码时会重新加载一次，以便其他进程新建的科目可以立即生效。
+    """
+    codes = list(codes)
+    mapping = _cached(company_id)
+    if mapping is None or any(code not in mapping for code in codes):
+        mapping = _load(db, company_id)
+    return {code: mapping.get(code) for code in codes}
+
+
+def get_account_id(db: Session, company_id: str, code: str) -> Optional[str]:
+    """按编码获取单个科目ID"""
+    return get_account_ids(db, company_id, [code])[code]
+
+
+def invalidate_account_codes(company_id: str) -> None:
+    """科目表变更后使该公司的编码缓存失效"""
+    with _lock:
+        _code_cache.pop(company_id, None)
@@ -0,0 +1,76 @@
+"""账龄与往来结算汇总
+
+应收/应付账龄、供应商对账单、可收付款订单列表都需要"订单金额 - 已结算金额"，
+这里统一提供按订单分组的已收/已付子查询和账龄分桶表达式，避免逐单查询。
+"""
+
+from datetime import date, timedelta
+from typing import Optional
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+
+from app.models.payment import Payment, Receipt
+
+# 账龄区间：(键, 名称, 起始天数, 截止天数)，截止为 None 表示无上限
+AGING_BUCKETS = [
+    ("days_0_30", "0-30天", 0, 30),
+    ("days_31_60", "31-60天", 31, 60),
+    ("days_61_90", "61-90天", 61, 90),
+    ("days_over_90", "90天以上", 91, None),
+]
+
+AGING_BUCKET_KEYS = [bucket[0] for bucket in AGING_BUCKETS]
+
+
+def aging_bucket_columns(date_column, amount, as_of_date: date) -> list:
+    """按账龄区间分组求和的列
+
+    账龄天数 = as_of_date - 日期列。区间边界预先换算成日期，
+    CASE 直接比较日期列，等价于按 DATEDIFF 分桶且各数据库通用。
+    尚未到期（日期晚于 as_of_date）的金额计入第一个区间。
+    """
+    columns = []
+    for key, _, start_days, end_days in AGING_BUCKETS:
+        conditions = []
+        if start_days > 0:
+            conditions.append(date_column <= as_of_date - timedelta(days=start_days))
+        if end_days is not None:
+            conditions.append(date_column >= as_of_date - timedelta(days=end_days))
+        columns.append(
+            func.coalesce(func.sum(case((and_(*conditions), amount), else_=0)), 0).label(
+                key
+            )
+        )
+    return columns
+
+
+def aging_bucket_key(document_date: date, as_of_date: date) -> str:
+    """单个日期所属的账龄区间"""
+    days = (as_of_date - document_date).days
+    for key, _, start_days, end_days in AGING_BUCKETS:
+        if days >= start_days and (end_days is None or days <= end_days):
+            return key
+    return AGING_BUCKET_KEYS[0]
+
+
+def received_by_order(db: Session, company_id: str, as_of_date: Optional[date] = None):
+    """按销售订单汇总已收金额的子查询 (so_id, received)"""
+    query = db.query(
+        Receipt.sales_order_id.label("so_id"),
+        func.sum(Receipt.amount).label("received"),
+    ).filter(Receipt.company_id == company_id, Receipt.sales_order_id.isnot(None))
+    if as_of_date is not None:
+        query = query.filter(Receipt.date <= as_of_date)
+    return query.group_by(Receipt.sales_order_id).subquery()
+
+
+def paid_by_order(db: Session, company_id: str, as_of_date: Optional[date] = None):
+    """按采购订单汇总已付金额的子查询 (po_id, paid)"""
+    query = db.query(
+        Payment.purchase_order_id.label("po_id"),
+        func.sum(Payment.amount).label("paid"),
+    ).filter(Payment.company_id == company_id, Payment.purchase_order_id.isnot(None))
+    if as_of_date is not None:
+        query = query.filter(Payment.date <= as_of_date)
+    return query.group_by(Payment.purchase_order_id).subquery()
@@ -1,12 +1,16 @@
 """认证相关工具"""
 
+import asyncio
 import re
 import secrets
 import string
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List, Optional, Union
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Tuple, Union
 
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
@@ -15,10 +19,17 @@ from sqlalchemy.orm import Session
 from app.config import get_settings
 from app.database import get_db
 from app.models.user import User
+from app.utils.user_cache import CurrentUser, cache_user, get_cached_user
 
 settings = get_settings()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS
+)
+# bcrypt 计算期间释放 GIL，独立的有界线程池既能并行哈希，又不会占满请求线程池
+_password_hash_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_PREFIX}/auth/login")
 
 ROLE_PERMISSIONS = {
@@ -69,6 +80,41 @@ ROLE_PERMISSIONS = {
 }
 
 
+def _compile_role_permissions(
+    role_permissions: Dict[str, List[str]],
+) -> Dict[str, Tuple[bool, FrozenSet[str], FrozenSet[str]]]:
+    """把角色权限表编译为 {角色: (是否拥有全部权限, 精确权限集合, 通配前缀集合)}
+
+    "purchase:*" 记为前缀 "purchase"，匹配 "purchase:" 开头的任意权限。
+    """
+    compiled = {}
+    for role, grants in role_permissions.items():
+        compiled[role] = (
+            "*" in grants,
+            frozenset(g for g in grants if g != "*" and not g.endswith(":*")),
+            frozenset(g[:-2] for g in grants if g.endswith(":*")),
+        )
+    return compiled
+
+
+_COMPILED_ROLE_PERMISSIONS = _compile_role_permissions(ROLE_PERMISSIONS)
+
+
+@lru_cache(maxsize=None)
+def roles_with_permission(permission: str) -> FrozenSet[str]:
+    """拥有指定权限的角色集合（每个权限只计算一次）"""
+    parts = permission.split(":")
+    # "a:b:c" 可被 "a:*"、"a:b:*" 授予
+    prefixes = [":".join(parts[:i]) for i in range(1, len(parts))]
+    return frozenset(
+        role
+        for role, (allow_all, exact, wildcards) in _COMPILED_ROLE_PERMISSIONS.items()
+        if allow_all
+        or permission in exact
+        or any(prefix in wildcards for prefix in prefixes)
+    )
+
+
 def validate_username(username: str) -> bool:
     """验证用户名格式：英文或数字开头，可包含下划线"""
     if not username:
@@ -108,6 +154,13 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
+def verify_and_update_password(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """验证密码；成本因子与当前配置不同时同时返回按当前配置重算的新哈希"""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
 def get_password_hash(password: str) -> str:
     """加密密码"""
     password_str = str(password)
@@ -127,6 +180,27 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password_str)
 
 
+async def verify_and_update_password_async(
+    plain_password: str, hashed_password: str
+) -> Tuple[bool, Optional[str]]:
+    """在密码哈希线程池中验证密码（见 verify_and_update_password）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_hash_executor,
+        verify_and_update_password,
+        plain_password,
+        hashed_password,
+    )
+
+
+async def get_password_hash_async(password: str) -> str:
+    """在密码哈希线程池中加密密码"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _password_hash_executor, get_password_hash, password
+    )
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建访问令牌"""
     to_encode = data.copy()
@@ -148,8 +222,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
 
 def get_current_user(
     token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)
-) -> User:
-    """获取当前登录用户"""
+) -> CurrentUser:
+    """获取当前登录用户（优先读取登录用户缓存，未命中时查询数据库）"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="无法验证凭据",
@@ -166,43 +240,63 @@ def get_current_user(
     except JWTError:
         raise credentials_exception
 
-    user = db.query(User).filter(User.user_id == user_id).first()
-    if user is None:
+    # 记录请求会话所属用户，供只读副本的读己之写判断（见 app/utils/read_db.py）
+    db.info["user_id"] = user_id
+
+    user = get_cached_user(user_id)
+    if user is not None:
+        return user
+
+    db_user = db.query(User).filter(User.user_id == user_id).first()
+    if db_user is None:
         raise credentials_exception
 
+    user = CurrentUser.from_user(db_user)
+    cache_user(user)
     return user
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """验证用户"""
-    user = db.query(User).filter(User.username == username).first()
+async def authenticate_user_async(
+    db: Session, username: str, password: str
+) -> Optional[User]:
+    """验证用户（异步接口使用）
+
+    数据库访问放在请求线程池，bcrypt 校验放在密码哈希线程池；
+    成本因子变更后，登录成功时透明地按新配置重算并保存密码哈希。
+    """
+    user = await run_in_threadpool(
+        lambda: db.query(User).filter(User.username == username).first()
+    )
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    valid, new_hash = await verify_and_update_password_async(
+        password, user.password_hash
+    )
+    if not valid:
         return None
+    if new_hash:
+        user.password_hash = new_hash
+        await run_in_threadpool(db.commit)
     return user
 
 
-def check_permission(user: User, permission: str) -> bool:
+def check_permission(user: CurrentUser, permission: str) -> bool:
     """检查用户是否有指定权限"""
-    user_permissions = ROLE_PERMISSIONS.get(user.role, [])
-    if "*" in user_permissions:
-        return True
-    for perm in user_permissions:
-        if perm == permission:
-            return True
-        if perm.endswith(":*"):
-            prefix = perm[:-2]
-            if permission.startswith(prefix + ":"):
-                return True
-    return False
+    return user.role in roles_with_permission(permission)
 
 
+@lru_cache(maxsize=None)
 def require_permission(permission: str):
-    """权限检查依赖函数"""
+    """权限检查依赖函数
+
+    同一权限返回同一个依赖函数，一个请求内多次检查同一权限时由 FastAPI 的依赖缓存只执行一次。
+    """
+    allowed_roles = roles_with_permission(permission)
 
-    def permission_checker(current_user: User = Depends(get_current_user)) -> User:
-        if not check_permission(current_user, permission):
+    def permission_checker(
+        current_user: CurrentUser = Depends(get_current_user),
+    ) -> CurrentUser:
+        if current_user.role not in allowed_roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail=f"权限不足：需要 {permission} 权限",
@@ -217,7 +311,9 @@ def require_role(roles: Union[str, List[str]]):
     if isinstance(roles, str):
         roles = [roles]
 
-    def role_checker(current_user: User = Depends(get_current_user)) -> User:
+    def role_checker(
+        current_user: CurrentUser = Depends(get_current_user),
+    ) -> CurrentUser:
         if current_user.role not in roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -231,7 +327,9 @@ def require_role(roles: Union[str, List[str]]):
 def require_any_role(*roles: str):
     """任意角色检查依赖函数"""
 
-    def role_checker(current_user: User = Depends(get_current_user)) -> User:
+    def role_checker(
+        current_user: CurrentUser = Depends(get_current_user),
+    ) -> CurrentUser:
         if current_user.role not in roles:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -245,7 +343,9 @@ def require_any_role(*roles: str):
 def require_super_admin():
     """超级管理员检查依赖函数"""
 
-    def super_admin_checker(current_user: User = Depends(get_current_user)) -> User:
+    def super_admin_checker(
+        current_user: CurrentUser = Depends(get_current_user),
+    ) -> CurrentUser:
         if current_user.role != "SuperAdmin":
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -256,6 +356,6 @@ def require_super_admin():
     return super_admin_checker
 
 
-def is_super_admin(user: User) -> bool:
+def is_super_admin(user: CurrentUser) -> bool:
     """检查用户是否为超级管理员"""
     return user.role == "SuperAdmin"
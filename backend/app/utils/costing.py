@@ -0,0 +1,179 @@
+"""销售成本计价（加权平均 / 先进先出）
+
+INVENTORY_COSTING_METHOD=average（默认）时，销售出库按 inventory_item.average_cost 结转成本；
+=fifo 时，采购入库同时写入成本层（inventory_cost_layer：批次剩余数量与单位成本），
+销售出库按入库先后消耗成本层：
+1. 成本层只保留仍有剩余的批次（耗尽即删除），一批出库涉及的商品只做一次按索引的范围读取并加锁；
+2. 在内存中逐层扣减，提交前剩余数量批量 UPDATE、耗尽批次一次 DELETE；
+3. 启用 FIFO 前已有的库存、手工入库的库存没有采购成本层：写入采购成本层前，
+   先把入库前未被成本层覆盖的库存按当时的加权平均成本补成一个期初层，排在本批次之前；
+   仍不足的部分按当前加权平均成本结转。
+两种方式下加权平均成本都照常维护，供库存估值等报表使用。
+"""
+
+from collections import defaultdict, deque
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, insert, update
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.models.inventory import InventoryCostLayer
+
+settings = get_settings()
+
+
+def fifo_enabled() -> bool:
+    """是否按先进先出结转销售成本"""
+    return settings.INVENTORY_COSTING_METHOD == "fifo"
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal("0")
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def cost_layer_row(
+    company_id: str,
+    product_id: str,
+    quantity,
+    unit_cost,
+    source_type: str,
+    source_id: str,
+) -> dict:
+    """构造一条入库成本层"""
+    return {
+        "company_id": company_id,
+        "product_id": product_id,
+        "source_type": source_type,
+        "source_id": source_id,
+        "quantity": quantity,
+        "remaining_quantity": quantity,
+        "unit_cost": unit_cost,
+    }
+
+
+def add_cost_layers(
+    db: Session,
+    rows: List[dict],
+    opening_stock: Optional[Dict[str, Tuple]] = None,
+) -> None:
+    """批量写入成本层（一条多行 INSERT，自增主键保持入库顺序）
+
+    Args:
+        opening_stock: {product_id: (入库前数量, 入库前加权平均成本)}，
+            入库前数量超出现有成本层剩余数量的部分先写成期初层
+    """
+    if not rows:
+        return
+    if opening_stock:
+        company_id = rows[0]["company_id"]
+        product_ids = list(dict.fromkeys(row["product_id"] for row in rows))
+        covered = dict(
+            db.query(
+                InventoryCostLayer.product_id,
+                func.sum(InventoryCostLayer.remaining_quantity),
+            )
+            .filter(
+                InventoryCostLayer.company_id == company_id,
+                InventoryCostLayer.product_id.in_(product_ids),
+            )
+            .group_by(InventoryCostLayer.product_id)
+            .all()
+        )
+        opening = []
+        for product_id in product_ids:
+            quantity, unit_cost = opening_stock.get(product_id, (0, 0))
+            uncovered = _to_decimal(quantity) - _to_decimal(covered.get(product_id))
+            if uncovered > 0:
+                opening.append(
+                    cost_layer_row(
+                        company_id,
+                        product_id,
+                        uncovered,
+                        _to_decimal(unit_cost),
+                        "Opening",
+                        None,
+                    )
+                )
+        rows = opening + rows
+    db.execute(insert(InventoryCostLayer.__table__), rows)
+
+
+def unit_cost_of(total_cost: Decimal, quantity) -> Decimal:
+    """出库流水记录的单位成本（两位小数）"""
+    quantity = _to_decimal(quantity)
+    if not quantity:
+        return Decimal("0")
+    return (total_cost / quantity).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+
+
+class FifoCostLayers:
+    """一批商品的先进先出成本层：一次加载并加锁，内存中消耗，最后批量写回"""
+
+    def __init__(self, db: Session, company_id: str, product_ids: Iterable[str]):
+        self.db = db
+        self._layers: Dict[str, deque] = defaultdict(deque)
+        self._changed: Dict[int, Decimal] = {}
+
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        rows = (
+            db.query(
+                InventoryCostLayer.layer_id,
+                InventoryCostLayer.product_id,
+                InventoryCostLayer.remaining_quantity,
+                InventoryCostLayer.unit_cost,
+            )
+            .filter(
+                InventoryCostLayer.company_id == company_id,
+                InventoryCostLayer.product_id.in_(product_ids),
+            )
+            .order_by(InventoryCostLayer.product_id, InventoryCostLayer.layer_id)
+            .with_for_update()
+        )
+        for layer_id, product_id, remaining, unit_cost in rows:
+            self._layers[product_id].append(
+                [layer_id, _to_decimal(remaining), _to_decimal(unit_cost)]
+            )
+
+    def consume(self, product_id: str, quantity, fallback_cost) -> Decimal:
+        """按先进先出消耗指定数量，返回结转成本（成本层不足部分按 fallback_cost 计）"""
+        remaining = _to_decimal(quantity)
+        cost = Decimal("0")
+        layers = self._layers.get(product_id) or deque()
+        while remaining > 0 and layers:
+            layer = layers[0]
+            taken = min(remaining, layer[1])
+            cost += taken * layer[2]
+            layer[1] -= taken
+            remaining -= taken
+            self._changed[layer[0]] = layer[1]
+            if layer[1] <= 0:
+                layers.popleft()
+        if remaining > 0:
+            cost += remaining * _to_decimal(fallback_cost)
+        return cost
+
+    def flush(self) -> None:
+        """写回剩余数量，删除已耗尽的成本层"""
+        exhausted = [layer_id for layer_id, left in self._changed.items() if left <= 0]
+        partial = [
+            {"b_layer_id": layer_id, "b_remaining": left}
+            for layer_id, left in self._changed.items()
+            if left > 0
+        ]
+        table = InventoryCostLayer.__table__
+        if exhausted:
+            self.db.execute(table.delete().where(table.c.layer_id.in_(exhausted)))
+        if partial:
+            self.db.connection().execute(
+                update(table)
+                .where(table.c.layer_id == bindparam("b_layer_id"))
+                .values(remaining_quantity=bindparam("b_remaining")),
+                partial,
+            )
+        self._changed.clear()
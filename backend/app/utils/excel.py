@@ -0,0 +1,80 @@
+"""Excel 导出工具
+
+明细类报表（账龄、对账单等）行数可能很多，使用 openpyxl 只写模式逐行写入，
+不经过 DataFrame，也不保留整张工作表的单元格对象。
+"""
+
+from io import BytesIO
+from typing import Iterable, List, Optional, Sequence
+from urllib.parse import quote
+
+from fastapi.responses import StreamingResponse
+
+
+def write_only_excel_response(
+    filename: str,
+    sheet_title: str,
+    title: str,
+    subtitle: str,
+    headers: Sequence[str],
+    rows: Iterable[Sequence],
+    footer: Optional[Sequence] = None,
+    column_widths: Optional[List[int]] = None,
+) -> StreamingResponse:
+    """生成只写模式的 Excel 并以附件形式返回
+
+    Args:
+        filename: 下载文件名（含 .xlsx）
+        sheet_title: 工作表名称
+        title / subtitle: 表头上方的标题和说明行
+        headers: 列标题
+        rows: 数据行，可以是生成器
+        footer: 合计行（加粗）
+        column_widths: 各列宽度
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, PatternFill
+    from openpyxl.utils import get_column_letter
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(sheet_title)
+    for index, width in enumerate(column_widths or []):
+        worksheet.column_dimensions[get_column_letter(index + 1)].width = width
+
+    def styled(values, **style):
+        cells = []
+        for value in values:
+            cell = WriteOnlyCell(worksheet, value=value)
+            for name, attr in style.items():
+                setattr(cell, name, attr)
+            cells.append(cell)
+        return cells
+
+    worksheet.append(styled([title], font=Font(size=16, bold=True)))
+    worksheet.append([subtitle])
+    worksheet.append([])
+    worksheet.append(
+        styled(
+            headers,
+            fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid"),
+            font=Font(bold=True, color="FFFFFF", size=11),
+        )
+    )
+    for row in rows:
+        worksheet.append(list(row))
+    if footer is not None:
+        worksheet.append(styled(footer, font=Font(bold=True)))
+
+    output = BytesIO()
+    workbook.save(output)
+    output.seek(0)
+    encoded_filename = quote(filename, safe="")
+
+    return StreamingResponse(
+        output,
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={
+            "Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"
+        },
+    )
@@ -0,0 +1,210 @@
+"""库存数量一致性核对
+
+inventory_item.quantity 与 inventory_location 由库存流水触发器按每条流水增量维护，
+不再逐次对历史流水求和。
+这里按流水重新汇总（与 sp_recalc_all_inventory / sp_check_inventory_drift 的口径相同），
+找出存储数量与汇总结果不一致的库存记录及仓库位置，并可按汇总结果写回。
+"""
+
+import uuid
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import and_, bindparam, case, func, insert, update
+from sqlalchemy.orm import Session
+
+from app.models.inventory import InventoryItem, InventoryLocation, InventoryTransaction
+from app.utils.helpers import get_beijing_time
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal("0")
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def find_inventory_drift(db: Session, company_id: Optional[str] = None) -> list:
+    """返回存储数量与流水汇总不一致的库存记录
+
+    Args:
+        company_id: 为空时核对全部公司
+
+    Returns:
+        [{inventory_id, company_id, product_id, stored, expected, drift}]
+    """
+    totals_query = db.query(
+        InventoryTransaction.company_id.label("company_id"),
+        InventoryTransaction.product_id.label("product_id"),
+        func.sum(
+            case(
+                (InventoryTransaction.type == "IN", InventoryTransaction.quantity),
+                (InventoryTransaction.type == "OUT", -InventoryTransaction.quantity),
+                else_=0,
+            )
+        ).label("total"),
+    )
+    if company_id:
+        totals_query = totals_query.filter(InventoryTransaction.company_id == company_id)
+    totals = totals_query.group_by(
+        InventoryTransaction.company_id, InventoryTransaction.product_id
+    ).subquery()
+
+    expected = func.coalesce(totals.c.total, 0)
+    query = db.query(
+        InventoryItem.inventory_id,
+        InventoryItem.company_id,
+        InventoryItem.product_id,
+        InventoryItem.quantity,
+        expected.label("expected"),
+    ).outerjoin(
+        totals,
+        and_(
+            totals.c.company_id == InventoryItem.company_id,
+            totals.c.product_id == InventoryItem.product_id,
+        ),
+    ).filter(func.coalesce(InventoryItem.quantity, 0) != expected)
+    if company_id:
+        query = query.filter(InventoryItem.company_id == company_id)
+
+    drift = []
+    for inventory_id, item_company_id, product_id, stored, total in query:
+        stored = _to_decimal(stored)
+        total = _to_decimal(total)
+        drift.append(
+            {
+                "inventory_id": inventory_id,
+                "company_id": item_company_id,
+                "product_id": product_id,
+                "stored": stored,
+                "expected": total,
+                "drift": stored - total,
+            }
+        )
+    return drift
+
+
+def _location_totals_query(db: Session, company_id: Optional[str] = None):
+    """按 (公司, 商品, 位置) 汇总带仓库位置的流水"""
+    query = db.query(
+        InventoryTransaction.company_id,
+        InventoryTransaction.product_id,
+        InventoryTransaction.warehouse_location,
+        func.sum(
+            case(
+                (InventoryTransaction.type == "IN", InventoryTransaction.quantity),
+                (InventoryTransaction.type == "OUT", -InventoryTransaction.quantity),
+                else_=0,
+            )
+        ),
+    ).filter(
+        InventoryTransaction.warehouse_location.isnot(None),
+        InventoryTransaction.warehouse_location != "",
+    )
+    if company_id:
+        query = query.filter(InventoryTransaction.company_id == company_id)
+    return query.group_by(
+        InventoryTransaction.company_id,
+        InventoryTransaction.product_id,
+        InventoryTransaction.warehouse_location,
+    )
+
+
+def find_location_drift(db: Session, company_id: Optional[str] = None) -> list:
+    """返回位置数量与带位置流水汇总不一致的 inventory_location 记录
+
+    流水有位置但汇总表缺少该位置时 location_id 为 None。
+
+    Returns:
+        [{location_id, company_id, product_id, warehouse_location, stored, expected, drift}]
+    """
+    expected = {
+        (row_company_id, product_id, location): _to_decimal(total)
+        for row_company_id, product_id, location, total in _location_totals_query(
+            db, company_id
+        )
+    }
+
+    stored_query = db.query(
+        InventoryLocation.location_id,
+        InventoryLocation.company_id,
+        InventoryLocation.product_id,
+        InventoryLocation.warehouse_location,
+        InventoryLocation.quantity,
+    )
+    if company_id:
+        stored_query = stored_query.filter(InventoryLocation.company_id == company_id)
+
+    drift = []
+    for location_id, row_company_id, product_id, location, stored in stored_query:
+        key = (row_company_id, product_id, location)
+        stored = _to_decimal(stored)
+        total = expected.pop(key, Decimal("0"))
+        if stored != total:
+            drift.append(
+                {
+                    "location_id": location_id,
+                    "company_id": row_company_id,
+                    "product_id": product_id,
+                    "warehouse_location": location,
+                    "stored": stored,
+                    "expected": total,
+                    "drift": stored - total,
+                }
+            )
+    for (row_company_id, product_id, location), total in expected.items():
+        if total:
+            drift.append(
+                {
+                    "location_id": None,
+                    "company_id": row_company_id,
+                    "product_id": product_id,
+                    "warehouse_location": location,
+                    "stored": Decimal("0"),
+                    "expected": total,
+                    "drift": -total,
+                }
+            )
+    return drift
+
+
+def fix_inventory_drift(db: Session, drift: list) -> int:
+    """按流水汇总结果写回不一致的库存数量（不提交事务），返回修复条数"""
+    if not drift:
+        return 0
+    table = InventoryItem.__table__
+    db.connection().execute(
+        update(table)
+        .where(table.c.inventory_id == bindparam("b_inventory_id"))
+        .values(quantity=bindparam("b_quantity"), updated_at=get_beijing_time()),
+        [{"b_inventory_id": row["inventory_id"], "b_quantity": row["expected"]} for row in drift],
+    )
+    return len(drift)
+
+
+def rebuild_inventory_locations(db: Session, company_id: Optional[str] = None) -> int:
+    """按带仓库位置的流水重建 inventory_location（不提交事务），返回位置条数
+
+    用于升级后回填历史数据或修复汇总表，口径与 sp_recalc_all_inventory 相同。
+    """
+    rows = _location_totals_query(db, company_id).all()
+    delete_query = db.query(InventoryLocation)
+    if company_id:
+        delete_query = delete_query.filter(InventoryLocation.company_id == company_id)
+    delete_query.delete(synchronize_session=False)
+    if rows:
+        now = get_beijing_time()
+        db.connection().execute(
+            insert(InventoryLocation.__table__),
+            [
+                {
+                    "location_id": str(uuid.uuid4()),
+                    "company_id": row_company_id,
+                    "product_id": product_id,
+                    "warehouse_location": location,
+                    "quantity": _to_decimal(quantity),
+                    "updated_at": now,
+                }
+                for row_company_id, product_id, location, quantity in rows
+            ],
+        )
+    return len(rows)
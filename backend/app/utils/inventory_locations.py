@@ -0,0 +1,71 @@
+"""出库仓库位置分配
+
+inventory_location 由库存流水触发器按流水上的仓库位置增减。入库流水记录了位置，
+销售出库若不带位置，位置数量只增不减，会与 inventory_item.quantity 逐渐偏离。
+这里把出库数量分配到该商品现有库存的位置上：
+1. 一批出库涉及的商品只读取一次位置汇总（仅数量为正的位置）并加锁；
+2. 优先从库存最多的位置出库，减少拆分出的流水条数；
+3. 位置库存不足的部分（如位置表启用前的库存）不指定位置。
+"""
+
+from collections import defaultdict
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.models.inventory import InventoryLocation
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal("0")
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+class StockLocations:
+    """一批商品的位置库存：一次加载并加锁，内存中分配出库数量"""
+
+    def __init__(self, db: Session, company_id: str, product_ids: Iterable[str]):
+        self._locations: Dict[str, List[list]] = defaultdict(list)
+
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        rows = (
+            db.query(
+                InventoryLocation.product_id,
+                InventoryLocation.warehouse_location,
+                InventoryLocation.quantity,
+            )
+            .filter(
+                InventoryLocation.company_id == company_id,
+                InventoryLocation.product_id.in_(product_ids),
+                InventoryLocation.quantity > 0,
+            )
+            .order_by(
+                InventoryLocation.product_id,
+                InventoryLocation.quantity.desc(),
+                InventoryLocation.warehouse_location,
+            )
+            .with_for_update()
+        )
+        for product_id, location, quantity in rows:
+            self._locations[product_id].append([location, _to_decimal(quantity)])
+
+    def allocate(self, product_id: str, quantity) -> List[Tuple[Optional[str], Decimal]]:
+        """分配出库数量，返回 [(仓库位置, 数量)]，位置库存不足的部分位置为 None"""
+        remaining = _to_decimal(quantity)
+        allocation = []
+        for location in self._locations.get(product_id, []):
+            if remaining <= 0:
+                break
+            taken = min(remaining, location[1])
+            if taken <= 0:
+                continue
+            allocation.append((location[0], taken))
+            location[1] -= taken
+            remaining -= taken
+        if remaining > 0:
+            allocation.append((None, remaining))
+        return allocation
@@ -0,0 +1,184 @@
+"""库存时点估值
+
+inventory_item 只保存当前数量和加权平均成本。任何日期（含今天）的估值都取最近一次不晚于该日期的
+期末快照（inventory_snapshot），再按时间顺序回放快照之后到该日期的库存流水：
+- 入库且记录了单位成本：按采购过账相同的加权平均公式重算成本（保留两位小数）
+- 其他入库、出库：只改变数量
+按月生成期末快照后，年末估值只需扫描最后一个快照之后的流水。
+快照只能为已结束的日期生成，否则当天之后的流水不会被回放。
+"""
+
+import uuid
+from datetime import date as date_type
+from datetime import datetime, time, timedelta
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models.inventory import InventorySnapshot, InventoryTransaction
+from app.models.product import Product
+
+CENT = Decimal("0.01")
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal("0")
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _day_start(day: date_type) -> datetime:
+    return datetime.combine(day, time.min)
+
+
+def _apply_transaction(state: List[Decimal], type_: str, quantity, unit_cost) -> None:
+    """把一条流水作用到 [数量, 平均成本] 上"""
+    quantity = _to_decimal(quantity)
+    if type_ == "OUT":
+        state[0] -= quantity
+        return
+    if unit_cost is not None:
+        unit_cost = _to_decimal(unit_cost)
+        total_quantity = state[0] + quantity
+        if total_quantity > 0:
+            state[1] = (
+                (state[0] * state[1] + quantity * unit_cost) / total_quantity
+            ).quantize(CENT, rounding=ROUND_HALF_UP)
+        else:
+            state[1] = unit_cost
+    state[0] += quantity
+
+
+def _inventory_state(db: Session, company_id: str, as_of: date_type):
+    """期末快照 + 快照之后的流水回放，返回 ({product_id: [数量, 平均成本]}, 快照日期)"""
+    snapshot_date = (
+        db.query(func.max(InventorySnapshot.period_end))
+        .filter(
+            InventorySnapshot.company_id == company_id,
+            InventorySnapshot.period_end <= as_of,
+        )
+        .scalar()
+    )
+
+    states: Dict[str, List[Decimal]] = {}
+    if snapshot_date is not None:
+        rows = db.query(
+            InventorySnapshot.product_id,
+            InventorySnapshot.quantity,
+            InventorySnapshot.average_cost,
+        ).filter(
+            InventorySnapshot.company_id == company_id,
+            InventorySnapshot.period_end == snapshot_date,
+        )
+        for product_id, quantity, average_cost in rows:
+            states[product_id] = [_to_decimal(quantity), _to_decimal(average_cost)]
+
+    if snapshot_date != as_of:
+        transactions = db.query(
+            InventoryTransaction.product_id,
+            InventoryTransaction.type,
+            InventoryTransaction.quantity,
+            InventoryTransaction.unit_cost,
+        ).filter(
+            InventoryTransaction.company_id == company_id,
+            InventoryTransaction.created_at < _day_start(as_of + timedelta(days=1)),
+        )
+        if snapshot_date is not None:
+            transactions = transactions.filter(
+                InventoryTransaction.created_at
+                >= _day_start(snapshot_date + timedelta(days=1))
+            )
+        transactions = transactions.order_by(
+            InventoryTransaction.created_at, InventoryTransaction.transaction_id
+        ).yield_per(1000)
+        for product_id, type_, quantity, unit_cost in transactions:
+            state = states.setdefault(product_id, [Decimal("0"), Decimal("0")])
+            _apply_transaction(state, type_, quantity, unit_cost)
+
+    return states, snapshot_date
+
+
+def get_inventory_valuation(
+    db: Session, company_id: str, as_of: Optional[date_type] = None
+) -> dict:
+    """获取公司截至指定日期的库存数量与估值
+
+    任何日期（含今天）都按同一口径计算：最近一次期末快照 + 快照之后截至 as_of 的库存流水。
+    inventory_item 的当前数量由触发器增量维护，可能存在尚未修复的偏差，这里不使用。
+    """
+    as_of = as_of or date_type.today()
+    states, snapshot_date = _inventory_state(db, company_id, as_of)
+    source = "snapshot" if snapshot_date is not None else "transactions"
+
+    products = {}
+    product_ids = [product_id for product_id, (quantity, _) in states.items() if quantity]
+    if product_ids:
+        products = {
+            product_id: (sku, name)
+            for product_id, sku, name in db.query(
+                Product.product_id, Product.sku, Product.name
+            ).filter(Product.product_id.in_(product_ids))
+        }
+
+    items = []
+    total_value = Decimal("0")
+    for product_id in product_ids:
+        quantity, average_cost = states[product_id]
+        value = (quantity * average_cost).quantize(CENT, rounding=ROUND_HALF_UP)
+        total_value += value
+        sku, name = products.get(product_id, (None, None))
+        items.append(
+            {
+                "product_id": product_id,
+                "product_sku": sku,
+                "product_name": name,
+                "quantity": float(quantity),
+                "average_cost": float(average_cost),
+                "value": float(value),
+            }
+        )
+    items.sort(key=lambda item: (item["product_sku"] or "", item["product_id"]))
+
+    return {
+        "as_of": as_of.isoformat(),
+        "source": source,
+        "snapshot_date": snapshot_date.isoformat() if snapshot_date else None,
+        "items": items,
+        "total_value": float(total_value),
+    }
+
+
+def create_inventory_snapshot(db: Session, company_id: str, period_end: date_type) -> int:
+    """生成（或重建）指定期末日期的库存快照，返回写入行数
+
+    只能为已结束的日期生成快照（period_end 早于今天），否则当天之后的流水不会被回放。
+
+    Raises:
+        ValueError: period_end 不早于今天
+    """
+    if period_end >= date_type.today():
+        raise ValueError("只能为已结束的日期生成库存快照")
+    # 重建同一期末快照时不能以自身为基础
+    db.query(InventorySnapshot).filter(
+        InventorySnapshot.company_id == company_id,
+        InventorySnapshot.period_end == period_end,
+    ).delete(synchronize_session=False)
+    states, _ = _inventory_state(db, company_id, period_end)
+
+    rows = [
+        {
+            "snapshot_id": str(uuid.uuid4()),
+            "company_id": company_id,
+            "product_id": product_id,
+            "period_end": period_end,
+            "quantity": quantity,
+            "average_cost": average_cost,
+        }
+        for product_id, (quantity, average_cost) in states.items()
+        if quantity or average_cost
+    ]
+    if rows:
+        db.execute(InventorySnapshot.__table__.insert(), rows)
+    return len(rows)
@@ -0,0 +1,160 @@
+"""只读副本路由
+
+报表、列表与导出接口通过 get_read_db / get_async_read_db 获取会话：
+- 配置了 DATABASE_READ_URL 时读取只读副本，否则使用主库；
+- 副本连接失败时退回主库，并在 REPLICA_RETRY_SECONDS 秒内不再尝试副本；
+- 读己之写：用户在主库提交写入后的 READ_YOUR_WRITES_SECONDS 秒内，其读请求仍走主库，
+  避免复制延迟导致刚保存的数据暂时查不到。写入时间记录在进程内，多进程部署时只对同一进程生效。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import AsyncGenerator, Generator, Optional, Union
+
+from fastapi import Depends
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.config import get_settings
+from app.database import (
+    AsyncReadSessionLocal,
+    AsyncSessionLocal,
+    ReadSessionLocal,
+    SessionLocal,
+)
+from app.utils.auth import get_current_user
+from app.utils.user_cache import CurrentUser
+
+settings = get_settings()
+
+# 副本连接失败后多久再尝试（秒）
+REPLICA_RETRY_SECONDS = 30
+
+_lock = threading.Lock()
+# user_id -> 最近一次写入提交时间，按时间先后排序
+_last_writes: "OrderedDict[str, float]" = OrderedDict()
+_replica_down_until = 0.0
+
+
+def record_write(user_id: str) -> None:
+    """记录用户的写入提交时间，同时清理已过期的记录"""
+    window = settings.READ_YOUR_WRITES_SECONDS
+    if window <= 0:
+        return
+    now = time.monotonic()
+    with _lock:
+        _last_writes[user_id] = now
+        _last_writes.move_to_end(user_id)
+        while _last_writes:
+            oldest = next(iter(_last_writes.values()))
+            if now - oldest <= window:
+                break
+            _last_writes.popitem(last=False)
+
+
+def wrote_recently(user_id: str) -> bool:
+    """用户是否在读己之写窗口内提交过写入"""
+    with _lock:
+        written_at = _last_writes.get(user_id)
+    if written_at is None:
+        return False
+    return time.monotonic() - written_at <= settings.READ_YOUR_WRITES_SECONDS
+
+
+def _use_replica(session_factory, current_user: CurrentUser) -> bool:
+    return (
+        session_factory is not None
+        and time.monotonic() >= _replica_down_until
+        and not wrote_recently(current_user.user_id)
+    )
+
+
+def _mark_replica_down() -> None:
+    global _replica_down_until
+    _replica_down_until = time.monotonic() + REPLICA_RETRY_SECONDS
+
+
+def _open_read_session(current_user: CurrentUser) -> Session:
+    """打开只读会话：副本可用时连接副本，否则使用主库"""
+    if _use_replica(ReadSessionLocal, current_user):
+        db = ReadSessionLocal()
+        try:
+            db.connection()
+            return db
+        except OperationalError:
+            db.close()
+            _mark_replica_down()
+    return SessionLocal()
+
+
+def get_read_db(
+    current_user: CurrentUser = Depends(get_current_user),
+) -> Generator[Session, None, None]:
+    """获取只读数据库会话（副本优先，见模块说明）"""
+    db = _open_read_session(current_user)
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+async def get_async_read_db(
+    current_user: CurrentUser = Depends(get_current_user),
+) -> AsyncGenerator[Union[AsyncSession, Session], None]:
+    """获取 async_db_route 路由使用的只读会话
+
+    启用 DATABASE_ASYNC_MODE 时为 AsyncSession；未启用时为同步 Session，
+    由 async_db_route 放到线程池中使用。
+    """
+    if AsyncSessionLocal is None:
+        db = await run_in_threadpool(_open_read_session, current_user)
+        try:
+            yield db
+        finally:
+            await run_in_threadpool(db.close)
+        return
+
+    db: Optional[AsyncSession] = None
+    if _use_replica(AsyncReadSessionLocal, current_user):
+        db = AsyncReadSessionLocal()
+        try:
+            await db.connection()
+        except OperationalError:
+            await db.close()
+            _mark_replica_down()
+            db = None
+    if db is None:
+        db = AsyncSessionLocal()
+    async with db:
+        yield db
+
+
+# ==================== 写入跟踪 ====================
+# get_current_user 会把 user_id 记在请求会话的 info 中，会话提交了写入时记录该用户。
+
+
+@event.listens_for(SessionLocal, "after_flush")
+def _flag_orm_writes(session: Session, flush_context) -> None:
+    session.info["has_writes"] = True
+
+
+@event.listens_for(SessionLocal, "do_orm_execute")
+def _flag_statement_writes(orm_execute_state) -> None:
+    if not orm_execute_state.is_select:
+        orm_execute_state.session.info["has_writes"] = True
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _remember_writes(session: Session) -> None:
+    user_id = session.info.get("user_id")
+    if session.info.pop("has_writes", False) and user_id:
+        record_write(user_id)
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _discard_writes(session: Session, previous_transaction) -> None:
+    session.info.pop("has_writes", None)
@@ -0,0 +1,117 @@
+"""客户应收余额维护
+
+customer.outstanding_receivable 与 sales_order.received_amount 是冗余汇总字段：
+- 赊销订单过账：客户应收余额增加订单金额
+- 创建收款记录：订单已收金额增加，赊销订单同时减少客户应收余额
+两者都在业务事务内维护（订单行加锁、客户余额原子增减），信用额度校验只需读取客户一行。
+reconcile_receivables 按收款记录和订单重新汇总，用于对账与重建。
+"""
+
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import bindparam, func, update
+from sqlalchemy.orm import Session
+
+from app.models.customer import Customer
+from app.models.order import SalesOrder
+from app.models.payment import Receipt
+
+
+def adjust_customer_receivable(db: Session, customer_id: str, delta: Decimal) -> None:
+    """原子地增减客户应收余额"""
+    if not delta:
+        return
+    db.query(Customer).filter(Customer.customer_id == customer_id).update(
+        {
+            Customer.outstanding_receivable: func.coalesce(
+                Customer.outstanding_receivable, 0
+            )
+            + delta
+        },
+        synchronize_session=False,
+    )
+
+
+def _to_decimal(value) -> Decimal:
+    if value is None:
+        return Decimal("0")
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def reconcile_receivables(
+    db: Session, company_id: Optional[str] = None, fix: bool = True
+) -> dict:
+    """按收款记录重新汇总订单已收金额和客户应收余额
+
+    Args:
+        company_id: 为空时处理全部公司
+        fix: 为 True 时写回不一致的数据（不提交事务）
+
+    Returns:
+        不一致的订单与客户列表
+    """
+    received_query = db.query(Receipt.sales_order_id, func.sum(Receipt.amount)).filter(
+        Receipt.sales_order_id.isnot(None)
+    )
+    order_query = db.query(
+        SalesOrder.so_id,
+        SalesOrder.customer_id,
+        SalesOrder.total_amount,
+        SalesOrder.payment_method,
+        SalesOrder.status,
+        SalesOrder.received_amount,
+    )
+    customer_query = db.query(Customer.customer_id, Customer.outstanding_receivable)
+    if company_id:
+        received_query = received_query.filter(Receipt.company_id == company_id)
+        order_query = order_query.filter(SalesOrder.company_id == company_id)
+        customer_query = customer_query.filter(Customer.company_id == company_id)
+
+    received_by_order = {
+        so_id: _to_decimal(amount)
+        for so_id, amount in received_query.group_by(Receipt.sales_order_id)
+    }
+
+    order_mismatches = []
+    outstanding_by_customer = {}
+    for so_id, customer_id, total, method, status, stored in order_query:
+        received = received_by_order.get(so_id, Decimal("0"))
+        if _to_decimal(stored) != received:
+            order_mismatches.append(
+                {"so_id": so_id, "stored": _to_decimal(stored), "actual": received}
+            )
+        if method == "Credit" and status == "Posted":
+            outstanding_by_customer[customer_id] = (
+                outstanding_by_customer.get(customer_id, Decimal("0"))
+                + _to_decimal(total)
+                - received
+            )
+
+    customer_mismatches = []
+    for customer_id, stored in customer_query:
+        actual = outstanding_by_customer.get(customer_id, Decimal("0"))
+        if _to_decimal(stored) != actual:
+            customer_mismatches.append(
+                {"customer_id": customer_id, "stored": _to_decimal(stored), "actual": actual}
+            )
+
+    if fix and order_mismatches:
+        db.connection().execute(
+            update(SalesOrder.__table__)
+            .where(SalesOrder.__table__.c.so_id == bindparam("b_so_id"))
+            .values(received_amount=bindparam("b_amount")),
+            [{"b_so_id": m["so_id"], "b_amount": m["actual"]} for m in order_mismatches],
+        )
+    if fix and customer_mismatches:
+        db.connection().execute(
+            update(Customer.__table__)
+            .where(Customer.__table__.c.customer_id == bindparam("b_customer_id"))
+            .values(outstanding_receivable=bindparam("b_amount")),
+            [
+                {"b_customer_id": m["customer_id"], "b_amount": m["actual"]}
+                for m in customer_mismatches
+            ],
+        )
+
+    return {"orders": order_mismatches, "customers": customer_mismatches}
@@ -0,0 +1,91 @@
+"""登录用户缓存
+
+每个请求都要由令牌中的 user_id 解析当前用户（公司、角色）。这里按 user_id 缓存
+用户的身份信息，命中时认证不再查询数据库：
+- 容量有上限，超出时淘汰最久未使用的条目；
+- 用户修改、删除、重置密码或调整角色后由路由调用 invalidate_user 失效，
+  公司修改或删除后调用 invalidate_company_users 使该公司全部用户失效；
+- 多进程部署时各进程缓存独立，因此额外设置了过期时间兜底。
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from app.config import get_settings
+
+settings = get_settings()
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    """当前登录用户（只读身份信息，需要修改用户时请按 user_id 重新查询）"""
+
+    user_id: str
+    company_id: Optional[str]
+    username: str
+    role: str
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user) -> "CurrentUser":
+        return cls(
+            user_id=user.user_id,
+            company_id=user.company_id,
+            username=user.username,
+            role=user.role,
+            created_at=user.created_at,
+        )
+
+
+_lock = threading.Lock()
+# user_id -> (加载时间, CurrentUser)，按最近使用排序
+_user_cache: "OrderedDict[str, tuple]" = OrderedDict()
+
+
+def get_cached_user(user_id: str) -> Optional[CurrentUser]:
+    """读取缓存的用户，未命中或已过期返回 None"""
+    if settings.AUTH_USER_CACHE_TTL <= 0:
+        return None
+    with _lock:
+        entry = _user_cache.get(user_id)
+        if entry is None:
+            return None
+        loaded_at, user = entry
+        if time.monotonic() - loaded_at > settings.AUTH_USER_CACHE_TTL:
+            del _user_cache[user_id]
+            return None
+        _user_cache.move_to_end(user_id)
+        return user
+
+
+def cache_user(user: CurrentUser) -> None:
+    """写入缓存，超出容量时淘汰最久未使用的用户"""
+    if settings.AUTH_USER_CACHE_TTL <= 0:
+        return
+    with _lock:
+        _user_cache[user.user_id] = (time.monotonic(), user)
+        _user_cache.move_to_end(user.user_id)
+        while len(_user_cache) > settings.AUTH_USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+
+
+def invalidate_user(user_id: str) -> None:
+    """用户信息变更后使其缓存失效"""
+    with _lock:
+        _user_cache.pop(user_id, None)
+
+
+def invalidate_company_users(company_id: str) -> None:
+    """公司信息变更或删除后使该公司全部用户的缓存失效"""
+    with _lock:
+        stale = [
+            user_id
+            for user_id, (_, user) in _user_cache.items()
+            if user.company_id == company_id
+        ]
+        for user_id in stale:
+            del _user_cache[user_id]
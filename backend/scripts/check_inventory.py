@@ -0,0 +1,147 @@
+"""
+Check inventory quantities against the transaction ledger
+
+inventory_item.quantity is maintained incrementally by the inventory
+transaction triggers. This script recomputes every quantity from
+inventory_transaction (same rule as sp_recalc_all_inventory) and reports each
+item whose stored quantity has drifted, and likewise each inventory_location
+row that no longer matches the transactions carrying its warehouse location.
+It is meant to run periodically, e.g. from cron; the exit code is 1 when drift
+is found (and not fixed) or on error.
+
+The per-location summary table inventory_location can be rebuilt from the
+transactions with --rebuild-locations (needed once after upgrading a database
+that predates the table); --fix also rebuilds it when locations have drifted.
+
+Usage:
+    python -m scripts.check_inventory [--company COMPANY_ID] [--fix]
+                                      [--rebuild-locations]
+
+Arguments:
+    --company: Optional, only check the given company
+    --fix: Write the recomputed quantity back to drifted items and
+           rebuild drifted warehouse locations
+    --rebuild-locations: Rebuild inventory_location from the transactions
+
+Examples:
+    # Report drift of all companies
+    python -m scripts.check_inventory
+
+    # Repair drift of one company
+    python -m scripts.check_inventory --company <company_id> --fix
+
+    # Backfill warehouse location totals
+    python -m scripts.check_inventory --rebuild-locations
+"""
+
+import os
+import sys
+
+# Add project root directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import after path setup (required for script execution)
+from app.database import SessionLocal  # noqa: E402, F401
+from app.utils.inventory_check import (  # noqa: E402, F401
+    find_inventory_drift,
+    find_location_drift,
+    fix_inventory_drift,
+    rebuild_inventory_locations,
+)
+
+
+def check_inventory(
+    company_id: str = None, fix: bool = False, rebuild_locations: bool = False
+) -> dict:
+    """Report inventory drift, fixing it when requested"""
+    db = SessionLocal()
+    try:
+        if rebuild_locations:
+            count = rebuild_inventory_locations(db, company_id)
+            db.commit()
+            print(f"Rebuilt {count} inventory locations")
+
+        drift = find_inventory_drift(db, company_id)
+        location_drift = find_location_drift(db, company_id)
+
+        for row in drift:
+            print(
+                f"inventory_item {row['inventory_id']} "
+                f"(company {row['company_id']}, product {row['product_id']}): "
+                f"quantity {row['stored']}, expected {row['expected']}, "
+                f"drift {row['drift']}"
+            )
+
+        for row in location_drift:
+            print(
+                f"inventory_location {row['warehouse_location']} "
+                f"(company {row['company_id']}, product {row['product_id']}): "
+                f"quantity {row['stored']}, expected {row['expected']}, "
+                f"drift {row['drift']}"
+            )
+
+        if fix:
+            fix_inventory_drift(db, drift)
+            for location_company_id in {row["company_id"] for row in location_drift}:
+                rebuild_inventory_locations(db, location_company_id)
+            db.commit()
+        else:
+            db.rollback()
+
+        print("=" * 60)
+        print(
+            f"Inventory items drifted: {len(drift)}"
+            + (" (fixed)" if fix and drift else "")
+        )
+        print(
+            f"Warehouse locations drifted: {len(location_drift)}"
+            + (" (fixed)" if fix and location_drift else "")
+        )
+        print("=" * 60)
+        return {
+            "success": True,
+            "drift": drift,
+            "location_drift": location_drift,
+            "fixed": fix,
+        }
+
+    except Exception as e:  # pylint: disable=broad-except
+        db.rollback()
+        print(f"Failed to check inventory: {str(e)}")
+        return {"success": False, "message": str(e)}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Check inventory quantities against the transaction ledger",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument(
+        "--company",
+        default=None,
+        help="Only check the given company (optional, defaults to all)",
+    )
+    parser.add_argument(
+        "--fix",
+        action="store_true",
+        help="Write recomputed quantities back to drifted items and locations",
+    )
+
+    parser.add_argument(
+        "--rebuild-locations",
+        action="store_true",
+        help="Rebuild inventory_location from the transactions",
+    )
+
+    args = parser.parse_args()
+    result = check_inventory(args.company, args.fix, args.rebuild_locations)
+
+    if not result.get("success") or (
+        (result["drift"] or result["location_drift"]) and not result["fixed"]
+    ):
+        sys.exit(1)
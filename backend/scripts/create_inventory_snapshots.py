@@ -0,0 +1,96 @@
+"""
+Create month-end inventory snapshots
+
+Stores each product's quantity and weighted average cost as of the period end
+in inventory_snapshot, so /reports/inventory-valuation?as_of= only has to
+replay the transactions after the latest snapshot. Run it monthly (e.g. from
+cron on the 1st); re-running for the same date replaces that snapshot.
+
+Usage:
+    python -m scripts.create_inventory_snapshots [--period-end YYYY-MM-DD]
+                                                 [--company COMPANY_ID]
+
+Arguments:
+    --period-end: Optional, defaults to the last day of the previous month
+    --company: Optional, only snapshot the given company
+
+Examples:
+    # Snapshot last month for all companies
+    python -m scripts.create_inventory_snapshots
+
+    # Snapshot year end of one company
+    python -m scripts.create_inventory_snapshots --period-end 2025-12-31 --company <company_id>
+"""
+
+import os
+import sys
+from datetime import date, timedelta
+
+# Add project root directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import after path setup (required for script execution)
+from app.database import SessionLocal  # noqa: E402, F401
+from app.models.company import Company  # noqa: E402, F401
+from app.utils.inventory_valuation import create_inventory_snapshot  # noqa: E402, F401
+
+
+def create_inventory_snapshots(period_end: date = None, company_id: str = None) -> dict:
+    """Create inventory snapshots for one or all companies"""
+    period_end = period_end or date.today().replace(day=1) - timedelta(days=1)
+
+    db = SessionLocal()
+    try:
+        if company_id:
+            company_ids = [company_id]
+        else:
+            company_ids = [row[0] for row in db.query(Company.company_id)]
+
+        total = 0
+        for current_company_id in company_ids:
+            count = create_inventory_snapshot(db, current_company_id, period_end)
+            db.commit()
+            total += count
+            print(f"company {current_company_id}: {count} products")
+
+        print("=" * 60)
+        print(
+            f"Inventory snapshots for {period_end.isoformat()}: "
+            f"{len(company_ids)} companies, {total} products"
+        )
+        print("=" * 60)
+        return {"success": True, "period_end": period_end, "products": total}
+
+    except Exception as e:  # pylint: disable=broad-except
+        db.rollback()
+        print(f"Failed to create inventory snapshots: {str(e)}")
+        return {"success": False, "message": str(e)}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Create month-end inventory snapshots",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument(
+        "--period-end",
+        type=date.fromisoformat,
+        default=None,
+        help="Snapshot date (optional, defaults to the end of last month)",
+    )
+    parser.add_argument(
+        "--company",
+        default=None,
+        help="Only snapshot the given company (optional, defaults to all)",
+    )
+
+    args = parser.parse_args()
+    result = create_inventory_snapshots(args.period_end, args.company)
+
+    if not result.get("success"):
+        sys.exit(1)
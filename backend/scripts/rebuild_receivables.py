@@ -0,0 +1,118 @@
+"""
+Reconcile and rebuild customer receivable balances
+
+Recomputes sales_order.received_amount from receipts and
+customer.outstanding_receivable from posted credit sales orders, then reports
+(and by default fixes) every row whose stored value differs. Missing columns
+are added first, so the script can also be used to upgrade an existing
+database.
+
+Usage:
+    python -m scripts.rebuild_receivables [--company COMPANY_ID] [--check]
+
+Arguments:
+    --company: Optional, only reconcile the given company
+    --check: Only report mismatches, do not write anything
+
+Examples:
+    # Rebuild all companies
+    python -m scripts.rebuild_receivables
+
+    # Report mismatches of one company without changing data
+    python -m scripts.rebuild_receivables --company <company_id> --check
+"""
+
+import os
+import sys
+
+# Add project root directory to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Import after path setup (required for script execution)
+from app.database import SessionLocal, engine  # noqa: E402, F401
+from app.utils.receivables import reconcile_receivables  # noqa: E402, F401
+from sqlalchemy import inspect, text  # noqa: E402, F401
+
+REQUIRED_COLUMNS = {
+    "customer": ("outstanding_receivable", "DECIMAL(18,2) DEFAULT 0"),
+    "sales_order": ("received_amount", "DECIMAL(18,2) DEFAULT 0"),
+}
+
+
+def ensure_columns() -> None:
+    """Add receivable columns to databases created before they existed"""
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table, (column, definition) in REQUIRED_COLUMNS.items():
+            existing = {col["name"] for col in inspector.get_columns(table)}
+            if column not in existing:
+                conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+                print(f"Added column {table}.{column}")
+
+
+def rebuild_receivables(company_id: str = None, check_only: bool = False) -> dict:
+    """Reconcile receivable balances, fixing mismatches unless check_only"""
+    if not check_only:
+        ensure_columns()
+
+    db = SessionLocal()
+    try:
+        result = reconcile_receivables(db, company_id, fix=not check_only)
+
+        for row in result["orders"]:
+            print(
+                f"sales_order {row['so_id']}: received_amount "
+                f"{row['stored']} -> {row['actual']}"
+            )
+        for row in result["customers"]:
+            print(
+                f"customer {row['customer_id']}: outstanding_receivable "
+                f"{row['stored']} -> {row['actual']}"
+            )
+
+        if check_only:
+            db.rollback()
+        else:
+            db.commit()
+
+        print("=" * 60)
+        print(
+            f"Orders mismatched: {len(result['orders'])}, "
+            f"customers mismatched: {len(result['customers'])}"
+            + (" (check only, nothing written)" if check_only else " (fixed)")
+        )
+        print("=" * 60)
+        return {"success": True, **result}
+
+    except Exception as e:  # pylint: disable=broad-except
+        db.rollback()
+        print(f"Failed to rebuild receivables: {str(e)}")
+        return {"success": False, "message": str(e)}
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Reconcile and rebuild customer receivable balances",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument(
+        "--company",
+        default=None,
+        help="Only reconcile the given company (optional, defaults to all)",
+    )
+    parser.add_argument(
+        "--check",
+        action="store_true",
+        help="Only report mismatches without writing",
+    )
+
+    args = parser.parse_args()
+    result = rebuild_receivables(args.company, args.check)
+
+    if not result.get("success"):
+        sys.exit(1)
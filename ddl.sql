@@ -373,6 +373,20 @@ CREATE TABLE IF NOT EXISTS ledger_line (
     FOREIGN KEY (account_id) REFERENCES account(account_id)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT='分录明细表';
 
+CREATE TABLE IF NOT EXISTS account_balance_snapshot (
+    snapshot_id CHAR(36) PRIMARY KEY,
+    company_id CHAR(36) NOT NULL COMMENT '所属公司',
+    account_id CHAR(36) NOT NULL COMMENT '科目',
+    period_end DATE NOT NULL COMMENT '快照截止日期（含）',
+    balance_debit DECIMAL(18,2) DEFAULT 0 COMMENT '截至期末借方累计（含下级科目）',
+    balance_credit DECIMAL(18,2) DEFAULT 0 COMMENT '截至期末贷方累计（含下级科目）',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    FOREIGN KEY (company_id) REFERENCES company(company_id) ON DELETE CASCADE,
+    FOREIGN KEY (account_id) REFERENCES account(account_id) ON DELETE CASCADE,
+    UNIQUE KEY uq_balance_snapshot_account_period (account_id, period_end),
+    INDEX idx_balance_snapshot_company_period (company_id, period_end)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT='科目期末余额快照表';
+
 -- =========================
 -- 2. 业务表
 -- =========================
@@ -401,6 +415,7 @@ CREATE TABLE IF NOT EXISTS customer (
     address VARCHAR(255),
     tax_no VARCHAR(50),
     credit_limit DECIMAL(18,2) DEFAULT 0,
+    outstanding_receivable DECIMAL(18,2) DEFAULT 0 COMMENT '当前应收余额（已过账赊销订单未收金额合计）',
     remark TEXT,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (company_id) REFERENCES company(company_id) ON DELETE CASCADE
@@ -415,7 +430,8 @@ CREATE TABLE IF NOT EXISTS product (
     cost DECIMAL(18,2),
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (company_id) REFERENCES company(company_id) ON DELETE CASCADE,
-    UNIQUE KEY uq_product_company_sku (company_id, sku)
+    UNIQUE KEY uq_product_company_sku (company_id, sku),
+    FULLTEXT KEY ft_product_name (name) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT='商品表';
 
 CREATE TABLE IF NOT EXISTS purchase_order (
@@ -454,6 +470,7 @@ CREATE TABLE IF NOT EXISTS sales_order (
     expected_delivery_date DATE,
     total_amount DECIMAL(18,2) DEFAULT 0,
     payment_method ENUM('Cash','BankTransfer','Credit') COMMENT '收款方式',
+    received_amount DECIMAL(18,2) DEFAULT 0 COMMENT '已收金额',
     status ENUM('Draft','Posted','Collected') DEFAULT 'Draft',
     remark TEXT,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -532,9 +549,51 @@ CREATE TABLE IF NOT EXISTS inventory_transaction (
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     FOREIGN KEY (company_id) REFERENCES company(company_id) ON DELETE CASCADE,
     FOREIGN KEY (product_id) REFERENCES product(product_id),
-    FOREIGN KEY (inventory_id) REFERENCES inventory_item(inventory_id)
+    FOREIGN KEY (inventory_id) REFERENCES inventory_item(inventory_id),
+    INDEX idx_inventory_transaction_product_time (company_id, product_id, created_at)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT='库存流水表';
 
+CREATE TABLE IF NOT EXISTS inventory_location (
+    location_id CHAR(36) PRIMARY KEY,
+    company_id CHAR(36) NOT NULL,
+    product_id CHAR(36) NOT NULL,
+    warehouse_location VARCHAR(100) NOT NULL COMMENT '仓库位置',
+    quantity DECIMAL(18,2) DEFAULT 0 COMMENT '该位置数量（=SUM(带该位置的流水数量)，由触发器维护）',
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    UNIQUE KEY uq_inventory_location_product_location (company_id, product_id, warehouse_location),
+    FOREIGN KEY (company_id) REFERENCES company(company_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES product(product_id) ON DELETE CASCADE
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT='库存位置汇总表';
+
+CREATE TABLE IF NOT EXISTS inventory_snapshot (
+    snapshot_id CHAR(36) PRIMARY KEY,
+    company_id CHAR(36) NOT NULL COMMENT '公司',
+    product_id CHAR(36) NOT NULL COMMENT '商品',
+    period_end DATE NOT NULL COMMENT '快照截止日期（含）',
+    quantity DECIMAL(18,2) DEFAULT 0 COMMENT '期末库存数量',
+    average_cost DECIMAL(18,2) DEFAULT 0 COMMENT '期末加权平均成本',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '创建时间',
+    FOREIGN KEY (company_id) REFERENCES company(company_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES product(product_id) ON DELETE CASCADE,
+    UNIQUE KEY uq_inventory_snapshot_product_period (product_id, period_end),
+    INDEX idx_inventory_snapshot_company_period (company_id, period_end)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT='库存期末快照表';
+
+CREATE TABLE IF NOT EXISTS inventory_cost_layer (
+    layer_id BIGINT AUTO_INCREMENT PRIMARY KEY COMMENT '成本层ID（自增，即入库顺序）',
+    company_id CHAR(36) NOT NULL COMMENT '公司',
+    product_id CHAR(36) NOT NULL COMMENT '商品',
+    source_type VARCHAR(20) COMMENT '来源类型（PO-采购入库；Opening-期初层）',
+    source_id CHAR(36) COMMENT '来源ID（如采购订单ID）',
+    quantity DECIMAL(18,2) NOT NULL COMMENT '入库数量',
+    remaining_quantity DECIMAL(18,2) NOT NULL COMMENT '剩余数量',
+    unit_cost DECIMAL(18,2) NOT NULL COMMENT '单位成本',
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP COMMENT '入库时间',
+    FOREIGN KEY (company_id) REFERENCES company(company_id) ON DELETE CASCADE,
+    FOREIGN KEY (product_id) REFERENCES product(product_id) ON DELETE CASCADE,
+    INDEX idx_cost_layer_product (company_id, product_id, layer_id)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE utf8mb4_unicode_ci COMMENT='库存成本层表（先进先出计价）';
+
 -- =========================
 -- 4. 银行与对账
 -- =========================
@@ -613,6 +672,11 @@ DELIMITER ;
 
 -- =========================
 -- 6. 触发器：ledger_line -> 更新 journal totals 与 account 缓存（insert/update/delete）
+-- 应用配置 ACCOUNT_BALANCE_MODE=app 时，连接会设置 @app_maintains_balances = 1，
+-- 触发器跳过科目余额的逐行更新，由应用在提交时按科目批量写入余额；journal totals 仍由触发器维护
+-- 此时余额只包含应用（SessionLocal 会话的 ORM 对象增删改）写入的分录明细：
+-- 通过同一连接串直接执行的 SQL、批量写入或其他会话写入 ledger_line 不会更新科目余额，
+-- 之后需调用 sp_recalc_all_account_balances 重算
 -- =========================
 
 DELIMITER $$
@@ -621,10 +685,12 @@ CREATE TRIGGER trg_ledger_after_insert
 AFTER INSERT ON ledger_line
 FOR EACH ROW
 BEGIN
-    -- 更新 account 及其父级余额
-    CALL sp_update_account_hierarchy(NEW.account_id, NEW.debit, NEW.credit);
+    IF @app_maintains_balances IS NULL THEN
+        -- 更新 account 及其父级余额
+        CALL sp_update_account_hierarchy(NEW.account_id, NEW.debit, NEW.credit);
+    END IF;
 
-    -- 更新 journal totals
+    -- 更新 journal totals（两种余额模式下都由触发器维护）
     UPDATE journal_entry
     SET total_debit = (
         SELECT COALESCE(SUM(debit),0) FROM ledger_line WHERE journal_id = NEW.journal_id
@@ -639,17 +705,19 @@ CREATE TRIGGER trg_ledger_after_update
 AFTER UPDATE ON ledger_line
 FOR EACH ROW
 BEGIN
-    IF OLD.account_id <> NEW.account_id THEN
-        -- 回退旧科目
-        CALL sp_update_account_hierarchy(OLD.account_id, -OLD.debit, -OLD.credit);
-        -- 增加新科目
-        CALL sp_update_account_hierarchy(NEW.account_id, NEW.debit, NEW.credit);
-    ELSE
-        -- 同科目按差额更新
-        CALL sp_update_account_hierarchy(NEW.account_id, NEW.debit - OLD.debit, NEW.credit - OLD.credit);
+    IF @app_maintains_balances IS NULL THEN
+        IF OLD.account_id <> NEW.account_id THEN
+            -- 回退旧科目
+            CALL sp_update_account_hierarchy(OLD.account_id, -OLD.debit, -OLD.credit);
+            -- 增加新科目
+            CALL sp_update_account_hierarchy(NEW.account_id, NEW.debit, NEW.credit);
+        ELSE
+            -- 同科目按差额更新
+            CALL sp_update_account_hierarchy(NEW.account_id, NEW.debit - OLD.debit, NEW.credit - OLD.credit);
+        END IF;
     END IF;
 
-    -- 更新 journal totals
+    -- 更新 journal totals（两种余额模式下都由触发器维护）
     UPDATE journal_entry
     SET total_debit = (
         SELECT COALESCE(SUM(debit),0) FROM ledger_line WHERE journal_id = NEW.journal_id
@@ -664,10 +732,12 @@ CREATE TRIGGER trg_ledger_after_delete
 AFTER DELETE ON ledger_line
 FOR EACH ROW
 BEGIN
-    -- 回退余额
-    CALL sp_update_account_hierarchy(OLD.account_id, -OLD.debit, -OLD.credit);
+    IF @app_maintains_balances IS NULL THEN
+        -- 回退余额
+        CALL sp_update_account_hierarchy(OLD.account_id, -OLD.debit, -OLD.credit);
+    END IF;
 
-    -- 更新 journal totals
+    -- 更新 journal totals（两种余额模式下都由触发器维护）
     UPDATE journal_entry
     SET total_debit = (
         SELECT COALESCE(SUM(debit),0) FROM ledger_line WHERE journal_id = OLD.journal_id
@@ -711,7 +781,10 @@ END$$
 DELIMITER ;
 
 -- =========================
--- 8. 触发器：订单总金额自动维护（PO / SO items insert/update/delete）
+-- 8. 订单总金额：由应用维护（PO / SO items）
+--    应用在提交前对本事务内明细有变动的订单各执行一次 SUM(subtotal) 并写回 total_amount，
+--    不再使用明细触发器（避免与应用写入的总金额重复累加）；升级旧库时删除原有触发器。
+--    在应用之外直接修改明细后，请调用 sp_recalc_order_totals 重算订单总金额。
 -- =========================
 
 DELIMITER $$
@@ -721,89 +794,13 @@ DROP TRIGGER IF EXISTS trg_update_po_total_after_delete$$
 DROP TRIGGER IF EXISTS trg_update_so_total_after_insert$$
 DROP TRIGGER IF EXISTS trg_update_so_total_after_update$$
 DROP TRIGGER IF EXISTS trg_update_so_total_after_delete$$
-
-CREATE TRIGGER trg_update_po_total_after_insert
-AFTER INSERT ON purchase_order_item
-FOR EACH ROW
-BEGIN
-    UPDATE purchase_order
-    SET total_amount = (
-        SELECT COALESCE(SUM(subtotal),0)
-        FROM purchase_order_item
-        WHERE purchase_order_id = NEW.purchase_order_id
-    )
-    WHERE po_id = NEW.purchase_order_id;
-END$$
-
-CREATE TRIGGER trg_update_po_total_after_update
-AFTER UPDATE ON purchase_order_item
-FOR EACH ROW
-BEGIN
-    UPDATE purchase_order
-    SET total_amount = (
-        SELECT COALESCE(SUM(subtotal),0)
-        FROM purchase_order_item
-        WHERE purchase_order_id = NEW.purchase_order_id
-    )
-    WHERE po_id = NEW.purchase_order_id;
-END$$
-
-CREATE TRIGGER trg_update_po_total_after_delete
-AFTER DELETE ON purchase_order_item
-FOR EACH ROW
-BEGIN
-    UPDATE purchase_order
-    SET total_amount = (
-        SELECT COALESCE(SUM(subtotal),0)
-        FROM purchase_order_item
-        WHERE purchase_order_id = OLD.purchase_order_id
-    )
-    WHERE po_id = OLD.purchase_order_id;
-END$$
-
-CREATE TRIGGER trg_update_so_total_after_insert
-AFTER INSERT ON sales_order_item
-FOR EACH ROW
-BEGIN
-    UPDATE sales_order
-    SET total_amount = (
-        SELECT COALESCE(SUM(subtotal),0)
-        FROM sales_order_item
-        WHERE sales_order_id = NEW.sales_order_id
-    )
-    WHERE so_id = NEW.sales_order_id;
-END$$
-
-CREATE TRIGGER trg_update_so_total_after_update
-AFTER UPDATE ON sales_order_item
-FOR EACH ROW
-BEGIN
-    UPDATE sales_order
-    SET total_amount = (
-        SELECT COALESCE(SUM(subtotal),0)
-        FROM sales_order_item
-        WHERE sales_order_id = NEW.sales_order_id
-    )
-    WHERE so_id = NEW.sales_order_id;
-END$$
-
-CREATE TRIGGER trg_update_so_total_after_delete
-AFTER DELETE ON sales_order_item
-FOR EACH ROW
-BEGIN
-    UPDATE sales_order
-    SET total_amount = (
-        SELECT COALESCE(SUM(subtotal),0)
-        FROM sales_order_item
-        WHERE sales_order_id = OLD.sales_order_id
-    )
-    WHERE so_id = OLD.sales_order_id;
-END$$
-
 DELIMITER ;
 
 -- =========================
--- 9. 触发器：库存流水 -> 更新 inventory_item.quantity（支持 insert/update/delete）
+-- 9. 触发器：库存流水 -> 增量更新 inventory_item.quantity 与 inventory_location（支持 insert/update/delete）
+--    每条流水只按自身数量增减库存，不再对历史流水全量求和；
+--    带仓库位置的流水同时增减该商品在该位置的汇总数量；
+--    与流水汇总的一致性由 sp_check_inventory_drift / scripts/check_inventory.py 定期核对
 -- =========================
 
 DELIMITER $$
@@ -816,59 +813,68 @@ AFTER INSERT ON inventory_transaction
 FOR EACH ROW
 BEGIN
     UPDATE inventory_item
-    SET quantity = (
-        SELECT COALESCE(SUM(
-            CASE WHEN type = 'IN' THEN quantity
-                 WHEN type = 'OUT' THEN -quantity
-                 ELSE 0 END
-        ),0)
-        FROM inventory_transaction
-        WHERE product_id = NEW.product_id AND company_id = NEW.company_id
-    ), updated_at = NOW()
+    SET quantity = COALESCE(quantity, 0)
+            + CASE WHEN NEW.type = 'IN' THEN NEW.quantity
+                   WHEN NEW.type = 'OUT' THEN -NEW.quantity
+                   ELSE 0 END,
+        updated_at = NOW()
     WHERE product_id = NEW.product_id AND company_id = NEW.company_id;
+
+    IF NEW.warehouse_location IS NOT NULL AND NEW.warehouse_location <> '' THEN
+        INSERT INTO inventory_location (location_id, company_id, product_id, warehouse_location, quantity, updated_at)
+        VALUES (
+            UUID(), NEW.company_id, NEW.product_id, NEW.warehouse_location,
+            CASE WHEN NEW.type = 'IN' THEN NEW.quantity
+                 WHEN NEW.type = 'OUT' THEN -NEW.quantity
+                 ELSE 0 END,
+            NOW()
+        )
+        ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity), updated_at = NOW();
+    END IF;
 END$$
 
 CREATE TRIGGER trg_update_inventory_after_update
 AFTER UPDATE ON inventory_transaction
 FOR EACH ROW
 BEGIN
-    -- 若 product/company 改变，需刷新旧的与新的库存
-    IF OLD.product_id <> NEW.product_id OR OLD.company_id <> NEW.company_id THEN
-        UPDATE inventory_item
-        SET quantity = (
-            SELECT COALESCE(SUM(
-                CASE WHEN type = 'IN' THEN quantity
-                     WHEN type = 'OUT' THEN -quantity
-                     ELSE 0 END
-            ),0)
-            FROM inventory_transaction
-            WHERE product_id = OLD.product_id AND company_id = OLD.company_id
-        ), updated_at = NOW()
-        WHERE product_id = OLD.product_id AND company_id = OLD.company_id;
-
-        UPDATE inventory_item
-        SET quantity = (
-            SELECT COALESCE(SUM(
-                CASE WHEN type = 'IN' THEN quantity
-                     WHEN type = 'OUT' THEN -quantity
-                     ELSE 0 END
-            ),0)
-            FROM inventory_transaction
-            WHERE product_id = NEW.product_id AND company_id = NEW.company_id
-        ), updated_at = NOW()
-        WHERE product_id = NEW.product_id AND company_id = NEW.company_id;
-    ELSE
-        UPDATE inventory_item
-        SET quantity = (
-            SELECT COALESCE(SUM(
-                CASE WHEN type = 'IN' THEN quantity
-                     WHEN type = 'OUT' THEN -quantity
-                     ELSE 0 END
-            ),0)
-            FROM inventory_transaction
-            WHERE product_id = NEW.product_id AND company_id = NEW.company_id
-        ), updated_at = NOW()
-        WHERE product_id = NEW.product_id AND company_id = NEW.company_id;
+    -- 先撤销旧流水的影响，再加上新流水的影响（product/company 改变时分别作用于新旧库存）
+    UPDATE inventory_item
+    SET quantity = COALESCE(quantity, 0)
+            - CASE WHEN OLD.type = 'IN' THEN OLD.quantity
+                   WHEN OLD.type = 'OUT' THEN -OLD.quantity
+                   ELSE 0 END,
+        updated_at = NOW()
+    WHERE product_id = OLD.product_id AND company_id = OLD.company_id;
+
+    UPDATE inventory_item
+    SET quantity = COALESCE(quantity, 0)
+            + CASE WHEN NEW.type = 'IN' THEN NEW.quantity
+                   WHEN NEW.type = 'OUT' THEN -NEW.quantity
+                   ELSE 0 END,
+        updated_at = NOW()
+    WHERE product_id = NEW.product_id AND company_id = NEW.company_id;
+
+    IF OLD.warehouse_location IS NOT NULL AND OLD.warehouse_location <> '' THEN
+        UPDATE inventory_location
+        SET quantity = quantity
+                - CASE WHEN OLD.type = 'IN' THEN OLD.quantity
+                       WHEN OLD.type = 'OUT' THEN -OLD.quantity
+                       ELSE 0 END,
+            updated_at = NOW()
+        WHERE company_id = OLD.company_id AND product_id = OLD.product_id
+          AND warehouse_location = OLD.warehouse_location;
+    END IF;
+
+    IF NEW.warehouse_location IS NOT NULL AND NEW.warehouse_location <> '' THEN
+        INSERT INTO inventory_location (location_id, company_id, product_id, warehouse_location, quantity, updated_at)
+        VALUES (
+            UUID(), NEW.company_id, NEW.product_id, NEW.warehouse_location,
+            CASE WHEN NEW.type = 'IN' THEN NEW.quantity
+                 WHEN NEW.type = 'OUT' THEN -NEW.quantity
+                 ELSE 0 END,
+            NOW()
+        )
+        ON DUPLICATE KEY UPDATE quantity = quantity + VALUES(quantity), updated_at = NOW();
     END IF;
 END$$
 
@@ -877,16 +883,23 @@ AFTER DELETE ON inventory_transaction
 FOR EACH ROW
 BEGIN
     UPDATE inventory_item
-    SET quantity = (
-        SELECT COALESCE(SUM(
-            CASE WHEN type = 'IN' THEN quantity
-                 WHEN type = 'OUT' THEN -quantity
-                 ELSE 0 END
-        ),0)
-        FROM inventory_transaction
-        WHERE product_id = OLD.product_id AND company_id = OLD.company_id
-    ), updated_at = NOW()
+    SET quantity = COALESCE(quantity, 0)
+            - CASE WHEN OLD.type = 'IN' THEN OLD.quantity
+                   WHEN OLD.type = 'OUT' THEN -OLD.quantity
+                   ELSE 0 END,
+        updated_at = NOW()
     WHERE product_id = OLD.product_id AND company_id = OLD.company_id;
+
+    IF OLD.warehouse_location IS NOT NULL AND OLD.warehouse_location <> '' THEN
+        UPDATE inventory_location
+        SET quantity = quantity
+                - CASE WHEN OLD.type = 'IN' THEN OLD.quantity
+                       WHEN OLD.type = 'OUT' THEN -OLD.quantity
+                       ELSE 0 END,
+            updated_at = NOW()
+        WHERE company_id = OLD.company_id AND product_id = OLD.product_id
+          AND warehouse_location = OLD.warehouse_location;
+    END IF;
 END$$
 
 DELIMITER ;
@@ -905,6 +918,21 @@ BEGIN
     WHERE journal_id = p_journal_id;
 END$$
 
+-- 按明细重算全部采购/销售订单总金额（应用之外直接修改明细后使用）
+DROP PROCEDURE IF EXISTS sp_recalc_order_totals$$
+CREATE PROCEDURE sp_recalc_order_totals()
+BEGIN
+    UPDATE purchase_order po
+    SET po.total_amount = (
+        SELECT COALESCE(SUM(subtotal),0) FROM purchase_order_item WHERE purchase_order_id = po.po_id
+    );
+
+    UPDATE sales_order so
+    SET so.total_amount = (
+        SELECT COALESCE(SUM(subtotal),0) FROM sales_order_item WHERE sales_order_id = so.so_id
+    );
+END$$
+
 DROP PROCEDURE IF EXISTS sp_recalc_all_account_balances$$
 CREATE PROCEDURE sp_recalc_all_account_balances()
 BEGIN
@@ -931,6 +959,34 @@ BEGIN
         FROM inventory_transaction t
         WHERE t.product_id = i.product_id AND t.company_id = i.company_id
     ), i.updated_at = NOW();
+
+    -- 按流水重建库存位置汇总
+    DELETE FROM inventory_location;
+    INSERT INTO inventory_location (location_id, company_id, product_id, warehouse_location, quantity, updated_at)
+    SELECT UUID(), company_id, product_id, warehouse_location,
+           SUM(CASE WHEN type = 'IN' THEN quantity WHEN type = 'OUT' THEN -quantity ELSE 0 END),
+           NOW()
+    FROM inventory_transaction
+    WHERE warehouse_location IS NOT NULL AND warehouse_location <> ''
+    GROUP BY company_id, product_id, warehouse_location;
+END$$
+
+-- 核对库存数量与流水汇总，返回存在偏差的库存记录（不修改数据）
+DROP PROCEDURE IF EXISTS sp_check_inventory_drift$$
+CREATE PROCEDURE sp_check_inventory_drift()
+BEGIN
+    SELECT i.inventory_id, i.company_id, i.product_id,
+           i.quantity AS stored_quantity,
+           COALESCE(t.total, 0) AS expected_quantity,
+           i.quantity - COALESCE(t.total, 0) AS drift
+    FROM inventory_item i
+    LEFT JOIN (
+        SELECT company_id, product_id,
+               SUM(CASE WHEN type = 'IN' THEN quantity WHEN type = 'OUT' THEN -quantity ELSE 0 END) AS total
+        FROM inventory_transaction
+        GROUP BY company_id, product_id
+    ) t ON t.company_id = i.company_id AND t.product_id = i.product_id
+    WHERE i.quantity <> COALESCE(t.total, 0);
 END$$
 DELIMITER ;
 
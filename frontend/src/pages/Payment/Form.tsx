@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef, UIEvent } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Form, DatePicker, Input, InputNumber, Select, Button, Card, message, Space, Alert } from 'antd';
 import { SaveOutlined, ArrowLeftOutlined } from '@ant-design/icons';
@@ -8,9 +8,13 @@ import { paymentApi } from '@/services/payment';
 const { Option } = Select;
 const { TextArea } = Input;
 
+// 可付款采购单每页条数（服务端分页，滚动到底部加载下一页）
+const PAGE_SIZE = 100;
+
 interface AvailableOrder {
   po_id: string;
   supplier_id: string;
+  supplier_name?: string;
   date: string;
   total_amount: number;
   paid_amount: number;
@@ -24,20 +28,48 @@ const PaymentForm = () => {
   const [loading, setLoading] = useState(false);
   const [availableOrders, setAvailableOrders] = useState<AvailableOrder[]>([]);
   const [selectedOrder, setSelectedOrder] = useState<AvailableOrder | null>(null);
+  const [keyword, setKeyword] = useState('');
+  const [hasMore, setHasMore] = useState(false);
+  const [fetching, setFetching] = useState(false);
+  const searchTimer = useRef<number>();
 
   useEffect(() => {
-    fetchAvailableOrders();
+    fetchAvailableOrders('', 0);
   }, []);
 
-  const fetchAvailableOrders = async () => {
+  const fetchAvailableOrders = async (search: string, skip: number) => {
+    setFetching(true);
     try {
-      const response = await paymentApi.getAvailableOrders();
+      const response = await paymentApi.getAvailableOrders({
+        keyword: search || undefined,
+        skip,
+        limit: PAGE_SIZE,
+      });
       if (response.success) {
-        setAvailableOrders(response.data || []);
+        const orders = response.data || [];
+        setAvailableOrders(prev => (skip === 0 ? orders : [...prev, ...orders]));
+        setHasMore(orders.length === PAGE_SIZE);
       }
     } catch (error) {
       console.error('Fetch available orders error:', error);
       message.error('获取可付款采购单失败');
+    } finally {
+      setFetching(false);
+    }
+  };
+
+  // 按供应商名称或订单号在服务端搜索
+  const handleSearch = (value: string) => {
+    setKeyword(value);
+    window.clearTimeout(searchTimer.current);
+    searchTimer.current = window.setTimeout(() => fetchAvailableOrders(value, 0), 300);
+  };
+
+  // 滚动到底部时加载下一页
+  const handlePopupScroll = (e: UIEvent<HTMLDivElement>) => {
+    const target = e.currentTarget;
+    if (hasMore && !fetching && target.scrollTop + target.clientHeight >= target.scrollHeight - 20) {
+      fetchAvailableOrders(keyword, availableOrders.length);
     }
   };
 
@@ -106,14 +138,14 @@ const PaymentForm = () => {
               allowClear 
               showSearch
               onChange={handleOrderChange}
-              filterOption={(input, option) => {
-                const label = option?.label as string | undefined;
-                return label ? label.toLowerCase().includes(input.toLowerCase()) : false;
-              }}
+              filterOption={false}
+              onSearch={handleSearch}
+              onPopupScroll={handlePopupScroll}
+              loading={fetching}
               optionLabelProp="label"
             >
               {availableOrders.map(order => {
-                const label = `${order.po_id} - 总金额: ¥${order.total_amount.toFixed(2)} - 未付: ¥${order.unpaid_amount.toFixed(2)}`;
+                const label = `${order.po_id}${order.supplier_name ? ` (${order.supplier_name})` : ''} - 总金额: ¥${order.total_amount.toFixed(2)} - 未付: ¥${order.unpaid_amount.toFixed(2)}`;
                 return (
                   <Option key={order.po_id} value={order.po_id} label={label}>
                     {label}
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef, UIEvent } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Form, DatePicker, Input, InputNumber, Select, Button, Card, message, Space } from 'antd';
 import { SaveOutlined, ArrowLeftOutlined } from '@ant-design/icons';
@@ -8,9 +8,13 @@ import { paymentApi } from '@/services/payment';
 const { Option } = Select;
 const { TextArea } = Input;
 
+// 可收款销售单每页条数（服务端分页，滚动到底部加载下一页）
+const PAGE_SIZE = 100;
+
 interface AvailableSalesOrder {
   so_id: string;
   customer_id: string;
+  customer_name?: string;
   date: string;
   total_amount: number;
   received_amount: number;
@@ -25,19 +29,47 @@ const ReceiptForm = () => {
   const [loading, setLoading] = useState(false);
   const [salesOrders, setSalesOrders] = useState<AvailableSalesOrder[]>([]);
   const [selectedSalesOrderId, setSelectedSalesOrderId] = useState<string | undefined>();
+  const [keyword, setKeyword] = useState('');
+  const [hasMore, setHasMore] = useState(false);
+  const [fetching, setFetching] = useState(false);
+  const searchTimer = useRef<number>();
 
   useEffect(() => {
-    fetchAvailableSalesOrders();
+    fetchAvailableSalesOrders('', 0);
   }, []);
 
-  const fetchAvailableSalesOrders = async () => {
+  const fetchAvailableSalesOrders = async (search: string, skip: number) => {
+    setFetching(true);
     try {
-      const response = await paymentApi.getAvailableSalesOrders();
+      const response = await paymentApi.getAvailableSalesOrders({
+        keyword: search || undefined,
+        skip,
+        limit: PAGE_SIZE,
+      });
       if (response.success) {
-        setSalesOrders(response.data || []);
+        const orders = response.data || [];
+        setSalesOrders(prev => (skip === 0 ? orders : [...prev, ...orders]));
+        setHasMore(orders.length === PAGE_SIZE);
       }
     } catch (error) {
       console.error('Fetch available sales orders error:', error);
+    } finally {
+      setFetching(false);
+    }
+  };
+
+  // 按客户名称或订单号在服务端搜索
+  const handleSearch = (value: string) => {
+    setKeyword(value);
+    window.clearTimeout(searchTimer.current);
+    searchTimer.current = window.setTimeout(() => fetchAvailableSalesOrders(value, 0), 300);
+  };
+
+  // 滚动到底部时加载下一页
+  const handlePopupScroll = (e: UIEvent<HTMLDivElement>) => {
+    const target = e.currentTarget;
+    if (hasMore && !fetching && target.scrollTop + target.clientHeight >= target.scrollHeight - 20) {
+      fetchAvailableSalesOrders(keyword, salesOrders.length);
     }
   };
 
@@ -56,7 +88,7 @@ const ReceiptForm = () => {
         message.success('收款记录创建成功');
         // 如果关联了销售单，刷新可收款销售单列表
         if (values.sales_order_id) {
-          fetchAvailableSalesOrders();
+          fetchAvailableSalesOrders(keyword, 0);
         }
         navigate('/receipts');
       }
@@ -94,6 +126,10 @@ const ReceiptForm = () => {
               placeholder="选择销售单（可选）" 
               allowClear 
               showSearch
+              filterOption={false}
+              onSearch={handleSearch}
+              onPopupScroll={handlePopupScroll}
+              loading={fetching}
               onChange={(value) => {
                 setSelectedSalesOrderId(value);
                 if (value) {
@@ -123,7 +159,7 @@ const ReceiptForm = () => {
             >
               {salesOrders.map(so => (
                 <Option key={so.so_id} value={so.so_id}>
-                  {so.so_id} - ¥{so.total_amount} (未收: ¥{so.unreceived_amount})
+                  {so.so_id}{so.customer_name ? ` (${so.customer_name})` : ''} - ¥{so.total_amount} (未收: ¥{so.unreceived_amount})
                 </Option>
               ))}
             </Select>
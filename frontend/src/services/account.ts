@@ -25,8 +25,15 @@ export const accountApi = {
   },
 
   // 获取科目树
-  getTree: async (): Promise<ApiResponse<AccountTreeNode[]>> => {
-    return api.get('/accounts/tree');
+  getTree: async (include_balance = false): Promise<ApiResponse<AccountTreeNode[]>> => {
+    const params = include_balance ? { include_balance } : {};
+    return api.get('/accounts/tree', { params });
+  },
+
+  // 获取全部科目余额（as_of 为空时取今天）
+  getBalances: async (as_of?: string): Promise<ApiResponse<any>> => {
+    const params = as_of ? { as_of } : {};
+    return api.get('/accounts/balances', { params });
   },
 
   // 获取科目详情
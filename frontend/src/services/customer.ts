@@ -19,8 +19,19 @@ export const customerApi = {
   },
 
   // 获取客户列表
-  getList: async (skip = 0, limit = 50): Promise<ApiResponse<Customer[]>> => {
-    return api.get('/customers', { params: { skip, limit } });
+  getList: async (
+    skip = 0,
+    limit = 50,
+    filters?: {
+      keyword?: string;
+      sort_by?: string;
+      sort_order?: 'asc' | 'desc';
+      min_current_debt?: number;
+      min_total_sales?: number;
+      has_draft?: boolean;
+    }
+  ): Promise<ApiResponse<Customer[]>> => {
+    return api.get('/customers', { params: { skip, limit, ...filters } });
   },
 
   // 获取客户详情
@@ -2,8 +2,38 @@
  * 库存管理 API
  */
 import api from './api';
+import axios from 'axios';
 import { ApiResponse, InventoryItem, InventoryTransaction } from '@/types';
 
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api';
+
+export interface StockCardMovement {
+  transaction_id: string;
+  created_at: string;
+  type: 'IN' | 'OUT';
+  source_type: string;
+  source_id: string | null;
+  quantity: number;  // 入库为正、出库为负
+  unit_cost: number | null;
+  amount: number;
+  running_quantity: number;
+  running_value: number;
+  warehouse_location: string | null;
+  remark: string | null;
+}
+
+export interface StockCard {
+  product_id: string;
+  product_sku: string;
+  product_name: string;
+  start_date: string | null;
+  end_date: string | null;
+  opening_quantity: number;
+  opening_value: number;
+  movements: StockCardMovement[];
+  next_cursor: string | null;
+}
+
 export const inventoryApi = {
   // 获取库存列表
   getItems: async (params?: {
@@ -42,5 +72,45 @@ export const inventoryApi = {
     return api.post('/inventory/transactions', data);
   },
 
+  // 获取商品库存台账（cursor 为上一页返回的 next_cursor）
+  getStockCard: async (productId: string, params?: {
+    start_date?: string;
+    end_date?: string;
+    cursor?: string;
+    limit?: number;
+  }): Promise<ApiResponse<StockCard>> => {
+    return api.get(`/inventory/stock-card/${productId}`, { params });
+  },
+
+  // 导出商品库存台账
+  exportStockCard: async (
+    productId: string,
+    format: 'csv' | 'xlsx' = 'xlsx',
+    startDate?: string,
+    endDate?: string,
+  ): Promise<void> => {
+    const token = localStorage.getItem('access_token');
+    const response = await axios.get(`${API_BASE_URL}/inventory/stock-card/${productId}/export`, {
+      params: { format, start_date: startDate, end_date: endDate },
+      responseType: 'blob',
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+
+    const blob = new Blob([response.data], {
+      type: format === 'csv'
+        ? 'text/csv;charset=utf-8'
+        : 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    });
+    const url = window.URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `库存台账_${endDate || ''}.${format}`;
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    window.URL.revokeObjectURL(url);
+  },
 };
 
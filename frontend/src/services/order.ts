@@ -12,8 +12,14 @@ export const orderApi = {
   },
 
   // 获取采购订单列表
-  getPurchaseList: async (status?: string, skip = 0, limit = 20): Promise<ApiResponse<PurchaseOrder[]>> => {
-    const params: any = { skip, limit };
+  // fields='summary' 只返回表头（不含明细），适合大列表
+  getPurchaseList: async (
+    status?: string,
+    skip = 0,
+    limit = 20,
+    fields: 'full' | 'summary' = 'full'
+  ): Promise<ApiResponse<PurchaseOrder[]>> => {
+    const params: any = { skip, limit, fields };
     if (status) params.status = status;
     return api.get('/purchase/orders', { params });
   },
@@ -35,8 +41,14 @@ export const orderApi = {
   },
 
   // 获取销售订单列表
-  getSalesList: async (status?: string, skip = 0, limit = 20): Promise<ApiResponse<SalesOrder[]>> => {
-    const params: any = { skip, limit };
+  // fields='summary' 只返回表头（不含明细），适合大列表
+  getSalesList: async (
+    status?: string,
+    skip = 0,
+    limit = 20,
+    fields: 'full' | 'summary' = 'full'
+  ): Promise<ApiResponse<SalesOrder[]>> => {
+    const params: any = { skip, limit, fields };
     if (status) params.status = status;
     return api.get('/sales/orders', { params });
   },
@@ -57,9 +69,19 @@ export const orderApi = {
     return api.post(`/purchase/orders/${id}/post`, data || {});
   },
 
+  // 采购订单批量过账
+  postPurchaseBatch: async (data: { po_ids: string[]; warehouse_locations?: Record<string, Record<string, string | null>> }): Promise<ApiResponse<{ posted: string[]; failed: Array<{ order_id: string; reason: string }> }>> => {
+    return api.post('/purchase/orders/post-batch', data);
+  },
+
   // 销售订单过账
   postSales: async (id: string, data?: { outbound_items?: Record<string, Array<{ location: string | null; quantity: number }>> }): Promise<ApiResponse<SalesOrder>> => {
     return api.post(`/sales/orders/${id}/post`, data || {});
   },
+
+  // 销售订单批量过账
+  postSalesBatch: async (so_ids: string[]): Promise<ApiResponse<{ posted: string[]; failed: Array<{ order_id: string; reason: string }> }>> => {
+    return api.post('/sales/orders/post-batch', { so_ids });
+  },
 };
 
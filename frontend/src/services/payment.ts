@@ -4,6 +4,22 @@
 import api from './api';
 import { ApiResponse, Payment, Receipt } from '@/types';
 
+export interface PaymentCreate {
+  purchase_order_id?: string;
+  date: string;
+  amount: number;
+  payment_method: 'Cash' | 'BankTransfer' | 'Credit';
+  remark?: string;
+}
+
+export interface ReceiptCreate {
+  sales_order_id?: string;
+  date: string;
+  amount: number;
+  method: 'Cash' | 'BankTransfer' | 'Credit';
+  remark?: string;
+}
+
 export const paymentApi = {
   // ===== 付款 =====
   // 创建付款记录
@@ -31,17 +47,23 @@ export const paymentApi = {
     return api.get(`/payments/${id}`);
   },
 
+  // 批量创建付款记录
+  createBatch: async (items: PaymentCreate[]): Promise<ApiResponse<Array<{ index: number; success: boolean; payment_id?: string; reason?: string }>>> => {
+    return api.post('/payments/batch', { items });
+  },
+
   // 获取可付款的采购单列表（已过账且未完全支付）
-  getAvailableOrders: async (): Promise<ApiResponse<Array<{
+  getAvailableOrders: async (params?: { keyword?: string; skip?: number; limit?: number }): Promise<ApiResponse<Array<{
     po_id: string;
     supplier_id: string;
+    supplier_name: string;
     date: string;
     total_amount: number;
     paid_amount: number;
     unpaid_amount: number;
     status: string;
   }>>> => {
-    return api.get('/payments/available-orders');
+    return api.get('/payments/available-orders', { params });
   },
 
   // ===== 收款 =====
@@ -70,10 +92,16 @@ export const paymentApi = {
     return api.get(`/receipts/${id}`);
   },
 
+  // 批量创建收款记录
+  createReceiptBatch: async (items: ReceiptCreate[]): Promise<ApiResponse<Array<{ index: number; success: boolean; receipt_id?: string; reason?: string }>>> => {
+    return api.post('/receipts/batch', { items });
+  },
+
   // 获取可收款的销售单列表（已过账且未完全收款）
-  getAvailableSalesOrders: async (): Promise<ApiResponse<Array<{
+  getAvailableSalesOrders: async (params?: { keyword?: string; skip?: number; limit?: number }): Promise<ApiResponse<Array<{
     so_id: string;
     customer_id: string;
+    customer_name: string;
     date: string;
     total_amount: number;
     received_amount: number;
@@ -81,7 +109,7 @@ export const paymentApi = {
     status: string;
     payment_method?: 'Cash' | 'BankTransfer' | 'Credit';
   }>>> => {
-    return api.get('/receipts/available-orders');
+    return api.get('/receipts/available-orders', { params });
   },
 };
 
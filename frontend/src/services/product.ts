@@ -17,6 +17,7 @@ export const productApi = {
 
   // 获取商品列表
   getList: async (params?: {
+    keyword?: string;  // 按 SKU 前缀或商品名称搜索
     skip?: number;
     limit?: number;
   }): Promise<ApiResponse<Product[]>> => {
@@ -77,6 +77,80 @@ export interface CashFlow {
   ending_cash: number;
 }
 
+export interface AgingBucket {
+  key: string;
+  label: string;
+}
+
+export interface ArAgingCustomer {
+  customer_id: string;
+  customer_name: string;
+  credit_limit: number;
+  days_0_30: number;
+  days_31_60: number;
+  days_61_90: number;
+  days_over_90: number;
+  total: number;
+}
+
+export interface ArAging {
+  as_of_date: string;
+  buckets: AgingBucket[];
+  customers: ArAgingCustomer[];
+  totals: Record<string, number>;
+}
+
+export interface ArAgingDetail {
+  as_of_date: string;
+  customer_id: string;
+  customer_name: string;
+  credit_limit: number;
+  orders: Array<{
+    so_id: string;
+    date: string;
+    total_amount: number;
+    received_amount: number;
+    outstanding_amount: number;
+    days_outstanding: number;
+    bucket: string;
+  }>;
+  total: number;
+}
+
+export interface ApAgingSupplier {
+  supplier_id: string;
+  supplier_name: string;
+  days_0_30: number;
+  days_31_60: number;
+  days_61_90: number;
+  days_over_90: number;
+  total: number;
+}
+
+export interface ApAging {
+  as_of_date: string;
+  buckets: AgingBucket[];
+  suppliers: ApAgingSupplier[];
+  totals: Record<string, number>;
+}
+
+export interface InventoryValuationItem {
+  product_id: string;
+  product_sku: string | null;
+  product_name: string | null;
+  quantity: number;
+  average_cost: number;
+  value: number;
+}
+
+export interface InventoryValuation {
+  as_of: string;
+  source: 'snapshot' | 'transactions';
+  snapshot_date: string | null;
+  items: InventoryValuationItem[];
+  total_value: number;
+}
+
 export const reportApi = {
   // 生成利润表
   getIncomeStatement: async (startDate: string, endDate: string): Promise<ApiResponse<IncomeStatement>> => {
@@ -186,4 +260,91 @@ export const reportApi = {
     document.body.removeChild(link);
     window.URL.revokeObjectURL(url);
   },
+
+  // 应收账款账龄分析
+  getArAging: async (asOfDate?: string): Promise<ApiResponse<ArAging>> => {
+    return api.get('/reports/ar-aging', {
+      params: { as_of_date: asOfDate },
+    });
+  },
+
+  // 应收账款账龄明细（单个客户）
+  getArAgingDetail: async (customerId: string, asOfDate?: string): Promise<ApiResponse<ArAgingDetail>> => {
+    return api.get(`/reports/ar-aging/${customerId}`, {
+      params: { as_of_date: asOfDate },
+    });
+  },
+
+  // 导出应收账款账龄分析
+  exportArAging: async (asOfDate: string): Promise<void> => {
+    const token = localStorage.getItem('access_token');
+    const response = await axios.get(`${API_BASE_URL}/reports/export/ar-aging`, {
+      params: {
+        as_of_date: asOfDate,
+      },
+      responseType: 'blob',
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+
+    const blob = new Blob([response.data], {
+      type: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    });
+    const url = window.URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `应收账款账龄_${asOfDate}.xlsx`;
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    window.URL.revokeObjectURL(url);
+  },
+
+  // 应付账款账龄分析
+  getApAging: async (asOfDate?: string): Promise<ApiResponse<ApAging>> => {
+    return api.get('/reports/ap-aging', {
+      params: { as_of_date: asOfDate },
+    });
+  },
+
+  // 导出应付账款账龄分析
+  exportApAging: async (asOfDate: string): Promise<void> => {
+    const token = localStorage.getItem('access_token');
+    const response = await axios.get(`${API_BASE_URL}/reports/export/ap-aging`, {
+      params: {
+        as_of_date: asOfDate,
+      },
+      responseType: 'blob',
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+
+    const blob = new Blob([response.data], {
+      type: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    });
+    const url = window.URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `应付账款账龄_${asOfDate}.xlsx`;
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    window.URL.revokeObjectURL(url);
+  },
+
+  // 库存估值（历史日期基于期末快照）
+  getInventoryValuation: async (asOf?: string): Promise<ApiResponse<InventoryValuation>> => {
+    return api.get('/reports/inventory-valuation', {
+      params: { as_of: asOf },
+    });
+  },
+
+  // 生成库存期末快照
+  createInventorySnapshot: async (periodEnd: string): Promise<ApiResponse<{ period_end: string; products: number }>> => {
+    return api.post('/reports/inventory-valuation/snapshots', null, {
+      params: { period_end: periodEnd },
+    });
+  },
 };
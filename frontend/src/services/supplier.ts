@@ -2,8 +2,32 @@
  * 供应商管理 API
  */
 import api from './api';
+import axios from 'axios';
 import { ApiResponse, Supplier } from '@/types';
 
+const API_BASE_URL = import.meta.env.VITE_API_BASE_URL || '/api';
+
+export interface SupplierStatement {
+  supplier_id: string;
+  supplier_name: string;
+  start_date: string | null;
+  end_date: string;
+  opening_balance: number;
+  total_purchase: number;
+  total_payment: number;
+  closing_balance: number;
+  lines: Array<{
+    date: string;
+    type: 'PO' | 'PAYMENT';
+    reference_id: string;
+    description: string;
+    purchase_amount: number;
+    payment_amount: number;
+    balance: number;
+  }>;
+  aging: Record<string, number>;
+}
+
 export const supplierApi = {
   // 创建供应商
   create: async (data: {
@@ -38,5 +62,35 @@ export const supplierApi = {
   delete: async (id: string): Promise<ApiResponse<void>> => {
     return api.delete(`/suppliers/${id}`);
   },
-};
 
+  // 供应商对账单
+  getStatement: async (id: string, startDate?: string, endDate?: string): Promise<ApiResponse<SupplierStatement>> => {
+    return api.get(`/suppliers/${id}/statement`, {
+      params: { start_date: startDate, end_date: endDate },
+    });
+  },
+
+  // 导出供应商对账单
+  exportStatement: async (id: string, startDate?: string, endDate?: string): Promise<void> => {
+    const token = localStorage.getItem('access_token');
+    const response = await axios.get(`${API_BASE_URL}/suppliers/${id}/statement/export`, {
+      params: { start_date: startDate, end_date: endDate },
+      responseType: 'blob',
+      headers: {
+        Authorization: `Bearer ${token}`,
+      },
+    });
+
+    const blob = new Blob([response.data], {
+      type: 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    });
+    const url = window.URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.href = url;
+    link.download = `供应商对账单_${endDate || ''}.xlsx`;
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    window.URL.revokeObjectURL(url);
+  },
+};
@@ -60,6 +60,9 @@ export interface AccountTreeNode {
   name: string;
   type: string;
   is_core: boolean;
+  balance_debit?: number;
+  balance_credit?: number;
+  balance?: number;
   children: AccountTreeNode[];
 }
 
@@ -171,6 +174,7 @@ export interface OrderItem {
 export interface PurchaseOrder {
   po_id?: string;
   supplier_id: string;
+  supplier_name?: string | null;
   company_id?: string;
   date: string;
   expected_delivery_date?: string;
@@ -185,6 +189,7 @@ export interface PurchaseOrder {
 export interface SalesOrder {
   so_id?: string;
   customer_id: string;
+  customer_name?: string | null;
   company_id?: string;
   date: string;
   expected_delivery_date?: string;
@@ -234,6 +239,7 @@ export interface Product {
   name: string;
   price?: number;
   cost?: number;  // 预估成本
+  quantity?: number;  // 库存数量（从库存获取）
   average_cost?: number;  // 加权平均成本（从库存获取）
   created_at?: string;
 }
@@ -245,8 +251,9 @@ export interface InventoryItem {
   company_id: string;
   quantity: number;
   average_cost?: number;  // 加权平均成本
-  warehouse_locations?: string[];  // 所有不同的仓库位置列表（从流水记录汇总）
+  warehouse_locations?: string[];  // 所有不同的仓库位置列表（从库存位置汇总表读取）
   warehouse_location?: string;  // 兼容字段，显示所有位置的汇总字符串
+  location_quantities?: Record<string, number>;  // 各仓库位置的数量
   updated_at: string;
   product_name?: string;
   product_sku?: string;